@@ -0,0 +1,61 @@
+import pytest
+
+from pybit._http_manager import _V5HTTPManager, generate_signature
+
+
+ORDER = {
+    "category": "linear",
+    "symbol": "BTCUSDT",
+    "side": "Buy",
+    "orderType": "Limit",
+    "qty": 0.001,
+    "price": 30000,
+    "timeInForce": "PostOnly",
+    "orderLinkId": "bench-order-0001",
+    "positionIdx": 0,
+    "reduceOnly": False,
+}
+
+
+@pytest.fixture(scope="module")
+def http():
+    return _V5HTTPManager(api_key="key", api_secret="secret")
+
+
+@pytest.fixture(scope="module")
+def rsa_private_key():
+    from Crypto.PublicKey import RSA
+
+    return RSA.generate(2048).export_key().decode()
+
+
+def bench_prepare_payload_get(benchmark, check_threshold):
+    benchmark(_V5HTTPManager.prepare_payload, "GET", dict(ORDER))
+    check_threshold(benchmark, "prepare_payload_get")
+
+
+def bench_prepare_payload_post(benchmark, check_threshold):
+    benchmark(_V5HTTPManager.prepare_payload, "POST", dict(ORDER))
+    check_threshold(benchmark, "prepare_payload_post")
+
+
+def bench_clean_query(benchmark, check_threshold, http):
+    query = dict(ORDER, cursor=None, limit=None)
+    benchmark(http._clean_query, query)
+    check_threshold(benchmark, "clean_query")
+
+
+def bench_signature_hmac(benchmark, check_threshold):
+    param_str = "1700000000000key5000" + _V5HTTPManager.prepare_payload(
+        "POST", dict(ORDER)
+    )
+    benchmark(generate_signature, False, "secret", param_str)
+    check_threshold(benchmark, "signature_hmac")
+
+
+def bench_signature_rsa(benchmark, check_threshold, rsa_private_key):
+    param_str = "1700000000000key5000" + _V5HTTPManager.prepare_payload(
+        "POST", dict(ORDER)
+    )
+    benchmark(generate_signature, True, rsa_private_key, param_str)
+    check_threshold(benchmark, "signature_rsa")
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+
+import pytest
+
+
+IMPORT_SCRIPT = (
+    "import time; start = time.perf_counter(); "
+    "{statement}; "
+    "print(time.perf_counter() - start)"
+)
+
+
+@pytest.mark.parametrize("name, statement", [
+    ("import_unified_trading", "import pybit.unified_trading"),
+    ("import_market_client", "from pybit.clients import MarketHTTP"),
+])
+def bench_import(benchmark, check_threshold, name, statement):
+    """Cold import time, each round in a fresh interpreter. The threshold
+    applies to the fastest import measured inside the subprocess, so
+    interpreter start-up is excluded."""
+    import_times = []
+
+    def import_in_subprocess():
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT.format(statement=statement)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        import_times.append(float(output))
+
+    benchmark.pedantic(import_in_subprocess, rounds=5, iterations=1)
+    benchmark.extra_info["import_time"] = min(import_times)
+    check_threshold(benchmark, name, min(import_times))
@@ -0,0 +1,266 @@
+import itertools
+
+import pytest
+
+from pybit._websocket_stream import _V5WebSocketManager
+from pybit._websocket_trading import _V5TradeWebSocketManager
+
+
+class _NullWS:
+    def send(self, message):
+        pass
+
+
+def _manager(**kwargs):
+    return _V5WebSocketManager("Benchmark", testnet=False, **kwargs)
+
+
+def _snapshot(topic, depth):
+    return {
+        "topic": topic,
+        "type": "snapshot",
+        "ts": 1700000000000,
+        "data": {
+            "s": "BTCUSDT",
+            "b": [[str(30000 - i * 0.5), "1.000"] for i in range(depth)],
+            "a": [[str(30000.5 + i * 0.5), "1.000"] for i in range(depth)],
+            "u": 1,
+            "seq": 1,
+        },
+        "cts": 1700000000000,
+    }
+
+
+def _deltas(topic, depth):
+    """A cycle of deltas which update the middle level on each side and
+    insert/delete a level beyond the deepest one, so the book stays at a
+    steady `depth` levels however many rounds are run."""
+    middle = depth // 2
+    inner_bid = str(30000 - middle * 0.5)
+    inner_ask = str(30000.5 + middle * 0.5)
+    outer_bid = str(30000 - depth * 0.5)
+    outer_ask = str(30000.5 + depth * 0.5)
+
+    def delta(u, bids, asks):
+        return {
+            "topic": topic,
+            "type": "delta",
+            "ts": 1700000000000 + u,
+            "data": {"s": "BTCUSDT", "b": bids, "a": asks, "u": u, "seq": u},
+            "cts": 1700000000000 + u,
+        }
+
+    return itertools.cycle([
+        delta(2, [[inner_bid, "2.000"], [outer_bid, "1.000"]],
+              [[inner_ask, "2.000"], [outer_ask, "1.000"]]),
+        delta(3, [[inner_bid, "1.000"], [outer_bid, "0"]],
+              [[inner_ask, "1.000"], [outer_ask, "0"]]),
+    ])
+
+
+@pytest.mark.parametrize("depth", [1, 50, 200, 500])
+def bench_process_delta_orderbook(benchmark, check_threshold, depth):
+    topic = f"orderbook.{depth}.BTCUSDT"
+    ws = _manager()
+    ws._process_delta_orderbook(_snapshot(topic, depth), topic)
+    deltas = _deltas(topic, depth)
+
+    benchmark(lambda: ws._process_delta_orderbook(next(deltas), topic))
+    check_threshold(benchmark, f"orderbook_delta_{depth}")
+    assert len(ws.data[topic]["b"]) in (depth, depth + 1)
+
+
+def bench_process_delta_orderbook_trimmed(benchmark, check_threshold):
+    topic = "orderbook.500.BTCUSDT"
+    ws = _manager()
+    ws._set_book_policy("orderbook.500.{symbol}", "BTCUSDT", 25, None)
+    ws._process_delta_orderbook(_snapshot(topic, 500), topic)
+    deltas = _deltas(topic, 50)
+
+    benchmark(lambda: ws._process_delta_orderbook(next(deltas), topic))
+    check_threshold(benchmark, "orderbook_delta_500_top_25")
+    assert len(ws.data[topic]["b"]) == 25
+
+
+def bench_process_delta_ticker(benchmark, check_threshold):
+    topic = "tickers.BTCUSDT"
+    ws = _manager()
+    ws._process_delta_ticker(
+        {"topic": topic, "type": "snapshot", "data": {
+            "symbol": "BTCUSDT", "lastPrice": "30000", "bid1Price": "29999.5",
+            "ask1Price": "30000", "volume24h": "1000", "fundingRate": "0.0001",
+        }},
+        topic,
+    )
+    delta = {"topic": topic, "type": "delta", "data": {
+        "symbol": "BTCUSDT", "bid1Price": "30000", "ask1Price": "30000.5",
+    }}
+
+    benchmark(ws._process_delta_ticker, delta, topic)
+    check_threshold(benchmark, "ticker_delta")
+
+
+@pytest.mark.parametrize("typed", [False, True])
+def bench_handle_incoming_orderbook(benchmark, check_threshold, typed):
+    topic = "orderbook.50.BTCUSDT"
+    ws = _manager(typed_messages=typed)
+    ws._set_callback(topic, lambda message: None)
+    ws._handle_incoming_message(_snapshot(topic, 50))
+    deltas = _deltas(topic, 50)
+
+    benchmark(lambda: ws._handle_incoming_message(next(deltas)))
+    check_threshold(
+        benchmark,
+        "handle_incoming_orderbook_50" + ("_typed" if typed else ""),
+    )
+
+
+def bench_handle_incoming_trade(benchmark, check_threshold):
+    topic = "publicTrade.BTCUSDT"
+    ws = _manager()
+    ws._set_callback(topic, lambda message: None)
+    message = {"topic": topic, "type": "snapshot", "ts": 1700000000000, "data": [{
+        "T": 1700000000000, "s": "BTCUSDT", "S": "Buy", "v": "0.001",
+        "p": "30000", "L": "PlusTick", "i": "trade-id", "BT": False,
+    }]}
+
+    benchmark(ws._handle_incoming_message, message)
+    check_threshold(benchmark, "handle_incoming_trade")
+
+
+def bench_trade_ws_serialization(benchmark, check_threshold):
+    ws = _V5TradeWebSocketManager.__new__(_V5TradeWebSocketManager)
+    ws.callback_directory = {}
+    ws.recv_window = 5000
+    ws.referral_id = ""
+    ws.ws = _NullWS()
+    ws.auth = True
+    ws._init_request_state()
+    order = {
+        "category": "linear", "symbol": "BTCUSDT", "side": "Buy",
+        "orderType": "Limit", "qty": "0.001", "price": "30000",
+        "timeInForce": "PostOnly",
+    }
+
+    def send():
+        ws._send_order_operation("order.create", None, order)
+        ws.callback_directory.clear()
+        ws._sent_times.clear()
+        ws._sent_requests.clear()
+
+    benchmark(send)
+    check_threshold(benchmark, "trade_ws_serialization")
+
+
+def bench_trade_ws_frame(benchmark, check_threshold):
+    ws = _V5TradeWebSocketManager.__new__(_V5TradeWebSocketManager)
+    ws.recv_window = 5000
+    ws.referral_id = ""
+    ws._init_request_state()
+    order = {
+        "category": "linear", "symbol": "BTCUSDT", "side": "Buy",
+        "orderType": "Limit", "qty": "0.001", "price": "30000",
+        "timeInForce": "PostOnly",
+    }
+
+    benchmark(lambda: ws._serialize(
+        ws._request_id_prefix + str(next(ws._request_ids)), "order.create", order
+    ))
+    check_threshold(benchmark, "trade_ws_frame")
+
+
+def bench_trade_tape_append(benchmark, check_threshold):
+    from pybit.trade_tape import TradeTape
+
+    tape = TradeTape(capacity=10000)
+    timestamps = itertools.count(1700000000000)
+    benchmark(lambda: tape.append(next(timestamps), 30000.5, 0.001, "Buy"))
+    check_threshold(benchmark, "trade_tape_append")
+
+
+def bench_trade_tape_window_stats(benchmark, check_threshold):
+    from pybit.trade_tape import TradeTape
+
+    tape = TradeTape(capacity=10000)
+    for i in range(10000):
+        tape.append(1700000000000 + i, 30000 + i % 7, 0.001, "Buy" if i % 3 else "Sell")
+    benchmark(tape.window_stats, 5000)
+    check_threshold(benchmark, "trade_tape_window_stats")
+
+
+def bench_shared_market_data_publish(benchmark, check_threshold):
+    from pybit.shared_market_data import SharedMarketDataPublisher
+
+    message = _snapshot("orderbook.50.BTCUSDT", 50)
+    with SharedMarketDataPublisher(["BTCUSDT"], depth=25) as publisher:
+        benchmark(publisher.handle_message, message)
+    check_threshold(benchmark, "shared_market_data_publish_25")
+
+
+def bench_shared_market_data_publish_500(benchmark, check_threshold):
+    from pybit.shared_market_data import SharedMarketDataPublisher
+
+    message = _snapshot("orderbook.500.BTCUSDT", 500)
+    with SharedMarketDataPublisher(["BTCUSDT"], depth=25) as publisher:
+        benchmark(publisher.handle_message, message)
+    check_threshold(benchmark, "shared_market_data_publish_500_top_25")
+
+
+def bench_shared_market_data_read(benchmark, check_threshold):
+    from pybit.shared_market_data import (
+        SharedMarketDataPublisher, SharedMarketDataReader,
+    )
+
+    with SharedMarketDataPublisher(["BTCUSDT"], depth=25) as publisher:
+        publisher.handle_message(_snapshot("orderbook.50.BTCUSDT", 50))
+        with SharedMarketDataReader(publisher.name) as reader:
+            benchmark(reader.get_orderbook, "BTCUSDT")
+    check_threshold(benchmark, "shared_market_data_read_25")
+
+
+def bench_book_arrays_update(benchmark, check_threshold):
+    pytest.importorskip("numpy")
+    from pybit.book_arrays import BookArrays
+
+    book = BookArrays(depth=25)
+    data = _snapshot("orderbook.50.BTCUSDT", 50)["data"]
+    benchmark(book.update, data)
+    check_threshold(benchmark, "book_arrays_update_25")
+
+
+def bench_book_arrays_update_sorted_500(benchmark, check_threshold):
+    pytest.importorskip("numpy")
+    from pybit.book_arrays import BookArrays
+
+    # A maintained book, as fed by WebSocket: only the top 25 are parsed.
+    book = BookArrays(depth=25)
+    data = _snapshot("orderbook.500.BTCUSDT", 500)["data"]
+    benchmark(book.update, data, is_sorted=True)
+    check_threshold(benchmark, "book_arrays_update_500_top_25")
+
+
+def bench_ticker_table_delta(benchmark, check_threshold):
+    from pybit.ticker_table import TickerTable
+
+    table = TickerTable()
+    table.handle_message({"type": "snapshot", "ts": 1, "data": {
+        "symbol": "BTCUSDT", "lastPrice": "30000", "turnover24h": "1000",
+    }})
+    delta = {"type": "delta", "ts": 2, "data": {
+        "symbol": "BTCUSDT", "bid1Price": "30000", "ask1Price": "30000.5",
+        "lastPrice": "30000.5",
+    }}
+    benchmark(table.handle_message, delta)
+    check_threshold(benchmark, "ticker_table_delta")
+
+
+def bench_ticker_table_top_500(benchmark, check_threshold):
+    from pybit.ticker_table import TickerTable
+
+    table = TickerTable()
+    for i in range(500):
+        table.handle_message({"type": "snapshot", "ts": 1, "data": {
+            "symbol": f"SYM{i}USDT", "turnover24h": str((i * 7919) % 1000),
+        }})
+    benchmark(table.top, "turnover24h", 20)
+    check_threshold(benchmark, "ticker_table_top_500")
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+
+# Upper bounds, in seconds, for the mean time of a single call of each
+# benchmark, set at roughly four times the mean measured on a laptop so that
+# only real regressions fail; scale them for slower machines (eg CI) with
+# the PYBIT_BENCH_SCALE environment variable.
+THRESHOLDS = {
+    "prepare_payload_get": 25e-6,
+    "prepare_payload_post": 40e-6,
+    "clean_query": 15e-6,
+    "signature_hmac": 20e-6,
+    "signature_rsa": 150e-3,
+    "orderbook_delta_1": 20e-6,
+    "orderbook_delta_50": 20e-6,
+    "orderbook_delta_200": 20e-6,
+    "orderbook_delta_500": 20e-6,
+    "orderbook_delta_500_top_25": 20e-6,
+    "ticker_delta": 5e-6,
+    "handle_incoming_orderbook_50": 200e-6,
+    "handle_incoming_orderbook_50_typed": 200e-6,
+    "handle_incoming_trade": 10e-6,
+    "trade_ws_serialization": 60e-6,
+    "trade_ws_frame": 20e-6,
+    "trade_tape_append": 10e-6,
+    "trade_tape_window_stats": 20e-6,
+    "shared_market_data_publish_25": 100e-6,
+    "shared_market_data_publish_500_top_25": 100e-6,
+    "shared_market_data_read_25": 20e-6,
+    "book_arrays_update_25": 100e-6,
+    "book_arrays_update_500_top_25": 100e-6,
+    "ticker_table_delta": 5e-6,
+    "ticker_table_top_500": 250e-6,
+    "import_unified_trading": 0.4,
+    "import_market_client": 0.3,
+}
+
+SCALE = float(os.environ.get("PYBIT_BENCH_SCALE", "1"))
+
+
+@pytest.fixture
+def check_threshold():
+    """Fail the benchmark if its mean exceeds THRESHOLDS[name] * SCALE."""
+
+    def check(benchmark, name, value=None):
+        if value is None:
+            value = benchmark.stats.stats.mean
+        limit = THRESHOLDS[name] * SCALE
+        benchmark.extra_info["threshold"] = limit
+        assert value <= limit, (
+            f"{name} took {value * 1e6:.1f}us, above its "
+            f"{limit * 1e6:.1f}us threshold"
+        )
+
+    return check
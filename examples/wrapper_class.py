@@ -1,4 +1,5 @@
 from pybit.unified_trading import HTTP
+from pybit.instruments import InstrumentRegistry
 
 
 BYBIT_API_KEY = "api_key"
@@ -19,16 +20,16 @@ class BybitWrapper:
             testnet=testnet,
             log_requests=True,
         )
+        self.instruments = InstrumentRegistry(self.instance)
 
     def get_max_leverage(self, category: str, symbol: str):
         """
         Get max leverage for symbol in category
         """
-        symbols = self.instance.get_instruments_info(category=category)
-        result = symbols["result"]["list"]
-        return [d for d in result if d["symbol"] == symbol][0][
-            "leverageFilter"
-        ]["maxLeverage"]
+        if not self.instruments.symbols(category):
+            # Download the category once; later lookups are served locally.
+            self.instruments.refresh(category)
+        return self.instruments[category, symbol].max_leverage
 
     def get_kline_data(self, symbol: str = "BTCUSDT"):
         kline_data = self.instance.get_kline(
@@ -3,18 +3,21 @@ from dataclasses import dataclass, field
 import time
 import hmac
 import hashlib
-from Crypto.Hash import SHA256
-from Crypto.PublicKey import RSA
-from Crypto.Signature import PKCS1_v1_5
 import base64
+import functools
+import itertools
 import json
 import logging
+import mimetypes
 import os
+import uuid
 import requests
 
 from datetime import datetime as dt, timezone
 
 from .exceptions import FailedRequestError, InvalidRequestError
+from ._response_cache import _ResponseCache, DEFAULT_CACHE_TTLS
+from ._single_flight import _SingleFlight
 from . import _helpers
 
 # Requests will use simplejson if available.
@@ -44,6 +47,18 @@ class _RetryableRequestError(Exception):
         super().__init__("Retryable error occurred, retrying...")
 
 
+@functools.lru_cache(maxsize=8)
+def _rsa_signer(secret):
+    """
+    Parses the RSA private key once per secret. pycryptodome is only
+    imported here, so that HMAC users never load it.
+    """
+    from Crypto.PublicKey import RSA
+    from Crypto.Signature import PKCS1_v1_5
+
+    return PKCS1_v1_5.new(RSA.importKey(secret))
+
+
 def generate_signature(use_rsa_authentication, secret, param_str):
     def generate_hmac():
         hash = hmac.new(
@@ -54,12 +69,10 @@ def generate_signature(use_rsa_authentication, secret, param_str):
         return hash.hexdigest()
 
     def generate_rsa():
+        from Crypto.Hash import SHA256
+
         hash = SHA256.new(param_str.encode("utf-8"))
-        encoded_signature = base64.b64encode(
-            PKCS1_v1_5.new(RSA.importKey(secret)).sign(
-                hash
-            )
-        )
+        encoded_signature = base64.b64encode(_rsa_signer(secret).sign(hash))
         return encoded_signature.decode()
 
     if not use_rsa_authentication:
@@ -69,21 +82,26 @@ def generate_signature(use_rsa_authentication, secret, param_str):
 
 
 def generate_signature_binary(use_rsa_authentication, secret, param_bytes):
+    """
+    Signs a binary payload. `param_bytes` may also be an iterable of byte
+    chunks, which are hashed incrementally without joining them.
+    """
+    if isinstance(param_bytes, (bytes, bytearray, memoryview)):
+        param_bytes = [param_bytes]
+
     def generate_hmac():
-        hash = hmac.new(
-            bytes(secret, "utf-8"),
-            param_bytes,
-            hashlib.sha256,
-        )
+        hash = hmac.new(bytes(secret, "utf-8"), digestmod=hashlib.sha256)
+        for chunk in param_bytes:
+            hash.update(chunk)
         return hash.hexdigest()
 
     def generate_rsa():
-        hash = SHA256.new(param_bytes)
-        encoded_signature = base64.b64encode(
-            PKCS1_v1_5.new(RSA.importKey(secret)).sign(
-                hash
-            )
-        )
+        from Crypto.Hash import SHA256
+
+        hash = SHA256.new()
+        for chunk in param_bytes:
+            hash.update(chunk)
+        encoded_signature = base64.b64encode(_rsa_signer(secret).sign(hash))
         return encoded_signature.decode()
 
     if not use_rsa_authentication:
@@ -92,6 +110,81 @@ def generate_signature_binary(use_rsa_authentication, secret, param_bytes):
         return generate_rsa()
 
 
+class _MultipartFileBody:
+    """
+    A single-file multipart/form-data body which is streamed from its source
+    (bytes, a path or a seekable file-like) rather than assembled in memory.
+
+    Iterating yields the body in chunks; every iteration starts from the
+    beginning, so the same body can be signed and then sent. `len()` gives
+    the exact size, which lets requests send a Content-Length header instead
+    of falling back to chunked transfer encoding.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        source,
+        filename,
+        field_name="upload_file",
+        boundary=None,
+        offset=None,
+    ):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        file_content_type = (
+            mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        )
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; '
+            f'filename="{filename}"\r\n'
+            f"Content-Type: {file_content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._source = source
+
+        if isinstance(source, bytes):
+            self._offset = 0
+            self._size = len(source)
+        elif isinstance(source, str):
+            self._offset = 0
+            self._size = os.path.getsize(source)
+        else:
+            # A file-like is read from `offset`, by default its position now.
+            self._offset = source.tell() if offset is None else offset
+            self._size = source.seek(0, os.SEEK_END) - self._offset
+            source.seek(self._offset)
+
+    def __len__(self):
+        return len(self._head) + self._size + len(self._tail)
+
+    def __iter__(self):
+        yield self._head
+        if isinstance(self._source, bytes):
+            yield self._source
+        elif isinstance(self._source, str):
+            with open(self._source, "rb") as file:
+                yield from self._read_chunks(file)
+        else:
+            self._source.seek(self._offset)
+            yield from self._read_chunks(self._source)
+            self._source.seek(self._offset)
+        yield self._tail
+
+    def _read_chunks(self, file):
+        remaining = self._size
+        while remaining > 0:
+            chunk = file.read(min(self.CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            remaining -= len(chunk)
+            yield chunk
+
+
 @dataclass
 class _V5HTTPManager:
     testnet: bool = field(default=False)
@@ -113,6 +206,13 @@ class _V5HTTPManager:
     referral_id: str = field(default=None)
     record_request_time: bool = field(default=False)
     return_response_headers: bool = field(default=False)
+    cache_responses: bool = field(default=False)
+    cache_ttls: dict = field(default_factory=dict)
+    cache_max_entries: int = field(default=512)
+    coalesce_requests: bool = field(default=False)
+    endpoint: str = field(default=None)
+    session: requests.Session = field(default=None)
+    rate_limiter: object = field(default=None)
 
     def __post_init__(self):
         subdomain = SUBDOMAIN_TESTNET if self.testnet else SUBDOMAIN_MAINNET
@@ -123,14 +223,16 @@ class _V5HTTPManager:
             else:
                 subdomain = DEMO_SUBDOMAIN_MAINNET
         url = HTTP_URL.format(SUBDOMAIN=subdomain, DOMAIN=domain, TLD=self.tld)
-        self.endpoint = url
+        # A custom endpoint (eg a local mock exchange) overrides the URL
+        # derived from testnet/demo/domain/tld.
+        self.endpoint = self.endpoint.rstrip("/") if self.endpoint else url
 
         if not self.ignore_codes:
             self.ignore_codes = set()
         if not self.retry_codes:
             self.retry_codes = {10002, 10006, 30034, 30035, 130035, 130150}
         self.logger = logging.getLogger(__name__)
-        if len(logging.root.handlers) == 0:
+        if len(logging.root.handlers) == 0 and not self.logger.handlers:
             # no handler on root logger set -> we add handler just for this logger to not mess with custom logic from
             # outside
             handler = logging.StreamHandler()
@@ -145,15 +247,59 @@ class _V5HTTPManager:
 
         self.logger.debug("Initializing HTTP session.")
 
-        self.client = requests.Session()
+        # A session passed in may be shared with other clients (see
+        # pybit.session_pool), so client specific headers are then sent with
+        # each request instead of being set on the session.
+        self.client = self.session if self.session is not None else requests.Session()
         self.client.headers.update(
             {
                 "Content-Type": "application/json",
                 "Accept": "application/json",
             }
         )
+        self._request_headers = {}
         if self.referral_id:
-            self.client.headers.update({"Referer": self.referral_id})
+            if self.session is None:
+                self.client.headers.update({"Referer": self.referral_id})
+            else:
+                self._request_headers["Referer"] = self.referral_id
+
+        # Opt-in cache for rarely changing reference data. User supplied TTLs
+        # extend or override the defaults; a TTL of 0 disables an endpoint.
+        self._response_cache = None
+        if self.cache_responses:
+            ttls = {**DEFAULT_CACHE_TTLS, **{
+                str(endpoint): ttl for endpoint, ttl in self.cache_ttls.items()
+            }}
+            self._response_cache = _ResponseCache(
+                {endpoint: ttl for endpoint, ttl in ttls.items() if ttl},
+                max_entries=self.cache_max_entries,
+            )
+
+        # Opt-in sharing of one in-flight response among identical
+        # concurrent GET requests.
+        self._single_flight = _SingleFlight() if self.coalesce_requests else None
+
+    @staticmethod
+    def _cast_values(parameters):
+        """
+        Casts order values to the types the API expects, in place.
+        """
+        string_params = [
+            "qty",
+            "price",
+            "triggerPrice",
+            "takeProfit",
+            "stopLoss",
+        ]
+        integer_params = ["positionIdx"]
+        for key, value in parameters.items():
+            if key in string_params:
+                if type(value) != str:
+                    parameters[key] = str(value)
+            elif key in integer_params:
+                if type(value) != int:
+                    parameters[key] = int(value)
 
     @staticmethod
     def prepare_payload(method, parameters):
@@ -161,23 +307,6 @@ class _V5HTTPManager:
         Prepares the request payload and validates parameter value types.
         """
 
-        def cast_values():
-            string_params = [
-                "qty",
-                "price",
-                "triggerPrice",
-                "takeProfit",
-                "stopLoss",
-            ]
-            integer_params = ["positionIdx"]
-            for key, value in parameters.items():
-                if key in string_params:
-                    if type(value) != str:
-                        parameters[key] = str(value)
-                elif key in integer_params:
-                    if type(value) != int:
-                        parameters[key] = int(value)
-
         if method == "GET":
             payload = "&".join(
                 [
@@ -188,7 +317,7 @@ class _V5HTTPManager:
             )
             return payload
         else:
-            cast_values()
+            _V5HTTPManager._cast_values(parameters)
             return json.dumps(parameters)
 
     def _auth(self, payload, recv_window, timestamp):
@@ -213,9 +342,11 @@ class _V5HTTPManager:
         if self.api_key is None or self.api_secret is None:
             raise PermissionError("Authenticated endpoints require keys.")
 
-        param_bytes = (
-            str(timestamp) + self.api_key + str(recv_window)
-        ).encode("utf-8") + payload
+        prefix = (str(timestamp) + self.api_key + str(recv_window)).encode("utf-8")
+        if isinstance(payload, _MultipartFileBody):
+            param_bytes = itertools.chain([prefix], payload)
+        else:
+            param_bytes = prefix + payload
 
         return generate_signature_binary(
             self.rsa_authentication, self.api_secret, param_bytes
@@ -226,12 +357,39 @@ class _V5HTTPManager:
         Submits the request to the API.
         """
         query = self._clean_query(query)
+
+        cache_key, cache_ttl = self._get_cache_key(method, path, query, auth)
+        if cache_key is not None:
+            cached_response = self._response_cache.get(cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        if method == "GET" and self._single_flight is not None:
+            response = self._single_flight.do(
+                self._get_request_key(path, query, auth),
+                lambda: self._send_request(method, path, query, auth),
+            )
+        else:
+            response = self._send_request(method, path, query, auth)
+
+        if cache_key is not None and self._is_successful_response(response):
+            self._response_cache.set(cache_key, response, cache_ttl)
+        return response
+
+    def _send_request(self, method, path, query, auth):
+        """
+        Sends the request, retrying on retryable errors.
+        """
         recv_window = self.recv_window
         retries_attempted = self.max_retries
 
         while retries_attempted > 0:
             retries_attempted -= 1
             try:
+                # Wait for the rate limiter before signing, so that the
+                # signed timestamp does not age while waiting.
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
                 req_params = self.prepare_payload(method, query)
                 headers = self._prepare_headers(req_params, recv_window) if auth else {}
 
@@ -265,13 +423,27 @@ class _V5HTTPManager:
         Submits an authenticated multipart file request to the API.
         """
         query = self._clean_query(query)
+        if "upload_file" not in query:
+            raise ValueError("Missing required parameter: upload_file")
+        # Normalised once, before any attempt reads the file: a file which
+        # is not seekable is buffered, and the start of a file-like is
+        # remembered, since a failed attempt may leave it anywhere.
+        source, filename = self._normalize_upload_input(
+            query["upload_file"], filename=query.get("filename")
+        )
+        offset = None if isinstance(source, (bytes, str)) else source.tell()
+        query = {**query, "upload_file": source, "filename": filename}
         recv_window = self.recv_window
         retries_attempted = self.max_retries
 
         while retries_attempted > 0:
             retries_attempted -= 1
             try:
-                req_params, content_type = self.prepare_file_payload(query)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
+                req_params, content_type = self.prepare_file_stream(
+                    query, offset=offset
+                )
                 headers = (
                     self._prepare_headers(
                         req_params,
@@ -323,6 +495,62 @@ class _V5HTTPManager:
             resp_headers=None,
         )
 
+    def _get_endpoint_path(self, path):
+        if path.startswith(self.endpoint):
+            return path[len(self.endpoint):]
+        return path
+
+    def _get_request_key(self, path, query, auth):
+        """
+        Identifies a GET request by endpoint, normalized (sorted) query and
+        API key.
+        """
+        return (
+            self._get_endpoint_path(path),
+            self.prepare_payload("GET", query),
+            self.api_key if auth else None,
+        )
+
+    def _get_cache_key(self, method, path, query, auth):
+        """
+        Returns the response cache key and TTL for a request, or (None, None)
+        if the request must not be cached.
+        """
+        if self._response_cache is None or method != "GET":
+            return None, None
+        ttl = self._response_cache.ttl_for(self._get_endpoint_path(path))
+        if not ttl:
+            return None, None
+        return self._get_request_key(path, query, auth), ttl
+
+    @staticmethod
+    def _is_successful_response(response):
+        s_json = response[0] if isinstance(response, tuple) else response
+        return not s_json.get("retCode", s_json.get("ret_code"))
+
+    def invalidate_response_cache(self, endpoint=None) -> int:
+        """Drop cached responses.
+
+        Args:
+            endpoint (string): Only drop responses for this endpoint path, eg
+                "/v5/market/instruments-info". Drops everything if omitted.
+
+        Returns:
+            The number of cached responses removed.
+        """
+        if self._response_cache is None:
+            return 0
+        return self._response_cache.invalidate(
+            str(endpoint) if endpoint is not None else None
+        )
+
+    def get_response_cache_stats(self) -> dict:
+        """Returns hit, miss and eviction counts of the response cache, or
+        None if `cache_responses` is disabled."""
+        if self._response_cache is None:
+            return None
+        return self._response_cache.stats()
+
     def _clean_query(self, query):
         """Remove None values and fix floats."""
         if query is None:
@@ -335,7 +563,7 @@ class _V5HTTPManager:
     def _prepare_headers(self, payload, recv_window, content_type="application/json"):
         """Prepare headers for authenticated request."""
         timestamp = _helpers.generate_timestamp()
-        if isinstance(payload, bytes):
+        if isinstance(payload, (bytes, _MultipartFileBody)):
             signature = self._auth_binary(
                 payload=payload,
                 recv_window=recv_window,
@@ -358,6 +586,10 @@ class _V5HTTPManager:
 
     @staticmethod
     def _normalize_upload_input(upload_file, filename=None):
+        """
+        Returns the upload source (bytes, a path or a seekable file-like) and
+        its filename, without reading the file.
+        """
         if isinstance(upload_file, (bytes, bytearray, memoryview)):
             if not filename:
                 raise ValueError("filename is required when passing raw bytes.")
@@ -365,65 +597,57 @@ class _V5HTTPManager:
 
         if isinstance(upload_file, (str, os.PathLike)):
             path = os.fspath(upload_file)
-            with open(path, "rb") as file:
-                return file.read(), filename or os.path.basename(path)
+            return path, filename or os.path.basename(path)
 
         if hasattr(upload_file, "read"):
-            position = None
-            if hasattr(upload_file, "tell") and hasattr(upload_file, "seek"):
-                try:
-                    position = upload_file.tell()
-                except Exception:
-                    position = None
-
-            data = upload_file.read()
-            if position is not None:
-                try:
-                    upload_file.seek(position)
-                except Exception:
-                    pass
-
             filename = filename or getattr(upload_file, "name", None)
             if not filename:
                 raise ValueError(
                     "filename is required when passing a file-like without name."
                 )
-            if isinstance(data, str):
-                data = data.encode("utf-8")
-            return data, os.path.basename(str(filename))
+            filename = os.path.basename(str(filename))
+
+            try:
+                upload_file.seek(upload_file.tell())
+            except Exception:
+                # Not seekable, so it can't be read twice (once to sign, once
+                # to send): buffer it.
+                data = upload_file.read()
+                if isinstance(data, str):
+                    data = data.encode("utf-8")
+                return data, filename
+            return upload_file, filename
 
         raise TypeError(f"Unsupported upload_file type: {type(upload_file)!r}")
 
     @classmethod
-    def prepare_file_payload(cls, parameters):
+    def prepare_file_stream(cls, parameters, offset=None):
         """
-        Prepares multipart payload for authenticated file uploads.
+        Prepares a streamed multipart payload for authenticated file uploads.
+        A file-like is read from `offset`, by default its current position.
         """
         if "upload_file" not in parameters:
             raise ValueError("Missing required parameter: upload_file")
 
-        data, filename = cls._normalize_upload_input(
+        source, filename = cls._normalize_upload_input(
             parameters["upload_file"],
             filename=parameters.get("filename"),
         )
-        boundary = "boundary-for-file"
-        content_type = f"multipart/form-data; boundary={boundary}"
-        body = b"".join(
-            [
-                f"--{boundary}\r\n".encode("utf-8"),
-                (
-                    'Content-Disposition: form-data; name="upload_file"; '
-                    f'filename="{filename}"\r\n'
-                ).encode("utf-8"),
-                b"Content-Type: image/png\r\n\r\n",
-                data,
-                f"\r\n--{boundary}--\r\n".encode("utf-8"),
-            ]
-        )
-        return body, content_type
+        body = _MultipartFileBody(source, filename, offset=offset)
+        return body, body.content_type
+
+    @classmethod
+    def prepare_file_payload(cls, parameters):
+        """
+        Prepares multipart payload for authenticated file uploads, as bytes.
+        """
+        body, content_type = cls.prepare_file_stream(parameters)
+        return b"".join(body), content_type
 
     def _prepare_request(self, method, path, params, headers):
         """Prepare request object."""
+        if self._request_headers:
+            headers = {**self._request_headers, **headers}
         if method == "GET" and params:
             return self.client.prepare_request(requests.Request(method, f"{path}?{params}", headers=headers))
         return self.client.prepare_request(requests.Request(method, path, data=params, headers=headers))
@@ -0,0 +1,49 @@
+import threading
+import time
+
+
+class _TokenBucket:
+    """
+    Blocks callers of acquire() so that on average at most `rate` calls per
+    second get through, with bursts of up to `capacity` calls.
+
+    Tokens are reserved rather than polled for: a caller which finds the
+    bucket empty takes a token in advance and sleeps until it would have
+    been refilled, so waiting threads are served in arrival order.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self):
+        """Take a token, sleeping if necessary. Returns the time slept."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def try_acquire(self):
+        """Take a token only if one is available now. Returns 0.0 if one
+        was taken, otherwise the seconds until one will be available."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
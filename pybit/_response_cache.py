@@ -0,0 +1,93 @@
+from collections import OrderedDict
+import copy
+import threading
+import time
+
+from .account import Account
+from .asset import Asset
+from .market import Market
+
+
+# Reference data which changes rarely, and how long (in seconds) a cached
+# response for it stays fresh. Endpoints not listed here are never cached
+# unless the user adds them via `cache_ttls`.
+DEFAULT_CACHE_TTLS = {
+    str(Market.GET_INSTRUMENTS_INFO): 300,
+    str(Market.GET_RISK_LIMIT): 300,
+    str(Account.GET_FEE_RATE): 60,
+    str(Account.GET_COLLATERAL_INFO): 60,
+    str(Account.GET_ACCOUNT_INFO): 60,
+    str(Asset.GET_COIN_INFO): 300,
+}
+
+
+class _ResponseCache:
+    """
+    Thread-safe TTL + LRU cache for HTTP responses.
+
+    Keys are opaque tuples built by the HTTP manager; `ttls` maps an endpoint
+    path (eg "/v5/market/instruments-info") to its time-to-live in seconds.
+    Cached responses are deep-copied on the way in and out so that callers
+    mutating a result cannot corrupt later hits.
+    """
+
+    def __init__(self, ttls, max_entries=512):
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, response = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(response)
+
+    def set(self, key, response, ttl):
+        response = copy.deepcopy(response)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, endpoint=None):
+        """
+        Drop every entry, or only those cached for the given endpoint path.
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            if endpoint is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            keys = [key for key in self._entries if key[0] == endpoint]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
@@ -0,0 +1,63 @@
+import copy
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "waiters", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class _SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs the
+    function, and callers arriving while it is in flight wait for and share
+    its outcome instead of running it again.
+
+    Waiters receive their own deep copy of the result, so the caller that ran
+    the function is free to mutate the object it got back.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                is_leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                is_leader = False
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = func()
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            call.error = e
+            call.done.set()
+            raise
+
+        # Nobody can join once the key is removed, so `waiters` is final.
+        with self._lock:
+            del self._calls[key]
+            waiters = call.waiters
+        if waiters:
+            call.result = copy.deepcopy(result)
+        call.done.set()
+        return result
@@ -0,0 +1,289 @@
+import asyncio
+import inspect
+import json
+import logging
+from uuid import uuid4
+
+try:
+    from websockets.asyncio.client import connect as _ws_connect
+    from websockets.exceptions import ConnectionClosed, WebSocketException
+except ImportError:  # Optional dependency: pip install websockets
+    _ws_connect = None
+
+from ._v5_websocket import WebSocket
+
+
+logger = logging.getLogger("pybit.unified_trading")
+
+_END = object()
+
+
+class MessageStream:
+    """A callback which queues the messages it is called with, for reading
+    with `async for`. When `maxsize` is reached the oldest message is
+    dropped, so a slow reader cannot grow memory without bound.
+
+    Iteration stops when the WebSocket is closed, or stops receiving, and
+    raises the error if reconnecting failed.
+
+    Example:
+        stream = ws.stream()
+        ws.orderbook_stream(50, "BTCUSDT", stream)
+        async for message in stream:
+            ...
+    """
+
+    def __init__(self, maxsize=0):
+        self._queue = asyncio.Queue(maxsize)
+        self._ended = False
+        self._error = None
+        self.dropped = 0
+
+    def __call__(self, message):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(message)
+
+    def _end(self, error=None):
+        # The messages already queued are still read first.
+        if self._ended:
+            return
+        self._ended = True
+        self._error = error
+        self(_END)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self._queue.get()
+        if message is _END:
+            # Ended for every later read too.
+            self._queue.put_nowait(_END)
+            if self._error is not None:
+                raise self._error
+            raise StopAsyncIteration
+        return message
+
+    def __len__(self):
+        return self._queue.qsize()
+
+
+class AsyncWebSocket(WebSocket):
+    """`WebSocket` on asyncio: connections are driven by the event loop, not a
+    thread each, so one loop can serve hundreds of them. Requires the
+    `websockets` package.
+
+    The topic methods are those of `WebSocket` and may be called before or
+    after connecting. Callbacks may be plain functions or coroutine functions;
+    coroutines are awaited in message order. To read messages with
+    `async for`, pass a `stream()` as the callback.
+
+    Example:
+        async with AsyncWebSocket(testnet=True, channel_type="linear") as ws:
+            trades = ws.stream()
+            ws.trade_stream("BTCUSDT", trades)
+            ws.orderbook_stream(50, "BTCUSDT", on_orderbook)  # async def
+            async for message in trades:
+                ...
+
+    `connect()` and `close()` may be used instead of `async with`.
+    """
+
+    def __init__(self, channel_type: str, **kwargs):
+        if _ws_connect is None:
+            raise ImportError(
+                "AsyncWebSocket requires the websockets package: "
+                "pip install websockets"
+            )
+        self._connection = None
+        self._tasks = []
+        self._awaiting = []
+        self._streams = []
+        self._closed = False
+        super().__init__(channel_type, **kwargs)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def stream(self, maxsize=0) -> MessageStream:
+        return MessageStream(maxsize)
+
+    # Connection
+
+    def _connect(self, url):
+        # Called by WebSocket.__init__: only resolve the URL. The connection
+        # is opened by connect(), on the event loop.
+        self.endpoint = self._build_endpoint(url)
+
+    def is_connected(self):
+        return self._connection is not None
+
+    async def connect(self):
+        """Open the connection, authenticate if keys were given, send the
+        subscriptions made so far and start receiving."""
+        self._closed = False
+        await self._open()
+        self._tasks = [
+            asyncio.ensure_future(self._receive()),
+            asyncio.ensure_future(self._ping()),
+        ]
+
+    async def _open(self):
+        retries = self.retries
+        while True:
+            logger.info(f"WebSocket {self.ws_name} attempting connection...")
+            try:
+                connection = await _ws_connect(
+                    self.endpoint,
+                    ping_interval=self.ping_interval,
+                    ping_timeout=self.ping_timeout,
+                )
+                break
+            except (OSError, asyncio.TimeoutError, WebSocketException) as e:
+                retries -= 1
+                if self.retries and retries <= 0:
+                    raise ConnectionError(
+                        f"WebSocket {self.ws_name} ({self.endpoint}) "
+                        f"connection failed: {e}"
+                    ) from e
+                await asyncio.sleep(1)
+        logger.info(f"WebSocket {self.ws_name} connected")
+
+        if self.api_key and self.api_secret:
+            await connection.send(self._auth_message())
+        # Subscriptions made from here on are sent by subscribe() itself.
+        self._connection = connection
+        for subscription_message in list(self.subscriptions.values()):
+            await connection.send(subscription_message)
+
+    def _end_streams(self, error=None):
+        for stream in self._streams:
+            stream._end(error)
+
+    async def _receive(self):
+        try:
+            await self._receive_messages()
+        except Exception as e:
+            # Reconnecting failed: nothing awaits this task, so the error is
+            # passed on to the streams' readers.
+            logger.error(f"WebSocket {self.ws_name} stopped receiving: {e}")
+            self._connection = None
+            self._end_streams(e)
+        else:
+            if not self._closed:
+                self._end_streams()
+
+    async def _receive_messages(self):
+        while not self._closed:
+            try:
+                async for raw_message in self._connection:
+                    message = json.loads(raw_message)
+                    if self._is_custom_pong(message):
+                        continue
+                    try:
+                        self.callback(message)
+                        while self._awaiting:
+                            awaiting, self._awaiting = self._awaiting, []
+                            for coroutine in awaiting:
+                                await coroutine
+                    except Exception:
+                        self._awaiting = []
+                        logger.exception(
+                            f"Handling a message on WebSocket {self.ws_name} "
+                            f"raised an exception."
+                        )
+            except ConnectionClosed as e:
+                if self._closed:
+                    return
+                logger.error(
+                    f"WebSocket {self.ws_name} ({self.endpoint}) "
+                    f"encountered error: {e}."
+                )
+            if self._closed:
+                return
+            # The server ended the connection (or it was lost).
+            self._connection = None
+            self._reset()
+            self._run_callbacks(self.disconnect_callbacks, "Disconnect")
+            if not self.handle_error:
+                return
+            await self._open()
+            self._run_reconnect_callbacks()
+
+    async def _ping(self):
+        while not self._closed:
+            await asyncio.sleep(self.ping_interval)
+            if self._connection is not None:
+                try:
+                    await self._connection.send(self.custom_ping_message)
+                except ConnectionClosed:
+                    pass
+
+    async def close(self):
+        self._closed = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+        self._end_streams()
+        self.exited = True
+
+    def exit(self):
+        """Close the connection from synchronous code running on the event
+        loop; use `await close()` where possible."""
+        asyncio.ensure_future(self.close())
+
+    def _send_soon(self, message):
+        if self._connection is not None:
+            asyncio.ensure_future(self._connection.send(message))
+
+    _send = _send_soon
+
+    # Subscriptions
+
+    def subscribe(self, topic: str, callback, symbol: (str, list) = False):
+        subscription_args = self._prepare_subscription_args(topic, symbol)
+        self._check_callback_directory(subscription_args)
+
+        req_id = str(uuid4())
+        subscription_message = json.dumps(
+            {"op": "subscribe", "req_id": req_id, "args": subscription_args}
+        )
+        self.subscriptions[req_id] = subscription_message
+        for topic in subscription_args:
+            self._set_callback(topic, callback)
+        # Sent on connecting if not connected yet.
+        self._send_soon(subscription_message)
+
+    def unsubscribe(self, topic: str):
+        for subscription in self.subscriptions.values():
+            if topic in subscription:
+                unsub_message = json.loads(subscription)
+                unsub_message["op"] = "unsubscribe"
+                self._send_soon(json.dumps(unsub_message))
+                return
+        logger.error("Couldn't find active subscription for topic: %s", topic)
+
+    def _set_callback(self, topic, callback_function):
+        if (
+            isinstance(callback_function, MessageStream)
+            and callback_function not in self._streams
+        ):
+            self._streams.append(callback_function)
+        if inspect.iscoroutinefunction(callback_function):
+            coroutine_function = callback_function
+
+            def callback_function(message):
+                # Awaited by _receive() once the message has been processed.
+                self._awaiting.append(coroutine_function(message))
+
+        super()._set_callback(topic, callback_function)
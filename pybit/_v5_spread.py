@@ -1,10 +1,22 @@
 from ._http_manager import _V5HTTPManager
-from ._websocket_stream import _V5WebSocketManager
 from .spread import Spread
 
 
-WSS_NAME = "Spread Trading"
-PUBLIC_WSS = "wss://{SUBDOMAIN}.{DOMAIN}.com/v5/public/spread"
+# The spread WebSocket lives in _v5_websocket, so that importing SpreadHTTP
+# does not import websocket-client. Its names still resolve here, on first
+# access.
+_WEBSOCKET_ATTRIBUTES = {
+    "_V5WebSocketSpreadTrading": "_V5WebSocketSpreadTrading",
+    "WSS_NAME": "SPREAD_WSS_NAME",
+    "PUBLIC_WSS": "SPREAD_PUBLIC_WSS",
+}
+
+
+def __getattr__(name):
+    if name in _WEBSOCKET_ATTRIBUTES:
+        from . import _v5_websocket
+        return getattr(_v5_websocket, _WEBSOCKET_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class SpreadHTTP(_V5HTTPManager):
@@ -178,13 +190,3 @@ class SpreadHTTP(_V5HTTPManager):
             query=kwargs,
             auth=True,
         )
-
-
-class _V5WebSocketSpreadTrading(_V5WebSocketManager):
-    def __init__(
-        self,
-        **kwargs,
-    ):
-        super().__init__(WSS_NAME, **kwargs)
-        self.WS_URL = PUBLIC_WSS
-        self._connect(self.WS_URL)
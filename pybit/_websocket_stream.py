@@ -2,7 +2,12 @@ import websocket
 import threading
 import time
 import json
+from bisect import bisect_left, bisect_right
+import re
 from ._http_manager import generate_signature
+from .models import decode_message
+from .trade_tape import TradeTape
+from .ticker_table import TickerTable
 import logging
 import copy
 from uuid import uuid4
@@ -11,6 +16,10 @@ from . import _helpers
 
 logger = logging.getLogger(__name__)
 
+# Order book sides and the sign which makes their price keys ascend from the
+# best level: bids are kept descending, asks ascending.
+_BOOK_SIDES = (("b", -1), ("a", 1))
+
 
 SUBDOMAIN_TESTNET = "stream-testnet"
 SUBDOMAIN_MAINNET = "stream"
@@ -40,12 +49,16 @@ class _WebSocketManager:
         restart_on_error=True,
         trace_logging=False,
         private_auth_expire=1,
+        endpoint=None,
     ):
         self.testnet = testnet
         self.domain = domain
         self.tld = tld
         self.rsa_authentication = rsa_authentication
         self.demo = demo
+        # Custom base URL (eg "ws://127.0.0.1:8765") which replaces the
+        # scheme and host of the Bybit URLs, keeping their paths.
+        self.custom_endpoint = endpoint.rstrip("/") if endpoint else None
         # Set API keys.
         self.api_key = api_key
         self.api_secret = api_secret
@@ -68,6 +81,13 @@ class _WebSocketManager:
         # connection is broken.
         self.subscriptions = []
 
+        # Functions called without arguments after a successful reconnect,
+        # eg to resynchronise state which may have changed while offline.
+        self.reconnect_callbacks = []
+        # Functions called without arguments as soon as the connection has
+        # been lost, before reconnecting.
+        self.disconnect_callbacks = []
+
         # Set ping settings.
         self.ping_interval = ping_interval
         self.ping_timeout = ping_timeout
@@ -127,17 +147,7 @@ class _WebSocketManager:
                 self.ws.send(subscription_message)
 
         self.attempting_connection = True
-
-        # Set endpoint.
-        subdomain = SUBDOMAIN_TESTNET if self.testnet else SUBDOMAIN_MAINNET
-        domain = DOMAIN_MAIN if not self.domain else self.domain
-        tld = TLD_MAIN if not self.tld else self.tld
-        if self.demo:
-            if self.testnet:
-                subdomain = DEMO_SUBDOMAIN_TESTNET
-            else:
-                subdomain = DEMO_SUBDOMAIN_MAINNET
-        self.endpoint = url.format(SUBDOMAIN=subdomain, DOMAIN=domain, TLD=tld)
+        self.endpoint = self._build_endpoint(url)
 
         # Attempt to connect for X seconds.
         retries = self.retries
@@ -197,7 +207,22 @@ class _WebSocketManager:
 
         self.attempting_connection = False
 
-    def _auth(self):
+    def _build_endpoint(self, url):
+        subdomain = SUBDOMAIN_TESTNET if self.testnet else SUBDOMAIN_MAINNET
+        domain = DOMAIN_MAIN if not self.domain else self.domain
+        tld = TLD_MAIN if not self.tld else self.tld
+        if self.demo:
+            if self.testnet:
+                subdomain = DEMO_SUBDOMAIN_TESTNET
+            else:
+                subdomain = DEMO_SUBDOMAIN_MAINNET
+        endpoint = url.format(SUBDOMAIN=subdomain, DOMAIN=domain, TLD=tld)
+        if self.custom_endpoint:
+            path = re.match(r"(wss?://)?([^/\s]+)(.*)", endpoint).group(3)
+            endpoint = self.custom_endpoint + path
+        return endpoint
+
+    def _auth_message(self):
         """
         Prepares authentication signature per Bybit API specifications.
         """
@@ -210,13 +235,14 @@ class _WebSocketManager:
             self.rsa_authentication, self.api_secret, param_str
         )
 
-        # Authenticate with API.
-        self.ws.send(
-            json.dumps(
-                {"op": "auth", "args": [self.api_key, expires, signature]}
-            )
+        return json.dumps(
+            {"op": "auth", "args": [self.api_key, expires, signature]}
         )
 
+    def _auth(self):
+        # Authenticate with API.
+        self.ws.send(self._auth_message())
+
     def _on_error(self, error):
         """
         Exit on errors and raise exception, or attempt reconnect.
@@ -236,11 +262,41 @@ class _WebSocketManager:
                 f"encountered error: {error}."
             )
             self.exit()
+            self._run_callbacks(self.disconnect_callbacks, "Disconnect")
 
         # Reconnect.
         if self.handle_error and not self.attempting_connection:
             self._reset()
             self._connect(self.endpoint)
+            self._run_reconnect_callbacks()
+
+    def add_reconnect_callback(self, callback):
+        """
+        Register a function to be called, without arguments, each time the
+        connection has been re-established (and re-authenticated and
+        resubscribed) after an error.
+        """
+        self.reconnect_callbacks.append(callback)
+
+    def add_disconnect_callback(self, callback):
+        """
+        Register a function to be called, without arguments, each time the
+        connection is lost after an error, before reconnecting.
+        """
+        self.disconnect_callbacks.append(callback)
+
+    def _run_reconnect_callbacks(self):
+        self._run_callbacks(self.reconnect_callbacks, "Reconnect")
+
+    def _run_callbacks(self, callbacks, kind):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception(
+                    f"{kind} callback for WebSocket {self.ws_name} raised "
+                    f"an exception."
+                )
 
     def _on_close(self):
         """
@@ -318,7 +374,15 @@ class _WebSocketManager:
 
 
 class _V5WebSocketManager(_WebSocketManager):
-    def __init__(self, ws_name, **kwargs):
+    def __init__(
+        self,
+        ws_name,
+        trade_tape_capacity=None,
+        typed_messages=False,
+        book_arrays_depth=None,
+        ticker_table=False,
+        **kwargs,
+    ):
         callback_function = (
             kwargs.pop("callback_function")
             if kwargs.get("callback_function")
@@ -327,6 +391,30 @@ class _V5WebSocketManager(_WebSocketManager):
         super().__init__(callback_function, ws_name, **kwargs)
 
         self.subscriptions = {}
+        # Per order book topic: the levels of each side with their sorted
+        # price keys, for bisection, and (max_levels, max_distance_pct).
+        # self.data holds the same lists, or views of them within the limits.
+        self._book_sides = {}
+        self._book_policies = {}
+        # req_id -> topic of the requests sent by resubscribe().
+        self._resubscriptions = {}
+
+        # Optional per-symbol ring buffers of publicTrade messages; see
+        # get_trade_tape().
+        self.trade_tape_capacity = trade_tape_capacity
+        self.trade_tapes = {}
+
+        # Optional NumPy arrays of the top levels of each book; see
+        # get_book_arrays().
+        self.book_arrays_depth = book_arrays_depth
+        self.book_arrays = {}
+
+        # Optional columnar table of every tickers topic; see
+        # get_ticker_table().
+        self.ticker_table = TickerTable() if ticker_table else None
+
+        # Deliver pybit.models objects instead of dictionaries of strings.
+        self.typed_messages = typed_messages
 
         self.standard_private_topics = [
             "position",
@@ -346,32 +434,30 @@ class _V5WebSocketManager(_WebSocketManager):
             "system.status",
         ]
 
+    def _prepare_subscription_args(self, topic, symbol):
+        """
+        Prepares the topic for subscription by formatting it with the
+        desired symbols.
+        """
+        if topic in self.standard_private_topics + self.standard_public_topics:
+            # private topics do not support filters
+            return [topic]
+
+        if type(symbol) == str:
+            symbol = [symbol]
+
+        topics = []
+        for single_symbol in symbol:
+            topics.append(topic.format(symbol=single_symbol))
+        return topics
+
     def subscribe(
             self,
             topic: str,
             callback,
             symbol: (str, list) = False
     ):
-
-        def prepare_subscription_args(list_of_symbols):
-            """
-            Prepares the topic for subscription by formatting it with the
-            desired symbols.
-            """
-
-            if topic in self.standard_private_topics + self.standard_public_topics:
-                # private topics do not support filters
-                return [topic]
-
-            topics = []
-            for single_symbol in list_of_symbols:
-                topics.append(topic.format(symbol=single_symbol))
-            return topics
-
-        if type(symbol) == str:
-            symbol = [symbol]
-
-        subscription_args = prepare_subscription_args(symbol)
+        subscription_args = self._prepare_subscription_args(topic, symbol)
         self._check_callback_directory(subscription_args)
 
         req_id = str(uuid4())
@@ -382,10 +468,12 @@ class _V5WebSocketManager(_WebSocketManager):
         while not self.is_connected():
             # Wait until the connection is open before subscribing.
             time.sleep(0.1)
-        self.ws.send(subscription_message)
+        # Record the subscription before sending it; the acknowledgement and
+        # first messages can otherwise arrive before they are known.
         self.subscriptions[req_id] = subscription_message
         for topic in subscription_args:
             self._set_callback(topic, callback)
+        self.ws.send(subscription_message)
 
     def unsubscribe(self, topic: str):
 
@@ -418,6 +506,21 @@ class _V5WebSocketManager(_WebSocketManager):
         else:
             logger.error("Couldn't find active subscription for topic: %s", topic)
 
+    def resubscribe(self, topic: str):
+        """
+        Unsubscribe from a single topic and subscribe to it again, keeping
+        its callback, so that the server sends a fresh snapshot; eg of an
+        order book which has gone out of sync.
+        """
+        for op in ("unsubscribe", "subscribe"):
+            req_id = str(uuid4())
+            self._resubscriptions[req_id] = topic
+            self._send(json.dumps({"op": op, "req_id": req_id, "args": [topic]}))
+        logger.debug("Resubscription requests sent for topic: %s", topic)
+
+    def _send(self, message):
+        self.ws.send(message)
+
     def get_subscription_topics(self):
         """
         Retrieve all subscribed topics.
@@ -444,48 +547,83 @@ class _V5WebSocketManager(_WebSocketManager):
             self.data[topic] = []
 
     def _process_delta_orderbook(self, message, topic):
-        self._initialise_local_data(topic)
+        data = message["data"]
 
         # Record the initial snapshot.
         if "snapshot" in message["type"]:
-            self.data[topic] = message["data"]
-            return
+            self.data[topic] = data
+            sides = self._book_sides[topic] = {}
+            for side, sign in _BOOK_SIDES:
+                levels = data[side]
+                keys = [sign * float(level[0]) for level in levels]
+                if keys != sorted(keys):
+                    pairs = sorted(zip(keys, levels), key=lambda pair: pair[0])
+                    keys = [key for key, _ in pairs]
+                    levels = data[side] = [level for _, level in pairs]
+                sides[side] = (levels, keys)
 
         # Make updates according to delta response.
-        book_sides = {"b": message["data"]["b"], "a": message["data"]["a"]}
-        self.data[topic]["u"]=message["data"]["u"]
-        self.data[topic]["seq"]=message["data"]["seq"]
-
-        for side, entries in book_sides.items():
-            for entry in entries:
-                # Delete.
-                if float(entry[1]) == 0:
-                    index = _helpers.find_index(
-                        self.data[topic][side], entry, 0
-                    )
-                    self.data[topic][side].pop(index)
-                    continue
-
-                # Insert.
-                price_level_exists = entry[0] in [
-                    level[0] for level in self.data[topic][side]
-                ]
-                if not price_level_exists:
-                    self.data[topic][side].append(entry)
-                    continue
-
-                # Update.
-                qty_changed = entry[1] != next(
-                    level[1]
-                    for level in self.data[topic][side]
-                    if level[0] == entry[0]
-                )
-                if price_level_exists and qty_changed:
-                    index = _helpers.find_index(
-                        self.data[topic][side], entry, 0
-                    )
-                    self.data[topic][side][index] = entry
-                    continue
+        else:
+            book = self.data[topic]
+            book["u"] = data["u"]
+            book["seq"] = data["seq"]
+            for side, sign in _BOOK_SIDES:
+                levels, keys = self._book_sides[topic][side]
+                for entry in data[side]:
+                    key = sign * float(entry[0])
+                    index = bisect_left(keys, key)
+                    exists = index < len(keys) and keys[index] == key
+                    # Delete.
+                    if float(entry[1]) == 0:
+                        if exists:
+                            del levels[index]
+                            del keys[index]
+                    # Update.
+                    elif exists:
+                        levels[index] = entry
+                    # Insert.
+                    else:
+                        levels.insert(index, entry)
+                        keys.insert(index, key)
+
+        policy = self._book_policies.get(topic)
+        if policy is not None:
+            self._apply_book_view(topic, *policy)
+
+    def _apply_book_view(self, topic, max_levels, max_distance_pct):
+        """
+        Point self.data's sides at the levels within the subscription's
+        limits. The full sides are kept: the exchange does not resend
+        unchanged levels, so a level dropped from them could not come back
+        when deletes or price moves bring it within the limits again.
+        """
+        book = self.data[topic]
+        sides = self._book_sides[topic]
+        bid_keys = sides["b"][1]
+        ask_keys = sides["a"][1]
+        mid = None
+        if max_distance_pct is not None and bid_keys and ask_keys:
+            # Keys are -price for bids and price for asks.
+            mid = (ask_keys[0] - bid_keys[0]) / 2
+            distance = mid * max_distance_pct / 100
+        for side, limit in (("b", -1), ("a", 1)):
+            levels, keys = sides[side]
+            cut = len(levels)
+            if mid is not None:
+                cut = bisect_right(keys, limit * mid + distance)
+            if max_levels is not None:
+                cut = min(cut, max_levels)
+            book[side] = levels[:cut]
+
+    def _set_book_policy(self, topic, symbol, max_levels, max_distance_pct):
+        if max_levels is None and max_distance_pct is None:
+            return
+        if max_levels is not None and max_levels < 1:
+            raise ValueError("max_levels must be at least 1")
+        if max_distance_pct is not None and max_distance_pct <= 0:
+            raise ValueError("max_distance_pct must be positive")
+        for book_topic in self._prepare_subscription_args(topic, symbol):
+            self._book_policies[book_topic] = (max_levels, max_distance_pct)
 
     def _process_delta_ticker(self, message, topic):
         self._initialise_local_data(topic)
@@ -538,23 +676,91 @@ class _V5WebSocketManager(_WebSocketManager):
             else:
                 logger.error("Unsubscription for request_id '%s' failed. Message: %s", message["req_id"], message)
 
+    def _process_resubscription_message(self, message):
+        topic = self._resubscriptions.pop(message["req_id"])
+        if message.get("success") is False:
+            logger.error(
+                "Couldn't %s topic %s. Message: %s", message.get("op"), topic, message
+            )
+
     def _process_normal_message(self, message):
         topic = message["topic"]
         if "orderbook" in topic:
             self._process_delta_orderbook(message, topic)
-            callback_data = copy.deepcopy(message)
-            callback_data["type"] = "snapshot"
-            callback_data["data"] = self.data[topic]
+            if self.book_arrays_depth:
+                self._update_book_arrays(message, topic)
+            callback_data = self._snapshot_message(message, topic)
         elif "tickers" in topic:
             self._process_delta_ticker(message, topic)
-            callback_data = copy.deepcopy(message)
-            callback_data["type"] = "snapshot"
-            callback_data["data"] = self.data[topic]
+            if self.ticker_table is not None:
+                self.ticker_table.handle_message(message)
+            callback_data = self._snapshot_message(message, topic)
         else:
+            if self.trade_tape_capacity and topic.startswith("publicTrade."):
+                self._record_trades(message, topic)
             callback_data = message
+            if self.typed_messages:
+                callback_data = decode_message(message)
         callback_function = self._get_callback(topic)
         callback_function(callback_data)
 
+    def _snapshot_message(self, message, topic):
+        if self.typed_messages:
+            # Decoding builds new objects, so the stored snapshot does not
+            # need copying first.
+            return decode_message(
+                dict(message, type="snapshot", data=self.data[topic])
+            )
+        callback_data = copy.deepcopy(message)
+        callback_data["type"] = "snapshot"
+        callback_data["data"] = self.data[topic]
+        return callback_data
+
+    def _record_trades(self, message, topic):
+        symbol = topic.split(".", 1)[1]
+        tape = self.trade_tapes.get(symbol)
+        if tape is None:
+            tape = self.trade_tapes[symbol] = TradeTape(
+                self.trade_tape_capacity
+            )
+        tape.handle_message(message)
+
+    def _update_book_arrays(self, message, topic):
+        arrays = self.book_arrays.get(topic)
+        if arrays is None:
+            # Imported here so that numpy is only loaded when used.
+            from .book_arrays import BookArrays
+            arrays = self.book_arrays[topic] = BookArrays(self.book_arrays_depth)
+        # The maintained sides are kept sorted.
+        arrays.update(self.data[topic], message["ts"], is_sorted=True)
+
+    def get_book_arrays(self, symbol, depth=None):
+        """
+        Returns the BookArrays of a symbol subscribed to with
+        orderbook_stream() (of `depth`, if it was subscribed to at several
+        depths), or None. Requires the book_arrays_depth argument.
+        """
+        if depth is not None:
+            return self.book_arrays.get(f"orderbook.{depth}.{symbol}")
+        for topic, arrays in self.book_arrays.items():
+            if topic.endswith(f".{symbol}"):
+                return arrays
+        return None
+
+    def get_ticker_table(self) -> TickerTable:
+        """
+        Returns the TickerTable of all symbols subscribed to with
+        ticker_stream(), or None. Requires the ticker_table argument.
+        """
+        return self.ticker_table
+
+    def get_trade_tape(self, symbol) -> TradeTape:
+        """
+        Returns the TradeTape of recent trades for a symbol subscribed to with
+        trade_stream(), or None. Requires the trade_tape_capacity argument.
+        """
+        return self.trade_tapes.get(symbol)
+
     def _handle_incoming_message(self, message):
         def is_auth_message():
             if (
@@ -579,7 +785,9 @@ class _V5WebSocketManager(_WebSocketManager):
             else:
                 return False
 
-        if is_auth_message():
+        if message.get("req_id") in self._resubscriptions:
+            self._process_resubscription_message(message)
+        elif is_auth_message():
             self._process_auth_message(message)
         elif is_subscription_message():
             self._process_subscription_message(message)
@@ -1,7 +1,12 @@
+from collections import deque
 from dataclasses import dataclass, field
+import itertools
 import json
+import threading
+import time
 import uuid
 import logging
+from ._rate_limiter import _TokenBucket
 from ._websocket_stream import _WebSocketManager
 from . import _helpers
 
@@ -12,21 +17,116 @@ logger = logging.getLogger(__name__)
 WSS_NAME = "WebSocket Trading"
 TRADE_WSS = "wss://{SUBDOMAIN}.{DOMAIN}.{TLD}/v5/trade"
 
+# Operation name -> its JSON encoding, for building request frames.
+_ENCODED_OPERATIONS = {}
+
+# Used to tell whether a request's effect is visible in an order.
+_CANCELLED_STATUSES = {"Cancelled", "PartiallyFilledCanceled", "Deactivated"}
+_AMENDABLE_FIELDS = ("qty", "price", "triggerPrice", "takeProfit", "stopLoss")
+# Seconds to wait before looking an order up again when it is not found:
+# an order accepted just before the connection was lost may take a moment
+# to be visible over REST.
+_RECOVERY_RETRY_DELAYS = (0.2, 0.5, 1.0)
+
 
 class _V5TradeWebSocketManager(_WebSocketManager):
-    def __init__(self, recv_window, referral_id, **kwargs):
+    def __init__(
+        self,
+        recv_window,
+        referral_id,
+        max_in_flight=None,
+        send_rate=None,
+        request_timeout=None,
+        recovery_session=None,
+        auto_order_link_id=False,
+        **kwargs,
+    ):
         super().__init__(self._handle_incoming_message, WSS_NAME, **kwargs)
         self.recv_window = recv_window
         self.referral_id = referral_id
+        self._init_request_state(
+            max_in_flight, send_rate, request_timeout, recovery_session,
+            auto_order_link_id,
+        )
+        self.add_disconnect_callback(self._on_connection_lost)
+        self.add_reconnect_callback(self._on_reconnected)
         self._connect(TRADE_WSS)
 
+    def _init_request_state(
+        self,
+        max_in_flight=None,
+        send_rate=None,
+        request_timeout=None,
+        recovery_session=None,
+        auto_order_link_id=False,
+    ):
+        """
+        Sets up request IDs, frame serialization, flow control and recovery.
+
+        max_in_flight: Maximum number of requests awaiting a response;
+            further requests are queued until responses arrive.
+        send_rate: Maximum number of requests sent per second; further
+            requests are queued.
+        request_timeout: Seconds after which a request without a response is
+            expired: its callbacks are dropped (error_callback is first
+            called with retCode -1) and it leaves the in-flight window.
+        recovery_session: An HTTP session used after a reconnect to find out
+            what became of the requests left unanswered by the lost
+            connection, by orderId or orderLinkId. An order not found is
+            looked up again after each of `recovery_retry_delays`. Without a
+            session, their error_callback is called with retCode -1.
+        auto_order_link_id: Give orders placed without an orderLinkId one,
+            so that they can be recovered after a reconnect.
+        """
+        # reqIds are a random prefix, unique to this client, plus a counter,
+        # which is much cheaper to generate than a uuid4 per request.
+        self._request_id_prefix = uuid.uuid4().hex[:8] + "-"
+        self._request_ids = itertools.count(1)
+        # Pre-encoded header fields; built on the first send.
+        self._frame_header = None
+
+        self.max_in_flight = max_in_flight
+        self.request_timeout = request_timeout
+        self._send_bucket = _TokenBucket(send_rate) if send_rate else None
+        # (reqId, operation, request, time queued) of requests to be sent
+        self._send_queue = deque()
+        # reqId -> time sent of requests awaiting a response, oldest first
+        self._sent_times = {}
+        # reqId -> (operation, request) of requests awaiting a response, and
+        # of those left unanswered by a lost connection.
+        self._sent_requests = {}
+        self._unknown_requests = {}
+        self.recovery_session = recovery_session
+        self.recovery_retry_delays = _RECOVERY_RETRY_DELAYS
+        self.auto_order_link_id = auto_order_link_id
+        self._flow_lock = threading.RLock()
+        self._drain_timer = None
+        self._drain_due = None
+        self._flow_counts = {
+            "sent": 0, "acknowledged": 0, "expired": 0, "recovered": 0,
+        }
+        # name -> [count, total, max] in seconds
+        self._flow_timings = {"queue_wait": [0, 0.0, 0.0], "ack_latency": [0, 0.0, 0.0]}
+
     def _process_auth_message(self, message):
         # If we get successful auth, notify user
         if message.get("retCode") == 0:
             logger.debug(f"Authorization for {self.ws_name} successful.")
             self.auth = True
+            # Requests made while authenticating were queued.
+            with self._flow_lock:
+                self._drain()
         # If we get unsuccessful auth, notify user.
         else:
+            # The requests queued for the auth response will never be sent.
+            with self._flow_lock:
+                queued, self._send_queue = self._send_queue, deque()
+            for request_id, _, _, _ in queued:
+                _, error_callback = self._pop_callback(request_id)
+                self._fail_request(
+                    request_id, error_callback,
+                    "Authorization failed; the request was not sent.",
+                )
             raise Exception(
                 f"Authorization for {self.ws_name} failed. Please check your "
                 f"API keys and resync your system time. Raw error: {message}"
@@ -39,6 +139,7 @@ class _V5TradeWebSocketManager(_WebSocketManager):
 
         req_id = message.get("reqId")
         callback, error_callback = self._pop_callback(req_id)
+        self._on_response(req_id)
 
         if message.get("retCode") != 0:
             logger.warning(
@@ -82,23 +183,328 @@ class _V5TradeWebSocketManager(_WebSocketManager):
     def _send_order_operation(
         self, operation, callback, request, error_callback=None
     ):
-        request_id = str(uuid.uuid4())
+        request_id = self._request_id_prefix + str(next(self._request_ids))
+        if self.auto_order_link_id:
+            request = self._with_order_link_ids(operation, request, request_id)
+
+        # Register before sending, otherwise a fast response can arrive on the
+        # read thread before its callback exists and be dropped.
+        self._set_callback(request_id, callback, error_callback)
+        with self._flow_lock:
+            self._send_queue.append(
+                (request_id, operation, request, time.monotonic())
+            )
+            self._drain(own_request_id=request_id)
+
+    @staticmethod
+    def _with_order_link_ids(operation, request, request_id):
+        if operation == "order.create" and not request.get("orderLinkId"):
+            return {**request, "orderLinkId": request_id}
+        if operation == "order.create-batch":
+            return {**request, "request": [
+                order if order.get("orderLinkId")
+                else {**order, "orderLinkId": f"{request_id}-{i}"}
+                for i, order in enumerate(request.get("request", []))
+            ]}
+        return request
+
+    def _serialize(self, request_id, operation, request):
+        """
+        Returns the JSON frame of a request. Only the request's arguments are
+        encoded per call; the rest is spliced into pre-encoded parts, giving
+        the same output as json.dumps() of the whole message.
+        """
+        if self._frame_header is None:
+            self._frame_header = "".join(
+                f", {json.dumps(name)}: {json.dumps(value)}"
+                for name, value in (
+                    ("X-BAPI-RECV-WINDOW", self.recv_window),
+                    ("Referer", self.referral_id),
+                )
+                if value
+            )
+        encoded_operation = _ENCODED_OPERATIONS.get(operation)
+        if encoded_operation is None:
+            encoded_operation = _ENCODED_OPERATIONS[operation] = json.dumps(
+                operation
+            )
+        return (
+            '{"reqId": "' + request_id
+            + '", "header": {"X-BAPI-TIMESTAMP": '
+            + str(_helpers.generate_timestamp()) + self._frame_header
+            + '}, "op": ' + encoded_operation
+            + ', "args": [' + json.dumps(request) + "]}"
+        )
+
+    # Flow control
+
+    def _drain(self, own_request_id=None):
+        """
+        Send queued requests while the in-flight window and send rate allow,
+        and expire stale ones. Must be called with _flow_lock held. Nothing
+        is sent until the connection is authenticated: requests sent before
+        the auth response would be rejected.
+
+        If a send fails, the request is dropped. The error is raised if the
+        request is `own_request_id`, the caller's; other requests' error
+        callbacks are called with retCode -1.
+        """
+        now = time.monotonic()
+        self._expire(now)
+        queue = self._send_queue
+        wake_in = None
+        while queue and self.auth:
+            if (
+                self.max_in_flight is not None
+                and len(self._sent_times) >= self.max_in_flight
+            ):
+                break
+            if self._send_bucket is not None:
+                wake_in = self._send_bucket.try_acquire() or None
+                if wake_in is not None:
+                    break
+            request_id, operation, request, queued = queue.popleft()
+            # The frame is built now, so that its timestamp is not held up
+            # by the time spent queued.
+            frame = self._serialize(request_id, operation, request)
+            sent = time.monotonic()
+            self._sent_times[request_id] = sent
+            self._sent_requests[request_id] = (operation, request)
+            try:
+                self.ws.send(frame)
+            except Exception as e:
+                # Dropped rather than requeued: the caller is told and may
+                # retry, which must not lead to a duplicate order.
+                del self._sent_times[request_id]
+                del self._sent_requests[request_id]
+                _, error_callback = self._pop_callback(request_id)
+                if request_id == own_request_id:
+                    raise
+                self._fail_request(
+                    request_id, error_callback, f"Could not be sent: {e}"
+                )
+                break
+            self._flow_counts["sent"] += 1
+            self._record_timing("queue_wait", sent - queued)
+
+        if self.request_timeout and self._sent_times:
+            oldest = next(iter(self._sent_times.values()))
+            expires_in = max(oldest + self.request_timeout - now, 0.0)
+            wake_in = expires_in if wake_in is None else min(wake_in, expires_in)
+        if wake_in is not None:
+            self._schedule_drain(wake_in)
+
+    def _schedule_drain(self, delay):
+        due = time.monotonic() + delay
+        if self._drain_timer is not None and self._drain_timer.is_alive():
+            if self._drain_due <= due:
+                return
+            # Eg the send rate allows a send before the next expiry check.
+            self._drain_timer.cancel()
+        self._drain_due = due
+        self._drain_timer = threading.Timer(delay, self._timed_drain)
+        self._drain_timer.daemon = True
+        self._drain_timer.start()
+
+    def _timed_drain(self):
+        with self._flow_lock:
+            # A timer replaced by an earlier one may still get here.
+            if self._drain_timer is threading.current_thread():
+                self._drain_timer = None
+            self._drain()
 
+    def _expire(self, now):
+        if not self.request_timeout:
+            return
+        expired = []
+        for request_id, sent in self._sent_times.items():
+            if now - sent < self.request_timeout:
+                break
+            expired.append(request_id)
+        for request_id in expired:
+            del self._sent_times[request_id]
+            self._sent_requests.pop(request_id, None)
+            self._flow_counts["expired"] += 1
+            _, error_callback = self._pop_callback(request_id)
+            logger.warning(
+                f"WebSocket request {request_id} got no response within "
+                f"{self.request_timeout}s; expiring it."
+            )
+            self._fail_request(
+                request_id, error_callback,
+                "Request timed out awaiting a response.",
+            )
+
+    def _fail_request(self, request_id, error_callback, reason):
+        if error_callback is not None:
+            self._invoke_user_callback(error_callback, {
+                "reqId": request_id,
+                "retCode": -1,
+                "retMsg": reason,
+            }, request_id)
+
+    def _on_response(self, request_id):
+        with self._flow_lock:
+            sent = self._sent_times.pop(request_id, None)
+            if sent is None:
+                return
+            del self._sent_requests[request_id]
+            self._flow_counts["acknowledged"] += 1
+            self._record_timing("ack_latency", time.monotonic() - sent)
+            if self._send_queue:
+                self._drain()
+
+    def _record_timing(self, name, seconds):
+        timing = self._flow_timings[name]
+        timing[0] += 1
+        timing[1] += seconds
+        if seconds > timing[2]:
+            timing[2] = seconds
+
+    # Recovery after a reconnect
+
+    def _on_connection_lost(self):
+        """Responses to requests in flight will never arrive: mark them as
+        unknown, to be resolved once reconnected."""
+        with self._flow_lock:
+            self._unknown_requests.update(self._sent_requests)
+            self._sent_requests.clear()
+            self._sent_times.clear()
+
+    def _on_reconnected(self):
+        with self._flow_lock:
+            unknown, self._unknown_requests = self._unknown_requests, {}
+            self._drain()
+        if unknown:
+            # REST lookups would hold up the read thread, which has just
+            # reconnected.
+            threading.Thread(
+                target=self._recover_requests, args=(unknown,), daemon=True
+            ).start()
+
+    def _recover_requests(self, unknown):
+        for request_id, (operation, request) in unknown.items():
+            callback, error_callback = self._pop_callback(request_id)
+            if self.recovery_session is None:
+                self._fail_request(
+                    request_id, error_callback,
+                    "Connection lost before a response; outcome unknown.",
+                )
+                continue
+            message = self._reconcile(request_id, operation, request)
+            self._flow_counts["recovered"] += 1
+            logger.info(
+                f"Recovered WebSocket request {request_id} after reconnect: "
+                f"retCode={message['retCode']}."
+            )
+            if message["retCode"] == 0:
+                if callback is not None:
+                    self._invoke_user_callback(callback, message, request_id)
+            elif error_callback is not None:
+                self._invoke_user_callback(error_callback, message, request_id)
+
+    def _reconcile(self, request_id, operation, request):
+        """
+        Looks up the orders a request acted on and returns a response shaped
+        like the exchange's, with "recovered": True. retCode is 0 if the
+        request evidently took effect, else -1 with the reason.
+        """
         message = {
             "reqId": request_id,
-            "header": {
-                "X-BAPI-TIMESTAMP": _helpers.generate_timestamp(),
-            },
             "op": operation,
-            "args": [
-                request
-            ],
+            "recovered": True,
         }
+        category = request.get("category")
+        if not operation.endswith("-batch"):
+            code, reason, data = self._reconcile_order(
+                operation, category, request
+            )
+            message.update(retCode=code, retMsg=reason, data=data)
+            return message
 
-        if self.recv_window:
-            message["header"]["X-BAPI-RECV-WINDOW"] = self.recv_window
-        if self.referral_id:
-            message["header"]["Referer"] = self.referral_id
+        results = []
+        statuses = []
+        base_operation = operation[:-len("-batch")]
+        for order in request.get("request", []):
+            code, reason, data = self._reconcile_order(
+                base_operation, category, order
+            )
+            results.append(data)
+            statuses.append({"code": code, "msg": reason})
+        message.update(
+            retCode=0, retMsg="OK", data={"list": results},
+            retExtInfo={"list": statuses},
+        )
+        return message
 
-        self.ws.send(json.dumps(message))
-        self._set_callback(request_id, callback, error_callback)
+    def _reconcile_order(self, operation, category, request):
+        """Returns (retCode, retMsg, data) for one order of a request."""
+        ids = {
+            name: request[name] for name in ("orderId", "orderLinkId")
+            if request.get(name)
+        }
+        if not ids:
+            return -1, "No orderId or orderLinkId to recover the order by.", {}
+        for delay in (*self.recovery_retry_delays, None):
+            try:
+                order = self._find_order(category, request.get("symbol"), ids)
+                error = None
+            except Exception as e:
+                order, error = None, e
+            if order is not None or delay is None:
+                break
+            time.sleep(delay)
+        if error is not None:
+            return -1, f"Could not look up the order: {error}", ids
+
+        if order is None:
+            if operation == "order.create":
+                return -1, "Order not found: it was not placed.", ids
+            return -1, "Order not found.", ids
+        data = {"orderId": order["orderId"], "orderLinkId": order["orderLinkId"]}
+
+        if operation == "order.create":
+            return 0, "OK", data
+        if operation == "order.cancel":
+            if order.get("orderStatus") in _CANCELLED_STATUSES:
+                return 0, "OK", data
+            return -1, f"Order not cancelled: {order.get('orderStatus')}.", data
+        if operation == "order.amend":
+            for name in _AMENDABLE_FIELDS:
+                if request.get(name) is not None and (
+                    not order.get(name)
+                    or float(order[name]) != float(request[name])
+                ):
+                    return -1, f"Order not amended: {name} differs.", data
+            return 0, "OK", data
+        return -1, "Outcome unknown.", data
+
+    def _find_order(self, category, symbol, ids):
+        for method in (
+            self.recovery_session.get_open_orders,
+            self.recovery_session.get_order_history,
+        ):
+            orders = method(category=category, symbol=symbol, **ids)
+            orders = orders["result"]["list"]
+            if orders:
+                return orders[0]
+        return None
+
+    def get_flow_metrics(self) -> dict:
+        """
+        Returns the number of requests queued and in flight, counts of
+        requests sent, acknowledged, expired and recovered after a
+        reconnect, and the average and maximum
+        time requests spent queued and waiting for their response, in
+        seconds.
+        """
+        with self._flow_lock:
+            metrics = {
+                "queued": len(self._send_queue),
+                "in_flight": len(self._sent_times),
+                **self._flow_counts,
+            }
+            for name, (count, total, maximum) in self._flow_timings.items():
+                metrics[f"{name}_avg"] = total / count if count else None
+                metrics[f"{name}_max"] = maximum
+            return metrics
@@ -0,0 +1,313 @@
+from collections import OrderedDict
+import logging
+import threading
+
+from . import _helpers
+
+
+# Orders in these statuses are no longer working and are dropped.
+TERMINAL_ORDER_STATUSES = {
+    "Filled",
+    "Cancelled",
+    "Rejected",
+    "PartiallyFilledCanceled",
+    "Deactivated",
+}
+
+# REST filters per category used for seeding. Linear positions and open
+# orders can only be listed by symbol, baseCoin or settleCoin.
+DEFAULT_CATEGORIES = {
+    "linear": {"settleCoin": "USDT"},
+}
+
+
+def _timestamp(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class AccountState:
+    """In-memory mirror of positions, open orders and wallet balances, kept
+    current by the private `position`, `order` and `wallet` streams.
+
+    The state is seeded over REST when started and again after every
+    reconnect, so reads never need a REST call. Records are plain dicts in the
+    shape the API returns them; reads return copies.
+
+    Example:
+        session = HTTP(api_key=..., api_secret=...)
+        ws = WebSocket(channel_type="private", api_key=..., api_secret=...)
+        state = AccountState(session, categories={
+            "linear": {"settleCoin": "USDT"},
+            "spot": {},
+        })
+        state.start(ws)
+
+        state.get_position("linear", "BTCUSDT")
+        state.get_open_orders(category="linear", symbol="BTCUSDT")
+        state.get_balance("USDT")
+
+    Args:
+        session: An HTTP session, used to seed the state.
+        categories (dict): Category to the extra REST filters used to list
+            its positions and open orders. Positions are only seeded for
+            linear, inverse and option.
+        account_type (string): The wallet's accountType.
+        on_update (function): Optional; called with each stream message after
+            it has been applied.
+        max_removed (int): How many recently removed positions and orders
+            to remember, so that older REST snapshots cannot bring them back.
+    """
+
+    def __init__(
+        self,
+        session,
+        categories=None,
+        account_type="UNIFIED",
+        on_update=None,
+        max_removed=10000,
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.session = session
+        self.categories = (
+            dict(DEFAULT_CATEGORIES) if categories is None else categories
+        )
+        self.account_type = account_type
+        self.on_update = on_update
+        self.max_removed = max_removed
+
+        # (category, symbol, positionIdx) -> position
+        self._positions = {}
+        # orderId -> order, and orderLinkId -> orderId
+        self._orders = {}
+        self._order_link_ids = {}
+        # accountType -> account totals, and (accountType, coin) -> coin
+        self._accounts = {}
+        self._coins = {}
+        # updatedTime of recently removed positions and orders, so that an
+        # older REST snapshot cannot bring them back. Oldest first; bounded
+        # by max_removed, as sync() may not run for a long time.
+        self._removed = OrderedDict()
+        # Server time of each wallet record's last update, which wallet
+        # records lack.
+        self._wallet_times = {}
+        self._lock = threading.RLock()
+        self.last_sync = None
+
+    def start(self, ws):
+        """Subscribe to the private streams of `ws` (a private WebSocket),
+        seed the state over REST and re-seed it after every reconnect."""
+        ws.position_stream(self.handle_message)
+        ws.order_stream(self.handle_message)
+        ws.wallet_stream(self.handle_message)
+        ws.add_reconnect_callback(self.sync)
+        self.sync()
+
+    # Reads
+
+    def get_position(self, category, symbol, position_idx=0) -> dict:
+        """Returns the open position, or None if there is none."""
+        position = self._positions.get((category, symbol, position_idx))
+        return dict(position) if position is not None else None
+
+    def get_positions(self, category=None, symbol=None) -> list:
+        with self._lock:
+            return [
+                dict(position)
+                for (position_category, position_symbol, _), position
+                in self._positions.items()
+                if category in (None, position_category)
+                and symbol in (None, position_symbol)
+            ]
+
+    def get_order(self, order_id=None, order_link_id=None) -> dict:
+        """Returns a working order by orderId or orderLinkId, or None."""
+        if order_id is None:
+            order_id = self._order_link_ids.get(order_link_id)
+        order = self._orders.get(order_id)
+        return dict(order) if order is not None else None
+
+    def get_open_orders(self, category=None, symbol=None) -> list:
+        with self._lock:
+            return [
+                dict(order) for order in self._orders.values()
+                if category in (None, order.get("category"))
+                and symbol in (None, order.get("symbol"))
+            ]
+
+    def get_balance(self, coin, account_type=None) -> dict:
+        """Returns the wallet entry of a coin, or None."""
+        balance = self._coins.get((account_type or self.account_type, coin))
+        return dict(balance) if balance is not None else None
+
+    def get_account(self, account_type=None) -> dict:
+        """Returns the account-level wallet totals (totalEquity etc.)."""
+        account = self._accounts.get(account_type or self.account_type)
+        return dict(account) if account is not None else None
+
+    # Stream updates
+
+    def handle_message(self, message):
+        """Apply a private stream message. Usable directly as the callback of
+        `position_stream()`, `order_stream()` and `wallet_stream()`."""
+        topic = message.get("topic", "").split(".")[0]
+        with self._lock:
+            if topic == "position":
+                for position in message["data"]:
+                    self._apply_position(position)
+            elif topic == "order":
+                for order in message["data"]:
+                    self._apply_order(order)
+            elif topic == "wallet":
+                update_time = _timestamp(message.get("creationTime"))
+                for account in message["data"]:
+                    self._apply_account(account, update_time)
+        if self.on_update is not None:
+            self.on_update(message)
+
+    def _is_stale(self, records, key, record):
+        current = records.get(key)
+        if current is not None:
+            last_update = _timestamp(current.get("updatedTime"))
+        else:
+            last_update = self._removed.get(key, -1)
+        return _timestamp(record.get("updatedTime")) < last_update
+
+    @staticmethod
+    def _position_key(position):
+        return (
+            position.get("category"),
+            position["symbol"],
+            int(position.get("positionIdx") or 0),
+        )
+
+    def _apply_position(self, position):
+        key = self._position_key(position)
+        if self._is_stale(self._positions, key, position):
+            return
+        if not position.get("size") or float(position["size"]) == 0:
+            self._positions.pop(key, None)
+            self._add_removed(key, _timestamp(position.get("updatedTime")))
+        else:
+            self._positions[key] = position
+
+    def _apply_order(self, order):
+        order_id = order["orderId"]
+        if self._is_stale(self._orders, order_id, order):
+            return
+        if order.get("orderStatus") in TERMINAL_ORDER_STATUSES:
+            self._remove_order(order_id, _timestamp(order.get("updatedTime")))
+            return
+        self._orders[order_id] = order
+        if order.get("orderLinkId"):
+            self._order_link_ids[order["orderLinkId"]] = order_id
+
+    def _remove_order(self, order_id, updated_time):
+        order = self._orders.pop(order_id, None)
+        if order is not None and order.get("orderLinkId"):
+            self._order_link_ids.pop(order["orderLinkId"], None)
+        self._add_removed(order_id, updated_time)
+
+    def _add_removed(self, key, updated_time):
+        self._removed[key] = updated_time
+        self._removed.move_to_end(key)
+        if len(self._removed) > self.max_removed:
+            self._removed.popitem(last=False)
+
+    def _apply_account(self, account, update_time):
+        account_type = account.get("accountType") or self.account_type
+        if update_time < self._wallet_times.get(account_type, 0):
+            return
+        self._wallet_times[account_type] = update_time
+        self._accounts[account_type] = {
+            key: value for key, value in account.items() if key != "coin"
+        }
+        for coin in account.get("coin") or []:
+            self._coins[(account_type, coin["coin"])] = coin
+
+    # REST seeding
+
+    def _fetch_all(self, method, **query):
+        records = []
+        cursor = None
+        while True:
+            if cursor:
+                query["cursor"] = cursor
+            result = method(**query)["result"]
+            records.extend(result.get("list") or [])
+            next_cursor = result.get("nextPageCursor")
+            if not next_cursor or next_cursor == cursor:
+                return records
+            cursor = next_cursor
+
+    def sync(self):
+        """Re-seed the whole state over REST.
+
+        Stream updates which arrive while this runs are kept: a REST record
+        only replaces a local one that is not newer, and local records missing
+        from the REST snapshot are only dropped if they were last updated
+        before the snapshot was requested.
+        """
+        started = _helpers.generate_timestamp()
+        for category, filters in self.categories.items():
+            if category != "spot":
+                positions = self._fetch_all(
+                    self.session.get_positions, category=category,
+                    limit=200, **filters,
+                )
+                self._reconcile_positions(category, positions, started)
+            orders = self._fetch_all(
+                self.session.get_open_orders, category=category,
+                limit=50, **filters,
+            )
+            self._reconcile_orders(category, orders, started)
+
+        response = self.session.get_wallet_balance(accountType=self.account_type)
+        # Compared with the server's creationTime of wallet pushes, so the
+        # server's time of the response is used, not the local clock.
+        server_time = _timestamp(response.get("time"))
+        with self._lock:
+            for account in response["result"]["list"]:
+                self._apply_account(account, server_time)
+            # Anything removed before this snapshot was requested is absent
+            # from it, so the tombstones are no longer needed.
+            self._removed = OrderedDict(
+                (key, updated_time)
+                for key, updated_time in self._removed.items()
+                if updated_time >= started
+            )
+        self.last_sync = started
+        self.logger.debug(
+            f"Synced {len(self._positions)} positions and "
+            f"{len(self._orders)} open orders."
+        )
+
+    def _reconcile_positions(self, category, positions, started):
+        with self._lock:
+            seen = set()
+            for position in positions:
+                position.setdefault("category", category)
+                self._apply_position(position)
+                seen.add(self._position_key(position))
+            for key, position in list(self._positions.items()):
+                if (
+                    key[0] == category and key not in seen
+                    and _timestamp(position.get("updatedTime")) < started
+                ):
+                    del self._positions[key]
+
+    def _reconcile_orders(self, category, orders, started):
+        with self._lock:
+            seen = set()
+            for order in orders:
+                order.setdefault("category", category)
+                self._apply_order(order)
+                seen.add(order["orderId"])
+            for order_id, order in list(self._orders.items()):
+                if (
+                    order.get("category") == category and order_id not in seen
+                    and _timestamp(order.get("updatedTime")) < started
+                ):
+                    self._remove_order(order_id, started)
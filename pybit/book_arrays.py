@@ -0,0 +1,136 @@
+try:
+    import numpy as np
+except ImportError:  # Optional dependency: pip install numpy
+    np = None
+
+
+class BookArrays:
+    """The top `depth` levels of an order book in preallocated float64 NumPy
+    arrays, for vectorised signal code.
+
+    `bid_price`, `bid_size`, `ask_price` and `ask_size` are updated in place,
+    best level first, so references to them stay valid; levels beyond
+    `bid_count` / `ask_count` are NaN. Each update parses the strings of a
+    side in one NumPy call, without creating Python objects per level.
+    Requires the `numpy` package.
+
+    Example:
+        ws = WebSocket(channel_type="linear", book_arrays_depth=25)
+        ws.orderbook_stream(50, "BTCUSDT", handle_orderbook)
+        ...
+        book = ws.get_book_arrays("BTCUSDT")
+        book.microprice(), book.imbalance(levels=5)
+
+    or, with any book: `book = BookArrays(25); book.handle_message(message)`.
+    """
+
+    def __init__(self, depth=50):
+        if np is None:
+            raise ImportError(
+                "BookArrays requires the numpy package: pip install numpy"
+            )
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.depth = depth
+        self.bid_price = np.full(depth, np.nan)
+        self.bid_size = np.full(depth, np.nan)
+        self.ask_price = np.full(depth, np.nan)
+        self.ask_size = np.full(depth, np.nan)
+        self.bid_count = 0
+        self.ask_count = 0
+        self.ts = None
+        self.u = None
+        self.seq = None
+        self._cumulative = np.empty(depth)
+
+    def handle_message(self, message):
+        """Update from an `orderbook` message as passed to `WebSocket`
+        callbacks, ie with the maintained book."""
+        self.update(message["data"], message.get("ts"))
+
+    def update(self, data, ts=None, is_sorted=False):
+        """Update from a book with "b" and "a" lists of [price, size]. If
+        `is_sorted`, the sides are known to be best level first, as in books
+        maintained by `WebSocket`, and only the top `depth` levels are
+        parsed."""
+        self.bid_count = self._fill(
+            data["b"], self.bid_price, self.bid_size, True, is_sorted
+        )
+        self.ask_count = self._fill(
+            data["a"], self.ask_price, self.ask_size, False, is_sorted
+        )
+        self.ts = ts
+        self.u = data.get("u")
+        self.seq = data.get("seq")
+
+    def _fill(self, levels, prices, sizes, descending, is_sorted):
+        depth = self.depth
+        if not levels:
+            prices.fill(np.nan)
+            sizes.fill(np.nan)
+            return 0
+        if is_sorted:
+            side = np.array(levels[:depth], dtype=np.float64)
+        else:
+            side = np.array(levels, dtype=np.float64)
+            order = side[:, 0]
+            steps = np.diff(order)
+            if (steps > 0).any() if descending else (steps < 0).any():
+                side = side[
+                    np.argsort(-order if descending else order, kind="stable")
+                ]
+        count = min(len(side), depth)
+        prices[:count] = side[:count, 0]
+        sizes[:count] = side[:count, 1]
+        prices[count:] = np.nan
+        sizes[count:] = np.nan
+        return count
+
+    def mid(self) -> float:
+        return (self.bid_price[0] + self.ask_price[0]) / 2
+
+    def spread(self) -> float:
+        return self.ask_price[0] - self.bid_price[0]
+
+    def microprice(self) -> float:
+        """The top-of-book prices weighted by the opposite side's size,
+        which leans towards the side more likely to trade through."""
+        bid_size = self.bid_size[0]
+        ask_size = self.ask_size[0]
+        return (
+            self.bid_price[0] * ask_size + self.ask_price[0] * bid_size
+        ) / (bid_size + ask_size)
+
+    def imbalance(self, levels=None) -> float:
+        """(bid size - ask size) / (bid size + ask size) over the top
+        `levels` of each side (all of them by default), from -1 to 1."""
+        bids = np.sum(self.bid_size[:min(levels or self.depth, self.bid_count)])
+        asks = np.sum(self.ask_size[:min(levels or self.depth, self.ask_count)])
+        total = bids + asks
+        return (bids - asks) / total if total else 0.0
+
+    def cumulative_depth(self, side="b", notional=False, out=None):
+        """Running total of size (or price * size if `notional`) from the
+        best level outwards, one entry per level of the side. The result is
+        written to `out`, or to a buffer reused by the next call."""
+        if side == "b":
+            prices, sizes, count = self.bid_price, self.bid_size, self.bid_count
+        else:
+            prices, sizes, count = self.ask_price, self.ask_size, self.ask_count
+        if out is None:
+            out = self._cumulative
+        out = out[:count]
+        if notional:
+            np.multiply(prices[:count], sizes[:count], out=out)
+            return np.cumsum(out, out=out)
+        return np.cumsum(sizes[:count], out=out)
+
+    def depth_to_price(self, price, side="b") -> float:
+        """Total size of the levels of a side at `price` or better."""
+        if side == "b":
+            count = self.bid_count
+            within = self.bid_price[:count] >= price
+            return float(np.sum(self.bid_size[:count][within]))
+        count = self.ask_count
+        within = self.ask_price[:count] <= price
+        return float(np.sum(self.ask_size[:count][within]))
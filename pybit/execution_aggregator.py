@@ -0,0 +1,242 @@
+from collections import OrderedDict
+import threading
+
+
+# Execution types which move the position. Funding (and anything unknown)
+# only contributes its fee.
+POSITION_EXEC_TYPES = {
+    "Trade",
+    "AdlTrade",
+    "BustTrade",
+    "BlockTrade",
+    "MovePosition",
+    "Delivery",
+    "Settle",
+}
+
+
+class SymbolStats:
+    """Running totals for one symbol. `position` is signed (negative when
+    short) and, like the PnL and fees, is in the symbol's settlement terms:
+    quote coin for linear and spot, base coin for inverse PnL."""
+
+    __slots__ = (
+        "category",
+        "symbol",
+        "position",
+        "avg_entry_price",
+        "realized_pnl",
+        "fees",
+        "funding_fees",
+        "fill_count",
+        "maker_count",
+        "buy_qty",
+        "sell_qty",
+        "volume",
+        "notional",
+        "last_exec_time",
+    )
+
+    def __init__(self, category, symbol):
+        self.category = category
+        self.symbol = symbol
+        self.position = 0.0
+        self.avg_entry_price = 0.0
+        self.realized_pnl = 0.0
+        self.fees = 0.0
+        self.funding_fees = 0.0
+        self.fill_count = 0
+        self.maker_count = 0
+        self.buy_qty = 0.0
+        self.sell_qty = 0.0
+        self.volume = 0.0
+        self.notional = 0.0
+        self.last_exec_time = None
+
+    @property
+    def vwap(self):
+        """Volume weighted average price of every fill."""
+        if not self.volume:
+            return None
+        if self.category == "inverse":
+            # Inverse notional is accumulated in coin terms (qty / price).
+            return self.volume / self.notional
+        return self.notional / self.volume
+
+    @property
+    def net_pnl(self):
+        """Realized PnL less trading and funding fees."""
+        return self.realized_pnl - self.fees - self.funding_fees
+
+    def unrealized_pnl(self, mark_price):
+        if not self.position:
+            return 0.0
+        if self.category == "inverse":
+            return self.position * (
+                1 / self.avg_entry_price - 1 / float(mark_price)
+            )
+        return self.position * (float(mark_price) - self.avg_entry_price)
+
+    def _fill(self, side, qty, price):
+        signed_qty = qty if side == "Buy" else -qty
+        self.fill_count += 1
+        self.volume += qty
+        if self.category == "inverse":
+            self.notional += qty / price
+        else:
+            self.notional += qty * price
+        if side == "Buy":
+            self.buy_qty += qty
+        else:
+            self.sell_qty += qty
+
+        position = self.position
+        if position == 0 or (position > 0) == (signed_qty > 0):
+            # Opening or adding: blend the entry price. Inverse contracts
+            # average entry prices harmonically.
+            new_position = position + signed_qty
+            if self.category == "inverse":
+                self.avg_entry_price = abs(new_position) / (
+                    abs(position) / self.avg_entry_price + qty / price
+                    if position else qty / price
+                )
+            else:
+                self.avg_entry_price = (
+                    abs(position) * self.avg_entry_price + qty * price
+                ) / abs(new_position)
+            self.position = new_position
+            return
+
+        # Reducing, closing or flipping.
+        closed = min(qty, abs(position))
+        direction = 1 if position > 0 else -1
+        if self.category == "inverse":
+            self.realized_pnl += direction * closed * (
+                1 / self.avg_entry_price - 1 / price
+            )
+        else:
+            self.realized_pnl += direction * closed * (
+                price - self.avg_entry_price
+            )
+        self.position = position + signed_qty
+        if abs(self.position) < 1e-12:
+            self.position = 0.0
+            self.avg_entry_price = 0.0
+        elif (self.position > 0) != (position > 0):
+            # Flipped: the remainder opened a new position at this price.
+            self.avg_entry_price = price
+
+    def to_dict(self) -> dict:
+        snapshot = {name: getattr(self, name) for name in self.__slots__}
+        snapshot["vwap"] = self.vwap
+        snapshot["net_pnl"] = self.net_pnl
+        return snapshot
+
+
+class ExecutionAggregator:
+    """Folds the `execution` and `execution.fast` streams into per-symbol
+    position, average entry price, realized PnL, fees, fill counts and VWAP,
+    at O(1) per fill.
+
+    Fills are deduplicated by execId, so both streams can feed the same
+    aggregator: a fill from the fast stream moves the position immediately,
+    and the fee is added when the same fill arrives on the regular stream.
+    Positions are tracked per symbol, i.e. one-way mode is assumed.
+
+    Example:
+        aggregator = ExecutionAggregator()
+        ws.execution_stream(aggregator.handle_message)
+        ws.fast_execution_stream(aggregator.handle_message)
+        ...
+        aggregator.get_stats("linear", "BTCUSDT").net_pnl
+
+    Args:
+        max_exec_ids (int): How many recent execIds to remember for
+            deduplication.
+    """
+
+    def __init__(self, max_exec_ids=10000):
+        self.max_exec_ids = max_exec_ids
+        self._stats = {}
+        # execId -> whether its fee has been applied
+        self._exec_ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, category, symbol):
+        stats = self._stats.get((category, symbol))
+        if stats is None:
+            stats = self._stats[(category, symbol)] = SymbolStats(
+                category, symbol
+            )
+        return stats
+
+    def set_position(self, category, symbol, size, avg_price):
+        """Start from an existing position, eg from `get_positions()`. `size`
+        is signed: negative for shorts."""
+        with self._lock:
+            stats = self._get_or_create(category, symbol)
+            stats.position = float(size)
+            stats.avg_entry_price = float(avg_price) if float(size) else 0.0
+
+    def handle_message(self, message):
+        """Apply an `execution` or `execution.fast` stream message. Usable
+        directly as the stream callback."""
+        with self._lock:
+            for execution in message["data"]:
+                self._apply(execution)
+
+    def _apply(self, execution):
+        exec_id = execution.get("execId")
+        fee = execution.get("execFee")
+        fee_applied = self._exec_ids.get(exec_id)
+        if fee_applied or (fee_applied is not None and fee is None):
+            return
+        stats = self._get_or_create(
+            execution.get("category"), execution["symbol"]
+        )
+
+        if fee_applied is None:
+            exec_type = execution.get("execType", "Trade")
+            if exec_type in POSITION_EXEC_TYPES:
+                qty = float(execution["execQty"])
+                if qty:
+                    stats._fill(
+                        execution["side"], qty, float(execution["execPrice"])
+                    )
+                    if execution.get("isMaker"):
+                        stats.maker_count += 1
+            stats.last_exec_time = execution.get("execTime")
+
+        if fee is not None:
+            if execution.get("execType") == "Funding":
+                stats.funding_fees += float(fee)
+            else:
+                stats.fees += float(fee or 0)
+
+        if exec_id is not None:
+            self._exec_ids[exec_id] = fee is not None
+            self._exec_ids.move_to_end(exec_id)
+            if len(self._exec_ids) > self.max_exec_ids:
+                self._exec_ids.popitem(last=False)
+
+    def get_stats(self, category, symbol) -> SymbolStats:
+        """Returns the live accumulator, or None if the symbol has no
+        executions. Use `snapshot()` for a consistent copy."""
+        return self._stats.get((category, symbol))
+
+    def snapshot(self, category=None, symbol=None) -> list:
+        """Returns the accumulators as dictionaries, optionally filtered."""
+        with self._lock:
+            return [
+                stats.to_dict() for (stats_category, stats_symbol), stats
+                in self._stats.items()
+                if category in (None, stats_category)
+                and symbol in (None, stats_symbol)
+            ]
+
+    def reset(self, category=None, symbol=None):
+        """Drop the accumulators (all, or those matching the filters)."""
+        with self._lock:
+            for key in list(self._stats):
+                if category in (None, key[0]) and symbol in (None, key[1]):
+                    del self._stats[key]
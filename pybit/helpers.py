@@ -1,4 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import threading
+import time
+
+from .order_batcher import BATCH_LIMITS
 
 
 def _opposite_side(side):
@@ -8,10 +13,45 @@ def _opposite_side(side):
         return "Buy"
 
 
+def _timed(method, **kwargs):
+    """Returns (response, exception, seconds taken) for a request."""
+    started = time.perf_counter()
+    try:
+        response, error = method(**kwargs), None
+    except Exception as e:
+        response, error = None, e
+    return response, error, time.perf_counter() - started
+
+
 class Helpers:
-    def __init__(self, session):
+    def __init__(self, session, max_workers=16):
         self.logger = logging.getLogger(__name__)
         self.session = session
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created on first use and kept, so that a flatten does not first have
+        # to wait for threads to start.
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="pybit-helpers",
+                )
+            return self._executor
+
+    @staticmethod
+    def _close_order(category, position):
+        return {
+            "category": category,
+            "symbol": position["symbol"],
+            "side": _opposite_side(position["side"]),
+            "qty": position["size"],
+            "orderType": "Market",
+            "positionIdx": position["positionIdx"],
+        }
 
     def close_position(self, category, symbol) -> list:
         """Market close the positions on a certain symbol.
@@ -24,25 +64,187 @@ class Helpers:
             Request results as list.
 
         Additional information:
+            In hedge mode, both sides' close orders are sent concurrently.
         """
 
-        positions = self.session.get_positions(category=category, symbol=symbol)
-        positions = positions["result"]["list"]
+        positions = self._get_all_positions(category, {"symbol": symbol})
 
-        responses = []
-        for position in positions:
-            if position["side"] and float(position["size"]) != 0:
-                response = self.session.place_order(
-                    category=category,
-                    symbol=symbol,
-                    side=_opposite_side(position["side"]),
-                    qty=position["size"],
-                    orderType="Market",
-                    positionIdx=position["positionIdx"],
-                )
-                responses.append(response)
+        futures = [
+            self._get_executor().submit(
+                self.session.place_order, **self._close_order(category, position)
+            )
+            for position in positions
+            if position["side"] and float(position["size"]) != 0
+        ]
+        responses = [future.result() for future in futures]
 
         if not responses:
             self.logger.error("Tried to close_position; no position detected.")
 
         return responses
+
+    def _get_all_positions(self, category, query):
+        positions = []
+        cursor = None
+        while True:
+            params = dict(query, category=category, limit=200)
+            if cursor:
+                params["cursor"] = cursor
+            response = self.session.get_positions(**params)
+            if isinstance(response, tuple):
+                response = response[0]
+            result = response["result"]
+            positions.extend(result.get("list") or [])
+            cursor = result.get("nextPageCursor")
+            if not cursor:
+                return positions
+
+    def flatten_positions(
+        self,
+        category,
+        symbols=None,
+        cancel_orders=True,
+        use_batch=True,
+        **filters,
+    ) -> dict:
+        """Market close every position in a category, and cancel its open
+        orders, as fast as possible.
+
+        All positions are fetched up front (following pagination). The close
+        orders are reduce-only, and are sent concurrently either as
+        `place_batch_order()` requests of up to the category's batch limit or,
+        with `use_batch=False`, as one `place_order()` each. Open orders are
+        cancelled concurrently with the closes: with one `cancel_all_orders()`
+        per symbol if `symbols` is given, otherwise with one for the whole
+        category and filters.
+
+        Required args:
+            category (string): Product type: linear,inverse,option
+
+        Optional args:
+            symbols (list): Only flatten these symbols; their positions are
+                fetched one symbol at a time
+            cancel_orders (bool): Whether to cancel open orders too
+            use_batch (bool): Close through the batch endpoint
+            **filters: Position filters, eg settleCoin="USDT", which linear
+                and inverse require when no symbols are given (a ValueError
+                is raised otherwise)
+
+        Returns:
+            A dict with "closes", one entry per position closed, and
+            "cancels", one entry per cancel request. Each entry has the
+            symbol, the "response", the "error" raised (or the batch item's
+            error message) and the request's "elapsed" seconds. "elapsed" is
+            the total time taken.
+        """
+        started = time.perf_counter()
+        executor = self._get_executor()
+
+        if symbols is not None:
+            queries = [dict(filters, symbol=symbol) for symbol in symbols]
+        elif (
+            category in ("linear", "inverse")
+            and not filters.get("symbol")
+            and not filters.get("settleCoin")
+        ):
+            raise ValueError(
+                f"flatten_positions() needs symbols or settleCoin for "
+                f"{category} positions."
+            )
+        else:
+            queries = [filters]
+        positions = [
+            position
+            for positions in executor.map(
+                lambda query: self._get_all_positions(category, query), queries
+            )
+            for position in positions
+        ]
+        positions = [
+            position for position in positions
+            if position["side"] and float(position["size"]) != 0
+            and (symbols is None or position["symbol"] in symbols)
+        ]
+        orders = [self._close_order(category, position) for position in positions]
+        for order in orders:
+            order["reduceOnly"] = True
+
+        cancel_futures = []
+        if cancel_orders:
+            cancel_queries = (
+                [{"symbol": symbol} for symbol in symbols]
+                if symbols is not None else [filters]
+            )
+            cancel_futures = [
+                (query.get("symbol"), executor.submit(
+                    _timed, self.session.cancel_all_orders,
+                    category=category, **query,
+                ))
+                for query in cancel_queries
+            ]
+
+        if use_batch:
+            limit = BATCH_LIMITS.get(category, 10)
+            batches = [orders[i:i + limit] for i in range(0, len(orders), limit)]
+            close_futures = [
+                (batch, executor.submit(
+                    _timed, self.session.place_batch_order,
+                    category=category,
+                    request=[
+                        {k: v for k, v in order.items() if k != "category"}
+                        for order in batch
+                    ],
+                ))
+                for batch in batches
+            ]
+        else:
+            close_futures = [
+                ([order], executor.submit(
+                    _timed, self.session.place_order, **order
+                ))
+                for order in orders
+            ]
+
+        closes = []
+        for batch, future in close_futures:
+            response, error, elapsed = future.result()
+            if use_batch and response is not None:
+                body = response[0] if isinstance(response, tuple) else response
+                results = (body.get("result") or {}).get("list") or []
+                statuses = (body.get("retExtInfo") or {}).get("list") or []
+            for i, order in enumerate(batch):
+                entry = {
+                    "symbol": order["symbol"],
+                    "positionIdx": order["positionIdx"],
+                    "side": order["side"],
+                    "qty": order["qty"],
+                    "response": response,
+                    "error": error,
+                    "elapsed": elapsed,
+                }
+                if use_batch and response is not None:
+                    entry["response"] = results[i] if i < len(results) else None
+                    status = statuses[i] if i < len(statuses) else {}
+                    if status.get("code"):
+                        entry["error"] = status.get("msg")
+                closes.append(entry)
+
+        cancels = []
+        for symbol, future in cancel_futures:
+            response, error, elapsed = future.result()
+            cancels.append({
+                "symbol": symbol,
+                "response": response,
+                "error": error,
+                "elapsed": elapsed,
+            })
+
+        failed = sum(1 for entry in closes + cancels if entry["error"])
+        if failed:
+            self.logger.error(f"flatten_positions: {failed} requests failed.")
+        return {
+            "closes": closes,
+            "cancels": cancels,
+            "elapsed": time.perf_counter() - started,
+        }
+
@@ -0,0 +1,272 @@
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+import logging
+import threading
+
+
+CATEGORIES = ("spot", "linear", "inverse", "option")
+PAGE_LIMIT = 1000
+# Without baseCoin, get_instruments_info() returns only BTC options.
+OPTION_BASE_COINS = ("BTC", "ETH", "SOL")
+
+
+def _decimal(value):
+    if value is None or value == "":
+        return None
+    return Decimal(value)
+
+
+@dataclass(frozen=True, slots=True)
+class Instrument:
+    """Trading rules of a single symbol, as returned by
+    `get_instruments_info()`, with the numeric filters parsed once."""
+
+    category: str
+    symbol: str
+    status: str
+    base_coin: str
+    quote_coin: str
+    settle_coin: str = None
+    contract_type: str = None
+    tick_size: Decimal = None
+    min_price: Decimal = None
+    max_price: Decimal = None
+    qty_step: Decimal = None
+    min_order_qty: Decimal = None
+    max_order_qty: Decimal = None
+    max_market_order_qty: Decimal = None
+    min_notional: Decimal = None
+    min_leverage: Decimal = None
+    max_leverage: Decimal = None
+    leverage_step: Decimal = None
+    raw: dict = field(default=None, compare=False, repr=False)
+
+    @classmethod
+    def from_dict(cls, category, data):
+        price_filter = data.get("priceFilter") or {}
+        lot_size_filter = data.get("lotSizeFilter") or {}
+        leverage_filter = data.get("leverageFilter") or {}
+        return cls(
+            category=category,
+            symbol=data["symbol"],
+            status=data.get("status"),
+            base_coin=data.get("baseCoin"),
+            quote_coin=data.get("quoteCoin"),
+            settle_coin=data.get("settleCoin"),
+            contract_type=data.get("contractType") or data.get("optionsType"),
+            tick_size=_decimal(price_filter.get("tickSize")),
+            min_price=_decimal(price_filter.get("minPrice")),
+            max_price=_decimal(price_filter.get("maxPrice")),
+            # Spot instruments express the quantity step as basePrecision.
+            qty_step=_decimal(
+                lot_size_filter.get("qtyStep")
+                or lot_size_filter.get("basePrecision")
+            ),
+            min_order_qty=_decimal(lot_size_filter.get("minOrderQty")),
+            max_order_qty=_decimal(lot_size_filter.get("maxOrderQty")),
+            max_market_order_qty=_decimal(lot_size_filter.get("maxMktOrderQty")),
+            min_notional=_decimal(
+                lot_size_filter.get("minNotionalValue")
+                or lot_size_filter.get("minOrderAmt")
+            ),
+            min_leverage=_decimal(leverage_filter.get("minLeverage")),
+            max_leverage=_decimal(leverage_filter.get("maxLeverage")),
+            leverage_step=_decimal(leverage_filter.get("leverageStep")),
+            raw=data,
+        )
+
+    @staticmethod
+    def _round_to_step(value, step, rounding):
+        value = Decimal(str(value))
+        if not step:
+            return value
+        return ((value / step).to_integral_value(rounding) * step).quantize(step)
+
+    def round_price(self, price, rounding=ROUND_HALF_UP) -> Decimal:
+        """Round the price to the symbol's tick size."""
+        return self._round_to_step(price, self.tick_size, rounding)
+
+    def round_qty(self, qty, rounding=ROUND_DOWN) -> Decimal:
+        """Round the quantity to the symbol's quantity step. Rounds down by
+        default so that the order never exceeds the intended size."""
+        return self._round_to_step(qty, self.qty_step, rounding)
+
+    def validate_order(self, qty, price=None) -> list:
+        """Check an order against the symbol's filters.
+
+        Returns:
+            A list of human readable problems; empty if the order is valid.
+        """
+        problems = []
+        qty = Decimal(str(qty))
+        if self.qty_step and qty % self.qty_step:
+            problems.append(f"qty {qty} is not a multiple of {self.qty_step}")
+        if self.min_order_qty is not None and qty < self.min_order_qty:
+            problems.append(f"qty {qty} is below the minimum {self.min_order_qty}")
+        if self.max_order_qty is not None and qty > self.max_order_qty:
+            problems.append(f"qty {qty} is above the maximum {self.max_order_qty}")
+
+        if price is None:
+            return problems
+        price = Decimal(str(price))
+        if self.tick_size and price % self.tick_size:
+            problems.append(f"price {price} is not a multiple of {self.tick_size}")
+        if self.min_price and price < self.min_price:
+            problems.append(f"price {price} is below the minimum {self.min_price}")
+        if self.max_price and price > self.max_price:
+            problems.append(f"price {price} is above the maximum {self.max_price}")
+        if self.min_notional is not None and price * qty < self.min_notional:
+            problems.append(
+                f"order value {price * qty} is below the minimum "
+                f"{self.min_notional}"
+            )
+        return problems
+
+
+class InstrumentRegistry:
+    """In-memory index of instrument metadata for O(1) symbol lookups.
+
+    Loads every page of `get_instruments_info()` for each category and keeps
+    it current with `refresh()`, or in the background with
+    `start_auto_refresh()`. Options are loaded per base coin, for each of
+    `option_base_coins`.
+
+    Example:
+        registry = InstrumentRegistry(HTTP(testnet=True))
+        registry.load()
+        qty = registry.round_qty("linear", "BTCUSDT", 0.12345)
+    """
+
+    def __init__(
+        self, session, categories=CATEGORIES, option_base_coins=OPTION_BASE_COINS
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.session = session
+        self.categories = tuple(categories)
+        self.option_base_coins = tuple(option_base_coins)
+        # Each category maps to its own {symbol: Instrument} dict, which is
+        # swapped out wholesale on refresh so that readers never need a lock.
+        self._instruments = {category: {} for category in self.categories}
+        self._refresh_timer = None
+        self._refresh_interval = None
+        self._next_category = 0
+        self._lock = threading.Lock()
+
+    def _fetch(self, category):
+        if category == "option":
+            return [
+                instrument
+                for base_coin in self.option_base_coins
+                for instrument in self._fetch_pages(category, baseCoin=base_coin)
+            ]
+        return self._fetch_pages(category)
+
+    def _fetch_pages(self, category, **filters):
+        instruments = []
+        cursor = None
+        while True:
+            query = dict(filters, category=category, limit=PAGE_LIMIT)
+            if cursor:
+                query["cursor"] = cursor
+            result = self.session.get_instruments_info(**query)["result"]
+            instruments.extend(result["list"])
+            next_cursor = result.get("nextPageCursor")
+            if not next_cursor or next_cursor == cursor:
+                return instruments
+            cursor = next_cursor
+
+    def load(self):
+        """Load all configured categories."""
+        for category in self.categories:
+            self.refresh(category)
+
+    def refresh(self, category=None) -> dict:
+        """Re-download one category (or all of them) and apply the changes.
+
+        Returns:
+            A dictionary listing the "added", "updated" and "removed" symbols.
+        """
+        categories = self.categories if category is None else (category,)
+        changes = {"added": [], "updated": [], "removed": []}
+        for category in categories:
+            fetched = {
+                data["symbol"]: Instrument.from_dict(category, data)
+                for data in self._fetch(category)
+            }
+            with self._lock:
+                current = self._instruments.get(category, {})
+                for symbol, instrument in fetched.items():
+                    previous = current.get(symbol)
+                    if previous is None:
+                        changes["added"].append(symbol)
+                    elif previous.raw != instrument.raw:
+                        changes["updated"].append(symbol)
+                    else:
+                        # Keep the existing object so identity is stable for
+                        # callers holding a reference.
+                        fetched[symbol] = previous
+                changes["removed"].extend(
+                    symbol for symbol in current if symbol not in fetched
+                )
+                self._instruments[category] = fetched
+        return changes
+
+    def get(self, category, symbol) -> Instrument:
+        """Returns the Instrument, or None if the symbol is unknown."""
+        return self._instruments.get(category, {}).get(symbol)
+
+    def __getitem__(self, key):
+        category, symbol = key
+        instrument = self.get(category, symbol)
+        if instrument is None:
+            raise KeyError(f"Unknown {category} symbol: {symbol}")
+        return instrument
+
+    def __contains__(self, key):
+        return self.get(*key) is not None
+
+    def symbols(self, category) -> list:
+        return list(self._instruments.get(category, {}))
+
+    def round_price(self, category, symbol, price, rounding=ROUND_HALF_UP):
+        return self[category, symbol].round_price(price, rounding)
+
+    def round_qty(self, category, symbol, qty, rounding=ROUND_DOWN):
+        return self[category, symbol].round_qty(qty, rounding)
+
+    def validate_order(self, category, symbol, qty, price=None) -> list:
+        return self[category, symbol].validate_order(qty, price)
+
+    def start_auto_refresh(self, interval=300):
+        """Refresh in a daemon thread. Categories are refreshed one at a time,
+        round-robin, so each tick costs a single category's worth of
+        requests and a full cycle takes `interval` seconds."""
+        self.stop_auto_refresh()
+        self._refresh_interval = interval
+        self._schedule_refresh()
+
+    def stop_auto_refresh(self):
+        self._refresh_interval = None
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def _schedule_refresh(self):
+        if self._refresh_interval is None:
+            return
+        self._refresh_timer = threading.Timer(
+            self._refresh_interval / len(self.categories), self._auto_refresh
+        )
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _auto_refresh(self):
+        category = self.categories[self._next_category % len(self.categories)]
+        self._next_category += 1
+        try:
+            changes = self.refresh(category)
+            if any(changes.values()):
+                self.logger.debug(f"Refreshed {category} instruments: {changes}")
+        except Exception as e:
+            self.logger.error(f"Failed to refresh {category} instruments: {e}")
+        self._schedule_refresh()
@@ -0,0 +1,233 @@
+from array import array
+
+
+# get_kline() intervals in milliseconds. Daily and longer intervals are not
+# fixed-length multiples and cannot seed a builder.
+KLINE_INTERVALS = {
+    str(minutes): minutes * 60000
+    for minutes in (1, 3, 5, 15, 30, 60, 120, 240, 360, 720)
+}
+
+COLUMNS = ("start", "end", "open", "high", "low", "close", "volume",
+           "turnover", "trades")
+
+
+class KlineBuilder:
+    """Builds OHLCV bars for one symbol from `publicTrade` messages.
+
+    Exactly one bar type must be chosen:
+        interval (int): Time bars of this many milliseconds, eg 250 or
+            90000. Bars are aligned to multiples of the interval.
+        volume (float): Volume bars which close once they hold this much
+            volume. Trades which overflow a bar are split across bars.
+        ticks (int): Tick bars which close after this many trades.
+
+    Closed bars are kept in columnar `array` storage (see `columns()`).
+    Old bars are dropped in batches, so that trimming is amortised O(1):
+    once `2 * max_bars` are held, all but the latest `max_bars` are
+    dropped. Up to `2 * max_bars - 1` bars may therefore be kept, and the
+    latest `max_bars` always are. `on_close`, if given, is called with each
+    closed bar as a dictionary. Time bars close when the first trade of a
+    later bar arrives, or on `flush()`.
+
+    Example:
+        builder = KlineBuilder(interval=500, on_close=print)
+        builder.seed(session, category="linear", symbol="BTCUSDT") # optional
+        ws.trade_stream("BTCUSDT", builder.handle_message)
+
+    Args:
+        symbol (string): Optional; trades for other symbols are ignored.
+        fill_gaps (bool): Emit flat, zero-volume time bars for intervals
+            without trades, like exchange klines.
+    """
+
+    def __init__(
+        self,
+        interval=None,
+        volume=None,
+        ticks=None,
+        symbol=None,
+        max_bars=10000,
+        on_close=None,
+        fill_gaps=False,
+    ):
+        if sum(option is not None for option in (interval, volume, ticks)) != 1:
+            raise ValueError("Choose exactly one of interval, volume or ticks.")
+        self.interval = int(interval) if interval is not None else None
+        self.volume_threshold = float(volume) if volume is not None else None
+        self.tick_threshold = int(ticks) if ticks is not None else None
+        self.symbol = symbol
+        self.max_bars = max_bars
+        self.on_close = on_close
+        self.fill_gaps = fill_gaps
+
+        self._columns = {
+            name: array("q" if name in ("start", "end", "trades") else "d")
+            for name in COLUMNS
+        }
+        self.current = None
+
+    def __len__(self):
+        return len(self._columns["start"])
+
+    # Trades
+
+    def handle_message(self, message):
+        """Apply a `publicTrade` stream message."""
+        for trade in message["data"]:
+            if self.symbol is None or trade.get("s") == self.symbol:
+                self.add_trade(trade["T"], trade["p"], trade["v"])
+
+    def add_trade(self, ts, price, size):
+        ts = int(ts)
+        price = float(price)
+        size = float(size)
+
+        if self.interval is not None:
+            start = ts - ts % self.interval
+            if self.current is not None and start > self.current["start"]:
+                previous_close = self.current["close"]
+                self._close_bar()
+                if self.fill_gaps:
+                    self._fill_gaps(previous_close, start)
+            if self.current is None:
+                self._open_bar(start, price)
+            self._update_bar(ts, price, size)
+            return
+
+        if self.tick_threshold is not None:
+            if self.current is None:
+                self._open_bar(ts, price)
+            self._update_bar(ts, price, size)
+            if self.current["trades"] >= self.tick_threshold:
+                self._close_bar()
+            return
+
+        # Volume bars: split the trade wherever it crosses a bar boundary.
+        while True:
+            if self.current is None:
+                self._open_bar(ts, price)
+            room = self.volume_threshold - self.current["volume"]
+            fill = min(size, room)
+            self._update_bar(ts, price, fill)
+            size -= fill
+            if self.current["volume"] >= self.volume_threshold - 1e-12:
+                self._close_bar()
+            if size <= 1e-12:
+                return
+
+    def _open_bar(self, start, price):
+        self.current = {
+            "start": start,
+            "end": start,
+            "open": price,
+            "high": price,
+            "low": price,
+            "close": price,
+            "volume": 0.0,
+            "turnover": 0.0,
+            "trades": 0,
+        }
+
+    def _update_bar(self, ts, price, size):
+        bar = self.current
+        if price > bar["high"]:
+            bar["high"] = price
+        elif price < bar["low"]:
+            bar["low"] = price
+        bar["close"] = price
+        bar["volume"] += size
+        bar["turnover"] += size * price
+        bar["trades"] += 1
+        if self.interval is not None:
+            bar["end"] = bar["start"] + self.interval - 1
+        else:
+            bar["end"] = ts
+
+    def _fill_gaps(self, price, until):
+        start = self._columns["start"][-1] + self.interval
+        while start < until:
+            self._open_bar(start, price)
+            self.current["end"] = start + self.interval - 1
+            self._close_bar()
+            start += self.interval
+
+    def _close_bar(self):
+        bar = self.current
+        self.current = None
+        self._store(bar)
+        if self.on_close is not None:
+            self.on_close(bar)
+
+    def _store(self, bar):
+        for name, column in self._columns.items():
+            column.append(bar[name])
+        # Trim in batches so that dropping old bars is amortised O(1).
+        if len(self._columns["start"]) >= 2 * self.max_bars:
+            for column in self._columns.values():
+                del column[:-self.max_bars]
+
+    def flush(self, now=None):
+        """Close the current bar. For time bars, only if its interval has
+        ended by `now` (epoch milliseconds), when given."""
+        if self.current is None:
+            return
+        if (
+            now is not None and self.interval is not None
+            and now <= self.current["end"]
+        ):
+            return
+        self._close_bar()
+
+    # History
+
+    def seed(self, session, category, symbol, kline_interval="1", limit=1000):
+        """Load history from `get_kline()`; call it before subscribing to
+        the trade stream. Only time bars whose interval is a multiple of
+        `kline_interval` can be seeded; the latest, unfinished kline becomes
+        the current bar."""
+        kline_ms = KLINE_INTERVALS.get(str(kline_interval))
+        if self.interval is None or kline_ms is None or self.interval % kline_ms:
+            raise ValueError(
+                "Only time bars which are a multiple of a minute-based "
+                "kline_interval can be seeded."
+            )
+        klines = session.get_kline(
+            category=category, symbol=symbol, interval=str(kline_interval),
+            limit=limit,
+        )["result"]["list"]
+        # Klines are returned newest first.
+        for start, open_, high, low, close, volume, turnover in reversed(klines):
+            start = int(start)
+            bar_start = start - start % self.interval
+            if self.current is not None and bar_start > self.current["start"]:
+                self._store(self.current)
+                self.current = None
+            if self.current is None:
+                self._open_bar(bar_start, float(open_))
+                self.current["end"] = bar_start + self.interval - 1
+            bar = self.current
+            bar["high"] = max(bar["high"], float(high))
+            bar["low"] = min(bar["low"], float(low))
+            bar["close"] = float(close)
+            bar["volume"] += float(volume)
+            bar["turnover"] += float(turnover)
+
+    # Reads
+
+    def columns(self) -> dict:
+        """Returns copies of the closed bars' columns, oldest first, keyed
+        by start, end, open, high, low, close, volume, turnover and
+        trades."""
+        return {name: array(column.typecode, column)
+                for name, column in self._columns.items()}
+
+    def get_bars(self, count=None) -> list:
+        """Returns the last `count` closed bars (all by default) as
+        dictionaries, oldest first."""
+        total = len(self)
+        first = 0 if count is None else max(total - count, 0)
+        return [
+            {name: column[i] for name, column in self._columns.items()}
+            for i in range(first, total)
+        ]
@@ -0,0 +1,944 @@
+"""
+An in-process mock of the Bybit V5 HTTP and WebSocket APIs, for offline
+integration tests, load tests and benchmarks.
+
+The mock verifies HMAC signatures, returns rate limit headers, maintains
+order books which it streams as snapshot/delta messages, and acknowledges
+orders over both HTTP and the WebSocket trade API. Chaos knobs simulate slow
+responses, dropped responses, rate limit (10006) bursts and disconnects.
+
+Point the clients at it with the `endpoint` argument:
+
+    with MockExchange() as exchange:
+        session = HTTP(
+            endpoint=exchange.http_endpoint,
+            api_key=exchange.api_key,
+            api_secret=exchange.api_secret,
+        )
+        ws = WebSocket(
+            testnet=False, channel_type="linear",
+            endpoint=exchange.ws_endpoint,
+        )
+        exchange.set_orderbook("BTCUSDT", bids=[["30000", "1"]], asks=[["30001", "2"]])
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+import uuid
+
+from . import _helpers
+
+
+logger = logging.getLogger(__name__)
+
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+OPEN_ORDER_STATUSES = {"New", "PartiallyFilled", "Untriggered"}
+
+
+class _MockError(Exception):
+    def __init__(self, code, message):
+        self.code = code
+        self.message = message
+        super().__init__(f"{message} (ErrCode: {code})")
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.exchange._handle_http(self, "GET")
+
+    def do_POST(self):
+        self.server.exchange._handle_http(self, "POST")
+
+    def log_message(self, format, *args):
+        logger.debug(f"Mock HTTP: {format % args}")
+
+
+class _WebSocketHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        connection = _MockWebSocketConnection(self.server.exchange, self.request)
+        if not connection.handshake():
+            return
+        self.server.exchange._register_connection(connection)
+        try:
+            connection.serve()
+        finally:
+            self.server.exchange._unregister_connection(connection)
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _MockWebSocketConnection:
+    """Server side of a single RFC 6455 connection."""
+
+    def __init__(self, exchange, sock):
+        self.exchange = exchange
+        self.sock = sock
+        self.path = None
+        self.conn_id = uuid.uuid4().hex
+        self.authenticated = False
+        self.topics = set()
+        self.closed = False
+        self._buffer = b""
+        self._send_lock = threading.Lock()
+
+    @property
+    def channel(self):
+        """One of "public", "private" or "trade"."""
+        if self.path.startswith("/v5/public"):
+            return "public"
+        if self.path.startswith("/v5/trade"):
+            return "trade"
+        return "private"
+
+    @property
+    def category(self):
+        return self.path.rsplit("/", 1)[-1]
+
+    def _recv_exact(self, size):
+        while len(self._buffer) < size:
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("Connection closed by client.")
+            self._buffer += data
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def handshake(self):
+        try:
+            while b"\r\n\r\n" not in self._buffer:
+                data = self.sock.recv(65536)
+                if not data:
+                    return False
+                self._buffer += data
+        except OSError:
+            return False
+        request, self._buffer = self._buffer.split(b"\r\n\r\n", 1)
+        lines = request.decode("latin-1").split("\r\n")
+        self.path = urlsplit(lines[0].split(" ")[1]).path
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        accept = base64.b64encode(
+            hashlib.sha1(
+                (headers.get("sec-websocket-key", "") + WS_GUID).encode()
+            ).digest()
+        ).decode()
+        self.sock.sendall(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode()
+        )
+        return True
+
+    def _read_frame(self):
+        first, second = self._recv_exact(2)
+        fin = first & 0x80
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            (length,) = struct.unpack(">H", self._recv_exact(2))
+        elif length == 127:
+            (length,) = struct.unpack(">Q", self._recv_exact(8))
+        mask = self._recv_exact(4) if second & 0x80 else None
+        payload = self._recv_exact(length)
+        if mask and length:
+            repeated_mask = (mask * (length // 4 + 1))[:length]
+            payload = (
+                int.from_bytes(payload, "big")
+                ^ int.from_bytes(repeated_mask, "big")
+            ).to_bytes(length, "big")
+        return fin, opcode, payload
+
+    def serve(self):
+        fragments = []
+        fragment_opcode = None
+        try:
+            while not self.closed:
+                fin, opcode, payload = self._read_frame()
+                if opcode == OPCODE_CLOSE:
+                    self._send_frame(OPCODE_CLOSE, payload[:2])
+                    break
+                if opcode == OPCODE_PING:
+                    self._send_frame(OPCODE_PONG, payload)
+                    continue
+                if opcode == OPCODE_PONG:
+                    continue
+                if opcode != OPCODE_CONTINUATION:
+                    fragment_opcode = opcode
+                fragments.append(payload)
+                if not fin:
+                    continue
+                message = b"".join(fragments)
+                fragments = []
+                if fragment_opcode in (OPCODE_TEXT, OPCODE_BINARY):
+                    self.exchange._handle_ws_message(self, json.loads(message))
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            self.close()
+
+    def _send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack(">BB", 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+        with self._send_lock:
+            self.sock.sendall(header + payload)
+
+    def send_json(self, message):
+        if self.closed:
+            return
+        try:
+            self._send_frame(OPCODE_TEXT, json.dumps(message).encode("utf-8"))
+        except OSError:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class MockExchange:
+    """In-process mock Bybit V5 exchange. See the module docstring.
+
+    Chaos attributes, which may be changed while running:
+        latency (float): Seconds to wait before answering HTTP requests and
+            WebSocket order operations.
+        drop_rate (float): Probability (0-1) of dropping an HTTP request
+            (the connection is closed without a response) or a WebSocket
+            order acknowledgement.
+        rate_limit (int): Requests per second allowed per API key (or per
+            client address for public requests) before 10006 is returned.
+    """
+
+    def __init__(
+        self,
+        api_key="mock-api-key",
+        api_secret="mock-api-secret",
+        host="127.0.0.1",
+        http_port=0,
+        ws_port=0,
+        rate_limit=600,
+        latency=0.0,
+        drop_rate=0.0,
+    ):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.host = host
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.drop_rate = drop_rate
+
+        self.instruments = {}
+        self.positions = {}
+        self.wallet_balance = []
+        self.orders = {}
+        self.request_count = 0
+        self.ws_message_count = 0
+
+        self._http_port = http_port
+        self._ws_port = ws_port
+        self._http_server = None
+        self._ws_server = None
+        self._threads = []
+        self._connections = set()
+        self._books = {}
+        self._tickers = {}
+        self._rate_windows = {}
+        self._forced_rate_limit_errors = 0
+        self._lock = threading.RLock()
+
+    # Lifecycle
+
+    def start(self):
+        self._http_server = ThreadingHTTPServer(
+            (self.host, self._http_port), _HTTPHandler
+        )
+        self._http_server.daemon_threads = True
+        self._http_server.exchange = self
+        self._ws_server = _ThreadingTCPServer(
+            (self.host, self._ws_port), _WebSocketHandler
+        )
+        self._ws_server.exchange = self
+        for server in (self._http_server, self._ws_server):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self.disconnect_all()
+        for server in (self._http_server, self._ws_server):
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def http_endpoint(self):
+        return f"http://{self.host}:{self._http_server.server_address[1]}"
+
+    @property
+    def ws_endpoint(self):
+        return f"ws://{self.host}:{self._ws_server.server_address[1]}"
+
+    # Chaos
+
+    def inject_rate_limit_errors(self, count):
+        """Answer the next `count` HTTP requests with retCode 10006."""
+        with self._lock:
+            self._forced_rate_limit_errors += count
+
+    def disconnect_all(self):
+        """Drop every WebSocket connection, as if the network went away."""
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.close()
+
+    # Market data
+
+    @staticmethod
+    def _sorted_levels(levels, side):
+        return sorted(
+            ([price, size] for price, size in levels.items()),
+            key=lambda level: float(level[0]),
+            reverse=side == "b",
+        )
+
+    def set_orderbook(self, symbol, bids, asks, category="linear"):
+        """Replace a book and push a snapshot to its subscribers."""
+        with self._lock:
+            book = self._books.setdefault(
+                (category, symbol), {"b": {}, "a": {}, "u": 0, "seq": 0}
+            )
+            book["b"] = {price: size for price, size in bids}
+            book["a"] = {price: size for price, size in asks}
+            book["u"] += 1
+            book["seq"] += 1
+        self._publish_book(category, symbol, "snapshot")
+
+    def publish_orderbook_delta(self, symbol, bids=(), asks=(), category="linear"):
+        """Apply a delta (a size of "0" deletes the level) and push it."""
+        with self._lock:
+            book = self._books.setdefault(
+                (category, symbol), {"b": {}, "a": {}, "u": 0, "seq": 0}
+            )
+            for side, levels in (("b", bids), ("a", asks)):
+                for price, size in levels:
+                    if float(size) == 0:
+                        book[side].pop(price, None)
+                    else:
+                        book[side][price] = size
+            book["u"] += 1
+            book["seq"] += 1
+        self._publish_book(
+            category, symbol, "delta", [list(level) for level in bids],
+            [list(level) for level in asks],
+        )
+
+    def _book_message(self, topic, category, symbol, message_type, bids, asks):
+        book = self._books[(category, symbol)]
+        now = _helpers.generate_timestamp()
+        return {
+            "topic": topic,
+            "type": message_type,
+            "ts": now,
+            "data": {
+                "s": symbol, "b": bids, "a": asks,
+                "u": book["u"], "seq": book["seq"],
+            },
+            "cts": now,
+        }
+
+    def _publish_book(self, category, symbol, message_type, bids=None, asks=None):
+        suffix = f".{symbol}"
+        for connection in self._subscribers(category, "orderbook."):
+            for topic in list(connection.topics):
+                if not (topic.startswith("orderbook.") and topic.endswith(suffix)):
+                    continue
+                with self._lock:
+                    if message_type == "snapshot":
+                        message = self._snapshot_message(topic, category, symbol)
+                    else:
+                        message = self._book_message(
+                            topic, category, symbol, "delta", bids, asks
+                        )
+                connection.send_json(message)
+
+    def _snapshot_message(self, topic, category, symbol):
+        depth = topic.split(".")[1]
+        depth = int(depth) if depth.isdigit() else None
+        book = self._books.setdefault(
+            (category, symbol), {"b": {}, "a": {}, "u": 0, "seq": 0}
+        )
+        return self._book_message(
+            topic, category, symbol, "snapshot",
+            self._sorted_levels(book["b"], "b")[:depth],
+            self._sorted_levels(book["a"], "a")[:depth],
+        )
+
+    def publish_trade(self, symbol, price, size, side="Buy", category="linear"):
+        """Push a single publicTrade message."""
+        now = _helpers.generate_timestamp()
+        topic = f"publicTrade.{symbol}"
+        message = {
+            "topic": topic,
+            "type": "snapshot",
+            "ts": now,
+            "data": [{
+                "T": now, "s": symbol, "S": side, "v": str(size),
+                "p": str(price), "L": "PlusTick", "i": uuid.uuid4().hex,
+                "BT": False,
+            }],
+        }
+        for connection in self._subscribers(category, topic):
+            connection.send_json(message)
+
+    def publish_ticker(self, symbol, category="linear", **fields):
+        """Merge `fields` into the ticker and push them as a delta."""
+        with self._lock:
+            ticker = self._tickers.setdefault(
+                (category, symbol), {"symbol": symbol}
+            )
+            ticker.update({key: str(value) for key, value in fields.items()})
+        topic = f"tickers.{symbol}"
+        message = {
+            "topic": topic,
+            "type": "delta",
+            "ts": _helpers.generate_timestamp(),
+            "data": {"symbol": symbol, **{k: str(v) for k, v in fields.items()}},
+        }
+        for connection in self._subscribers(category, topic):
+            connection.send_json(message)
+
+    def run_orderbook_feed(
+        self, symbol, interval=0.01, levels=50, category="linear",
+        mid_price=30000.0, tick_size=0.5, stop_event=None,
+    ):
+        """Stream random-walk deltas for `symbol` from a daemon thread until
+        `stop_event` (returned) is set. Useful for load tests."""
+        stop_event = stop_event or threading.Event()
+        self.set_orderbook(
+            symbol,
+            bids=[[f"{mid_price - tick_size * (i + 1):.2f}", "1"] for i in range(levels)],
+            asks=[[f"{mid_price + tick_size * (i + 1):.2f}", "1"] for i in range(levels)],
+            category=category,
+        )
+
+        def feed():
+            rng = random.Random(symbol)
+            while not stop_event.wait(interval):
+                offset = tick_size * rng.randint(1, levels)
+                size = f"{rng.random() * 10:.3f}"
+                bid = [f"{mid_price - offset:.2f}", size]
+                ask = [f"{mid_price + offset:.2f}", size]
+                self.publish_orderbook_delta(
+                    symbol, bids=[bid], asks=[ask], category=category
+                )
+
+        threading.Thread(target=feed, daemon=True).start()
+        return stop_event
+
+    # Orders
+
+    def _find_order(self, category, params):
+        for order in self.orders.values():
+            if order["category"] != category:
+                continue
+            if params.get("orderId") and order["orderId"] == params["orderId"]:
+                return order
+            if (
+                params.get("orderLinkId")
+                and order["orderLinkId"] == params["orderLinkId"]
+            ):
+                return order
+        return None
+
+    def _best_price(self, category, symbol, side):
+        book = self._books.get((category, symbol))
+        opposite = "a" if side == "Buy" else "b"
+        if not book or not book[opposite]:
+            return None
+        return self._sorted_levels(book[opposite], opposite)[0][0]
+
+    def _create_order(self, category, params):
+        for name in ("symbol", "side", "orderType", "qty"):
+            if not params.get(name):
+                raise _MockError(10001, f"params error: {name} is required")
+        with self._lock:
+            order_link_id = params.get("orderLinkId") or ""
+            if order_link_id and self._find_order(
+                category, {"orderLinkId": order_link_id}
+            ):
+                raise _MockError(110072, "OrderLinkedID is duplicate")
+            now = str(_helpers.generate_timestamp())
+            order = {
+                "category": category,
+                "orderId": str(uuid.uuid4()),
+                "orderLinkId": order_link_id,
+                "symbol": params["symbol"],
+                "side": params["side"],
+                "orderType": params["orderType"],
+                "price": str(params.get("price", "0")),
+                "qty": str(params["qty"]),
+                "orderStatus": "New",
+                "cumExecQty": "0",
+                "avgPrice": "",
+                "reduceOnly": bool(params.get("reduceOnly", False)),
+                "positionIdx": int(params.get("positionIdx", 0)),
+                "createdTime": now,
+                "updatedTime": now,
+            }
+            self.orders[order["orderId"]] = order
+            execution = None
+            if order["orderType"] == "Market":
+                price = self._best_price(category, order["symbol"], order["side"])
+                price = price or order["price"]
+                order.update(
+                    orderStatus="Filled", cumExecQty=order["qty"], avgPrice=price
+                )
+                execution = {
+                    "category": category,
+                    "symbol": order["symbol"],
+                    "execId": str(uuid.uuid4()),
+                    "execPrice": price,
+                    "execQty": order["qty"],
+                    "execFee": "0",
+                    "feeRate": "0",
+                    "execType": "Trade",
+                    "side": order["side"],
+                    "orderId": order["orderId"],
+                    "orderLinkId": order_link_id,
+                    "isMaker": False,
+                    "execTime": now,
+                }
+        self.publish_private("order", [dict(order)])
+        if execution:
+            self.publish_private("execution", [execution])
+        return {"orderId": order["orderId"], "orderLinkId": order_link_id}
+
+    def _amend_order(self, category, params):
+        with self._lock:
+            order = self._find_order(category, params)
+            if order is None or order["orderStatus"] not in OPEN_ORDER_STATUSES:
+                raise _MockError(110001, "order not exists or too late to amend")
+            for name in ("price", "qty"):
+                if params.get(name) is not None:
+                    order[name] = str(params[name])
+            order["updatedTime"] = str(_helpers.generate_timestamp())
+            snapshot = dict(order)
+        self.publish_private("order", [snapshot])
+        return {"orderId": order["orderId"], "orderLinkId": order["orderLinkId"]}
+
+    def _cancel_order(self, category, params):
+        with self._lock:
+            order = self._find_order(category, params)
+            if order is None or order["orderStatus"] not in OPEN_ORDER_STATUSES:
+                raise _MockError(110001, "order not exists or too late to cancel")
+            order["orderStatus"] = "Cancelled"
+            order["updatedTime"] = str(_helpers.generate_timestamp())
+            snapshot = dict(order)
+        self.publish_private("order", [snapshot])
+        return {"orderId": order["orderId"], "orderLinkId": order["orderLinkId"]}
+
+    def _batch(self, operation, params):
+        category = params.get("category")
+        results = []
+        statuses = []
+        for request in params.get("request", []):
+            try:
+                result = operation(category, request)
+                statuses.append({"code": 0, "msg": "OK"})
+            except _MockError as e:
+                result = {
+                    "orderId": "", "orderLinkId": request.get("orderLinkId", ""),
+                }
+                statuses.append({"code": e.code, "msg": e.message})
+            results.append(
+                {"category": category, "symbol": request.get("symbol"), **result}
+            )
+        return {"list": results}, {"list": statuses}
+
+    def _list_orders(self, params, open_only):
+        with self._lock:
+            orders = [
+                dict(order) for order in self.orders.values()
+                if order["category"] == params.get("category")
+                and (order["orderStatus"] in OPEN_ORDER_STATUSES) == open_only
+                and all(
+                    order[name] == params[name]
+                    for name in ("symbol", "orderId", "orderLinkId")
+                    if params.get(name)
+                )
+            ]
+        orders.sort(key=lambda order: order["createdTime"], reverse=True)
+        return {"category": params.get("category"), "list": orders,
+                "nextPageCursor": ""}
+
+    # HTTP
+
+    def _routes(self):
+        return {
+            ("GET", "/v5/market/time"): (False, lambda p: {
+                "timeSecond": str(int(time.time())),
+                "timeNano": str(time.time_ns()),
+            }),
+            ("GET", "/v5/market/orderbook"): (False, self._http_orderbook),
+            ("GET", "/v5/market/tickers"): (False, lambda p: {
+                "category": p.get("category"),
+                "list": [
+                    dict(ticker) for (category, symbol), ticker in self._tickers.items()
+                    if category == p.get("category")
+                    and p.get("symbol") in (None, symbol)
+                ],
+            }),
+            ("GET", "/v5/market/instruments-info"): (False, lambda p: {
+                "category": p.get("category"),
+                "list": [
+                    instrument
+                    for instrument in self.instruments.get(p.get("category"), [])
+                    if p.get("symbol") in (None, instrument["symbol"])
+                ],
+                "nextPageCursor": "",
+            }),
+            ("POST", "/v5/order/create"): (True, lambda p: self._create_order(
+                p.get("category"), p)),
+            ("POST", "/v5/order/amend"): (True, lambda p: self._amend_order(
+                p.get("category"), p)),
+            ("POST", "/v5/order/cancel"): (True, lambda p: self._cancel_order(
+                p.get("category"), p)),
+            ("POST", "/v5/order/create-batch"): (True, lambda p: self._batch(
+                self._create_order, p)),
+            ("POST", "/v5/order/amend-batch"): (True, lambda p: self._batch(
+                self._amend_order, p)),
+            ("POST", "/v5/order/cancel-batch"): (True, lambda p: self._batch(
+                self._cancel_order, p)),
+            ("POST", "/v5/order/cancel-all"): (True, self._http_cancel_all),
+            ("GET", "/v5/order/realtime"): (True, lambda p: self._list_orders(
+                p, open_only=True)),
+            ("GET", "/v5/order/history"): (True, lambda p: self._list_orders(
+                p, open_only=False)),
+            ("GET", "/v5/position/list"): (True, lambda p: {
+                "category": p.get("category"),
+                "list": [
+                    position
+                    for position in self.positions.get(p.get("category"), [])
+                    if p.get("symbol") in (None, position["symbol"])
+                ],
+                "nextPageCursor": "",
+            }),
+            ("GET", "/v5/account/wallet-balance"): (True, lambda p: {
+                "list": self.wallet_balance,
+            }),
+        }
+
+    def _http_orderbook(self, params):
+        key = (params.get("category"), params.get("symbol"))
+        if key not in self._books:
+            raise _MockError(10001, "params error: symbol invalid")
+        limit = int(params.get("limit", 25))
+        book = self._books[key]
+        return {
+            "s": key[1],
+            "b": self._sorted_levels(book["b"], "b")[:limit],
+            "a": self._sorted_levels(book["a"], "a")[:limit],
+            "ts": _helpers.generate_timestamp(),
+            "u": book["u"],
+            "seq": book["seq"],
+        }
+
+    def _http_cancel_all(self, params):
+        cancelled = []
+        for order in self._list_orders(params, open_only=True)["list"]:
+            cancelled.append(self._cancel_order(params.get("category"), order))
+        return {"list": cancelled, "success": "1"}
+
+    def _check_rate_limit(self, client):
+        """Returns (allowed, limit headers)."""
+        now = _helpers.generate_timestamp()
+        window_start = now - now % 1000
+        with self._lock:
+            forced = self._forced_rate_limit_errors > 0
+            if forced:
+                self._forced_rate_limit_errors -= 1
+            window = self._rate_windows.get(client)
+            if window is None or window[0] != window_start:
+                window = self._rate_windows[client] = [window_start, 0]
+            window[1] += 1
+            remaining = max(self.rate_limit - window[1], 0)
+        reset = now + 20 if forced else window_start + 1000
+        headers = {
+            "X-Bapi-Limit": str(self.rate_limit),
+            "X-Bapi-Limit-Status": str(0 if forced else remaining),
+            "X-Bapi-Limit-Reset-Timestamp": str(reset),
+        }
+        return not forced and window[1] <= self.rate_limit, headers
+
+    def _verify_http_signature(self, headers, payload):
+        api_key = headers.get("X-BAPI-API-KEY")
+        if api_key != self.api_key:
+            raise _MockError(10003, "API key is invalid.")
+        timestamp = headers.get("X-BAPI-TIMESTAMP", "")
+        recv_window = headers.get("X-BAPI-RECV-WINDOW", "5000")
+        if abs(_helpers.generate_timestamp() - int(timestamp or 0)) > int(recv_window):
+            raise _MockError(
+                10002,
+                "invalid request, please check your server timestamp or "
+                "recv_window param",
+            )
+        expected = hmac.new(
+            self.api_secret.encode("utf-8"),
+            (timestamp + api_key + recv_window + payload).encode("utf-8"),
+            hashlib.sha256,
+        ).hexdigest()
+        if not hmac.compare_digest(expected, headers.get("X-BAPI-SIGN", "")):
+            raise _MockError(10004, "error sign! origin_string[...]")
+
+    def _handle_http(self, handler, method):
+        url = urlsplit(handler.path)
+        body = b""
+        if method == "POST":
+            body = handler.rfile.read(int(handler.headers.get("Content-Length", 0)))
+        with self._lock:
+            self.request_count += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.drop_rate and random.random() < self.drop_rate:
+            handler.close_connection = True
+            return
+
+        route = self._routes().get((method, url.path))
+        if route is None:
+            self._send_http(handler, 404, {
+                "retCode": 10001, "retMsg": f"Mock route not found: {url.path}",
+                "result": {}, "retExtInfo": {}, "time": _helpers.generate_timestamp(),
+            })
+            return
+        requires_auth, endpoint = route
+
+        client = handler.headers.get("X-BAPI-API-KEY") or handler.client_address[0]
+        allowed, limit_headers = self._check_rate_limit(client)
+        ext_info = {}
+        try:
+            if not allowed:
+                raise _MockError(10006, "Too many visits!")
+            if requires_auth:
+                payload = url.query if method == "GET" else body.decode("utf-8")
+                self._verify_http_signature(handler.headers, payload)
+            params = (
+                dict(parse_qsl(url.query)) if method == "GET"
+                else json.loads(body or b"{}")
+            )
+            result = endpoint(params)
+            if isinstance(result, tuple):
+                result, ext_info = result
+            response = {"retCode": 0, "retMsg": "OK", "result": result}
+        except _MockError as e:
+            response = {"retCode": e.code, "retMsg": e.message, "result": {}}
+        response["retExtInfo"] = ext_info
+        response["time"] = _helpers.generate_timestamp()
+        self._send_http(handler, 200, response, limit_headers)
+
+    @staticmethod
+    def _send_http(handler, status, response, headers=None):
+        body = json.dumps(response).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    # WebSocket
+
+    def _register_connection(self, connection):
+        with self._lock:
+            self._connections.add(connection)
+
+    def _unregister_connection(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+
+    def _subscribers(self, category, topic_prefix):
+        with self._lock:
+            return [
+                connection for connection in self._connections
+                if connection.channel == "public"
+                and connection.category == category
+                and any(topic.startswith(topic_prefix) for topic in connection.topics)
+            ]
+
+    def publish_private(self, topic, data):
+        """Push `data` (a list of records) on a private topic, eg
+        "position" or "wallet", to authenticated subscribers."""
+        message = {
+            "id": uuid.uuid4().hex,
+            "topic": topic,
+            "creationTime": _helpers.generate_timestamp(),
+            "data": data,
+        }
+        with self._lock:
+            connections = [
+                connection for connection in self._connections
+                if connection.channel == "private"
+                and connection.authenticated
+                and topic in connection.topics
+            ]
+        for connection in connections:
+            connection.send_json(message)
+
+    def _verify_ws_auth(self, args):
+        try:
+            api_key, expires, signature = args
+        except ValueError:
+            return False
+        expected = hmac.new(
+            self.api_secret.encode("utf-8"),
+            f"GET/realtime{expires}".encode("utf-8"),
+            hashlib.sha256,
+        ).hexdigest()
+        return (
+            api_key == self.api_key
+            and int(expires) > _helpers.generate_timestamp()
+            and hmac.compare_digest(expected, signature)
+        )
+
+    def _handle_ws_message(self, connection, message):
+        with self._lock:
+            self.ws_message_count += 1
+        op = message.get("op")
+        if op == "ping":
+            connection.send_json({
+                "success": True, "ret_msg": "pong", "conn_id": connection.conn_id,
+                "req_id": message.get("req_id", ""), "op": "ping",
+            })
+        elif op == "auth":
+            connection.authenticated = self._verify_ws_auth(message.get("args", []))
+            if connection.channel == "trade":
+                connection.send_json({
+                    "retCode": 0 if connection.authenticated else 10004,
+                    "retMsg": "OK" if connection.authenticated else "Invalid sign",
+                    "op": "auth", "connId": connection.conn_id,
+                })
+            else:
+                connection.send_json({
+                    "success": connection.authenticated,
+                    "ret_msg": "" if connection.authenticated else "Invalid sign",
+                    "op": "auth", "conn_id": connection.conn_id,
+                })
+        elif op in ("subscribe", "unsubscribe"):
+            self._handle_ws_subscription(connection, message)
+        elif connection.channel == "trade":
+            self._handle_ws_order(connection, message)
+
+    def _handle_ws_subscription(self, connection, message):
+        op = message["op"]
+        topics = message.get("args", [])
+        if op == "subscribe":
+            connection.topics.update(topics)
+        else:
+            connection.topics.difference_update(topics)
+        connection.send_json({
+            "success": True, "ret_msg": "", "conn_id": connection.conn_id,
+            "req_id": message.get("req_id", ""), "op": op,
+        })
+        if op != "subscribe" or connection.channel != "public":
+            return
+        for topic in topics:
+            if topic.startswith("orderbook."):
+                symbol = topic.rsplit(".", 1)[-1]
+                with self._lock:
+                    snapshot = self._snapshot_message(
+                        topic, connection.category, symbol
+                    )
+                connection.send_json(snapshot)
+
+    def _handle_ws_order(self, connection, message):
+        operations = {
+            "order.create": self._create_order,
+            "order.amend": self._amend_order,
+            "order.cancel": self._cancel_order,
+        }
+        batch_operations = {
+            "order.create-batch": self._create_order,
+            "order.amend-batch": self._amend_order,
+            "order.cancel-batch": self._cancel_order,
+        }
+        op = message.get("op")
+        response = {"reqId": message.get("reqId"), "op": op}
+        try:
+            if not connection.authenticated:
+                raise _MockError(10003, "Request not authorized")
+            args = message.get("args") or [{}]
+            if op in operations:
+                data = operations[op](args[0].get("category"), args[0])
+                response.update(retCode=0, retMsg="OK", data=data)
+            elif op in batch_operations:
+                data, ext_info = self._batch(batch_operations[op], args[0])
+                response.update(
+                    retCode=0, retMsg="OK", data=data, retExtInfo=ext_info
+                )
+            else:
+                raise _MockError(10001, f"Unsupported op: {op}")
+        except _MockError as e:
+            response.update(retCode=e.code, retMsg=e.message, data={})
+        response["header"] = {
+            "X-Bapi-Limit": str(self.rate_limit),
+            "Timenow": str(_helpers.generate_timestamp()),
+        }
+        response["connId"] = connection.conn_id
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.drop_rate and random.random() < self.drop_rate:
+            return
+        connection.send_json(response)
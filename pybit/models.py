@@ -0,0 +1,302 @@
+"""
+Typed, `__slots__` based representations of the hot WebSocket message types
+with their numbers decoded to floats once.
+
+Enable them with `WebSocket(..., typed_messages=True)`: callbacks then
+receive a `Message` whose `data` is an `Orderbook`, a `Ticker`, or a list of
+`PublicTrade`, `Kline`, `Order`, `Execution` or `Position`. Other topics are
+passed through as dictionaries. The `from_dict()` constructors also accept
+the records of the equivalent HTTP endpoints, eg
+
+    orders = [Order.from_dict(o) for o in session.get_open_orders(...)["result"]["list"]]
+"""
+
+from dataclasses import dataclass
+
+
+def _float(value):
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+def _int(value):
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+@dataclass(slots=True)
+class Message:
+    topic: str
+    type: str
+    ts: int
+    data: object
+    cts: int = None
+
+
+@dataclass(slots=True)
+class Orderbook:
+    """Bids and asks are lists of (price, size) tuples."""
+
+    symbol: str
+    bids: list
+    asks: list
+    update_id: int
+    seq: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            symbol=data["s"],
+            bids=[(float(level[0]), float(level[1])) for level in data["b"]],
+            asks=[(float(level[0]), float(level[1])) for level in data["a"]],
+            update_id=data.get("u"),
+            seq=data.get("seq"),
+        )
+
+
+@dataclass(slots=True)
+class PublicTrade:
+    ts: int
+    symbol: str
+    side: str
+    size: float
+    price: float
+    tick_direction: str = None
+    trade_id: str = None
+    block_trade: bool = False
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            ts=data["T"],
+            symbol=data["s"],
+            side=data["S"],
+            size=float(data["v"]),
+            price=float(data["p"]),
+            tick_direction=data.get("L"),
+            trade_id=data.get("i"),
+            block_trade=data.get("BT", False),
+        )
+
+
+@dataclass(slots=True)
+class Ticker:
+    """Fields the ticker's category does not have are None."""
+
+    symbol: str
+    last_price: float = None
+    mark_price: float = None
+    index_price: float = None
+    bid1_price: float = None
+    bid1_size: float = None
+    ask1_price: float = None
+    ask1_size: float = None
+    price_24h_pcnt: float = None
+    high_price_24h: float = None
+    low_price_24h: float = None
+    volume_24h: float = None
+    turnover_24h: float = None
+    open_interest: float = None
+    funding_rate: float = None
+    next_funding_time: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            symbol=data["symbol"],
+            last_price=_float(data.get("lastPrice")),
+            mark_price=_float(data.get("markPrice")),
+            index_price=_float(data.get("indexPrice")),
+            bid1_price=_float(data.get("bid1Price")),
+            bid1_size=_float(data.get("bid1Size")),
+            ask1_price=_float(data.get("ask1Price")),
+            ask1_size=_float(data.get("ask1Size")),
+            price_24h_pcnt=_float(data.get("price24hPcnt")),
+            high_price_24h=_float(data.get("highPrice24h")),
+            low_price_24h=_float(data.get("lowPrice24h")),
+            volume_24h=_float(data.get("volume24h")),
+            turnover_24h=_float(data.get("turnover24h")),
+            open_interest=_float(data.get("openInterest")),
+            funding_rate=_float(data.get("fundingRate")),
+            next_funding_time=_int(data.get("nextFundingTime")),
+        )
+
+
+@dataclass(slots=True)
+class Kline:
+    start: int
+    end: int
+    interval: str
+    open: float
+    close: float
+    high: float
+    low: float
+    volume: float
+    turnover: float
+    confirm: bool
+    timestamp: int
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            start=data["start"],
+            end=data["end"],
+            interval=data["interval"],
+            open=float(data["open"]),
+            close=float(data["close"]),
+            high=float(data["high"]),
+            low=float(data["low"]),
+            volume=float(data["volume"]),
+            turnover=float(data["turnover"]),
+            confirm=data["confirm"],
+            timestamp=data["timestamp"],
+        )
+
+
+@dataclass(slots=True)
+class Order:
+    category: str
+    symbol: str
+    order_id: str
+    order_link_id: str
+    side: str
+    order_type: str
+    order_status: str
+    price: float
+    qty: float
+    leaves_qty: float = None
+    cum_exec_qty: float = None
+    avg_price: float = None
+    time_in_force: str = None
+    reduce_only: bool = False
+    position_idx: int = 0
+    created_time: int = None
+    updated_time: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            category=data.get("category"),
+            symbol=data["symbol"],
+            order_id=data["orderId"],
+            order_link_id=data.get("orderLinkId"),
+            side=data["side"],
+            order_type=data.get("orderType"),
+            order_status=data.get("orderStatus"),
+            price=_float(data.get("price")),
+            qty=_float(data.get("qty")),
+            leaves_qty=_float(data.get("leavesQty")),
+            cum_exec_qty=_float(data.get("cumExecQty")),
+            avg_price=_float(data.get("avgPrice")),
+            time_in_force=data.get("timeInForce"),
+            reduce_only=data.get("reduceOnly", False),
+            position_idx=data.get("positionIdx", 0),
+            created_time=_int(data.get("createdTime")),
+            updated_time=_int(data.get("updatedTime")),
+        )
+
+
+@dataclass(slots=True)
+class Execution:
+    """Also used for `execution.fast`, which has no fee or execType."""
+
+    category: str
+    symbol: str
+    exec_id: str
+    order_id: str
+    order_link_id: str
+    side: str
+    exec_price: float
+    exec_qty: float
+    exec_time: int
+    is_maker: bool = False
+    exec_fee: float = None
+    exec_type: str = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            category=data.get("category"),
+            symbol=data["symbol"],
+            exec_id=data["execId"],
+            order_id=data.get("orderId"),
+            order_link_id=data.get("orderLinkId"),
+            side=data["side"],
+            exec_price=float(data["execPrice"]),
+            exec_qty=float(data["execQty"]),
+            exec_time=_int(data.get("execTime")),
+            is_maker=data.get("isMaker", False),
+            exec_fee=_float(data.get("execFee")),
+            exec_type=data.get("execType"),
+        )
+
+
+@dataclass(slots=True)
+class Position:
+    category: str
+    symbol: str
+    side: str
+    size: float
+    avg_price: float = None
+    position_value: float = None
+    leverage: float = None
+    mark_price: float = None
+    liq_price: float = None
+    unrealised_pnl: float = None
+    cum_realised_pnl: float = None
+    position_idx: int = 0
+    updated_time: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            category=data.get("category"),
+            symbol=data["symbol"],
+            side=data.get("side"),
+            size=float(data["size"]),
+            avg_price=_float(data.get("entryPrice", data.get("avgPrice"))),
+            position_value=_float(data.get("positionValue")),
+            leverage=_float(data.get("leverage")),
+            mark_price=_float(data.get("markPrice")),
+            liq_price=_float(data.get("liqPrice")),
+            unrealised_pnl=_float(data.get("unrealisedPnl")),
+            cum_realised_pnl=_float(data.get("cumRealisedPnl")),
+            position_idx=data.get("positionIdx", 0),
+            updated_time=_int(data.get("updatedTime")),
+        )
+
+
+# Topic prefix -> (model, whether the message data is a list of records).
+TOPIC_MODELS = {
+    "orderbook": (Orderbook, False),
+    "tickers": (Ticker, False),
+    "publicTrade": (PublicTrade, True),
+    "kline": (Kline, True),
+    "order": (Order, True),
+    "execution": (Execution, True),
+    "position": (Position, True),
+}
+
+
+def decode_message(message):
+    """Returns a `Message` with typed data, or the message unchanged if its
+    topic has no model."""
+    topic = message.get("topic", "")
+    model = TOPIC_MODELS.get(topic.split(".", 1)[0])
+    if model is None:
+        return message
+    model, is_list = model
+    data = message["data"]
+    if is_list:
+        data = [model.from_dict(record) for record in data]
+    else:
+        data = model.from_dict(data)
+    return Message(
+        topic=topic,
+        type=message.get("type"),
+        ts=message.get("ts", message.get("creationTime")),
+        data=data,
+        cts=message.get("cts"),
+    )
@@ -0,0 +1,181 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime as dt, timezone
+import threading
+import time
+
+from ._http_manager import _V5HTTPManager
+from .exceptions import InvalidRequestError
+
+
+# Maximum number of orders per batch request, per category.
+# https://bybit-exchange.github.io/docs/v5/order/batch-place
+BATCH_LIMITS = {
+    "option": 20,
+    "linear": 20,
+    "inverse": 20,
+    "spot": 10,
+}
+
+BATCH_METHODS = {
+    "place": "place_batch_order",
+    "amend": "amend_batch_order",
+    "cancel": "cancel_batch_order",
+}
+
+
+class OrderBatcher:
+    """Collects individual order calls and submits them through the batch
+    endpoints.
+
+    Orders are grouped by operation and category. A group is submitted when
+    it reaches the category's batch limit, or `window` seconds after its
+    first order was queued, whichever comes first. Each call returns a
+    `concurrent.futures.Future` which resolves to a response shaped like the
+    equivalent single-order call, or raises `InvalidRequestError` if the
+    exchange rejected that particular order.
+
+    Example:
+        with OrderBatcher(session) as batcher:
+            futures = [
+                batcher.place_order(category="linear", symbol="BTCUSDT", ...)
+                for quote in quotes
+            ]
+        results = [future.result() for future in futures]
+    """
+
+    def __init__(self, session, window=0.005, batch_limits=None, max_workers=4):
+        self.session = session
+        self.window = window
+        self.batch_limits = {**BATCH_LIMITS, **(batch_limits or {})}
+
+        self._pending = {}
+        self._deadlines = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pybit-order-batcher"
+        )
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def place_order(self, **kwargs) -> Future:
+        """Queue an order for `place_batch_order()`. Takes the same arguments
+        as `place_order()`."""
+        return self._submit("place", kwargs)
+
+    def amend_order(self, **kwargs) -> Future:
+        """Queue an amendment for `amend_batch_order()`. Takes the same
+        arguments as `amend_order()`."""
+        return self._submit("amend", kwargs)
+
+    def cancel_order(self, **kwargs) -> Future:
+        """Queue a cancellation for `cancel_batch_order()`. Takes the same
+        arguments as `cancel_order()`."""
+        return self._submit("cancel", kwargs)
+
+    def _submit(self, operation, kwargs):
+        request = dict(kwargs)
+        category = request.pop("category", None)
+        if category not in self.batch_limits:
+            raise ValueError(
+                f"Batch orders are not supported for category: {category}"
+            )
+        _V5HTTPManager._cast_values(request)
+
+        future = Future()
+        key = (operation, category)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("OrderBatcher is closed.")
+            queue = self._pending.setdefault(key, [])
+            if not queue:
+                self._deadlines[key] = time.monotonic() + self.window
+            queue.append((request, future))
+            if len(queue) >= self.batch_limits[category]:
+                self._dispatch(key)
+            else:
+                self._condition.notify()
+        return future
+
+    def _dispatch(self, key):
+        """Hand a group to the executor. Must hold the condition."""
+        items = self._pending.pop(key)
+        del self._deadlines[key]
+        self._executor.submit(self._execute, key, items)
+
+    def _run(self):
+        with self._condition:
+            while not self._closed:
+                now = time.monotonic()
+                for key, deadline in list(self._deadlines.items()):
+                    if deadline <= now:
+                        self._dispatch(key)
+                timeout = (
+                    min(self._deadlines.values()) - now
+                    if self._deadlines else None
+                )
+                self._condition.wait(timeout)
+
+    def _execute(self, key, items):
+        operation, category = key
+        requests = [request for request, _ in items]
+        try:
+            response = getattr(self.session, BATCH_METHODS[operation])(
+                category=category, request=requests
+            )
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+            return
+
+        if isinstance(response, tuple):
+            response = response[0]
+        results = (response.get("result") or {}).get("list") or []
+        statuses = (response.get("retExtInfo") or {}).get("list") or []
+        for i, (request, future) in enumerate(items):
+            result = results[i] if i < len(results) else {}
+            status = statuses[i] if i < len(statuses) else {"code": 0, "msg": "OK"}
+            if status.get("code"):
+                future.set_exception(
+                    InvalidRequestError(
+                        request=f"{operation} {category}: {request}",
+                        message=status.get("msg"),
+                        status_code=status["code"],
+                        time=dt.now(timezone.utc).strftime("%H:%M:%S"),
+                        resp_headers=None,
+                    )
+                )
+            else:
+                future.set_result(
+                    {
+                        "retCode": 0,
+                        "retMsg": status.get("msg", "OK"),
+                        "result": result,
+                        "retExtInfo": {},
+                        "time": response.get("time"),
+                    }
+                )
+
+    def flush(self):
+        """Submit every queued order now, without waiting for the window."""
+        with self._condition:
+            for key in list(self._pending):
+                self._dispatch(key)
+
+    def close(self):
+        """Flush queued orders and wait for all in-flight batches."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            for key in list(self._pending):
+                self._dispatch(key)
+            self._condition.notify()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,249 @@
+import logging
+import threading
+
+from ._rate_limiter import _TokenBucket
+
+
+logger = logging.getLogger(__name__)
+
+
+def check_book(book) -> list:
+    """Returns the problems of a book with "b" and "a" lists of
+    [price, size]: unsorted or duplicated prices, zero or negative sizes and
+    a crossed book. An empty list means the book is consistent."""
+    problems = []
+    best = {}
+    for side, descending in (("b", True), ("a", False)):
+        levels = [(float(price), float(size)) for price, size in book.get(side, ())]
+        prices = [price for price, _ in levels]
+        ordered = zip(prices, prices[1:])
+        if descending and any(higher <= lower for higher, lower in ordered):
+            problems.append("bids are not in strictly descending order")
+        elif not descending and any(lower >= higher for lower, higher in ordered):
+            problems.append("asks are not in strictly ascending order")
+        if any(size <= 0 for _, size in levels):
+            problems.append(f"{'bids' if descending else 'asks'} have zero sizes")
+        if prices:
+            best[side] = max(prices) if descending else min(prices)
+    if "b" in best and "a" in best and best["b"] >= best["a"]:
+        problems.append(f"book is crossed: {best['b']} >= {best['a']}")
+    return problems
+
+
+def compare_books(local, remote, levels) -> float:
+    """The fraction of the price levels of `remote`'s top `levels`, and of
+    `local`'s levels within the same price range, whose sizes differ."""
+    mismatched = compared = 0
+    for side in ("b", "a"):
+        remote_levels = {
+            float(price): float(size) for price, size in remote[side][:levels]
+        }
+        if not remote_levels:
+            continue
+        low, high = min(remote_levels), max(remote_levels)
+        local_levels = {
+            float(price): float(size) for price, size in local[side]
+            if low <= float(price) <= high
+        }
+        for price in remote_levels.keys() | local_levels.keys():
+            compared += 1
+            if remote_levels.get(price) != local_levels.get(price):
+                mismatched += 1
+    return mismatched / compared if compared else 0.0
+
+
+class OrderbookValidator:
+    """Checks the order books maintained by a `WebSocket` in the background,
+    off the message thread, and resubscribes to books which have diverged
+    from the exchange so that a fresh snapshot replaces them.
+
+    Every `interval` seconds one subscribed book is sampled, in turn:
+        - its invariants are checked (see `check_book()`), which is free;
+        - it is compared with `get_orderbook()` over the top `levels`, as
+          long as the budget of `requests_per_minute` REST calls allows.
+    The comparison cannot be exact, as the REST snapshot is taken slightly
+    earlier than the local copy, so a book is only considered diverged after
+    `confirmations` comparisons in a row find more than `tolerance` of its
+    levels differ. A book which breaks an invariant is resynced at once.
+    Books limited by `max_levels` or `max_distance_pct` are validated in
+    full, not just the levels in view.
+
+    Example:
+        validator = OrderbookValidator(ws, session, interval=10)
+        validator.start()
+        ...
+        validator.get_metrics()
+
+    Args:
+        ws: A public `WebSocket` with order book subscriptions.
+        session: An HTTP session for `get_orderbook()`.
+        category (string): The category of the books; by default that of
+            the WebSocket's channel.
+        on_divergence (function): Optional; called with a report dictionary
+            for each book found invalid or diverged.
+        resync (bool): Resubscribe to invalid or diverged books.
+    """
+
+    def __init__(
+        self,
+        ws,
+        session,
+        interval=5.0,
+        levels=25,
+        requests_per_minute=12,
+        tolerance=0.2,
+        confirmations=2,
+        category=None,
+        on_divergence=None,
+        resync=True,
+    ):
+        self.ws = ws
+        self.session = session
+        self.interval = interval
+        self.levels = levels
+        self.tolerance = tolerance
+        self.confirmations = confirmations
+        self.category = category or ws.WS_URL.rstrip("/").rsplit("/", 1)[1]
+        self.on_divergence = on_divergence
+        self.resync = resync
+        self._budget = (
+            _TokenBucket(requests_per_minute / 60, capacity=1)
+            if requests_per_minute else None
+        )
+
+        self._next_topic = 0
+        self._suspect = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            "checks": 0,
+            "comparisons": 0,
+            "skipped_comparisons": 0,
+            "invariant_violations": 0,
+            "divergences": 0,
+            "resyncs": 0,
+            "errors": 0,
+        }
+        self._last_mismatch = {}
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="pybit-orderbook-validator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            topics = self._topics()
+            if not topics:
+                continue
+            topic = topics[self._next_topic % len(topics)]
+            self._next_topic += 1
+            try:
+                self.check(topic)
+            except Exception as e:
+                self._count("errors")
+                logger.warning(f"Could not validate {topic}: {e}")
+
+    def _topics(self):
+        # Only books with a numeric depth: RPI books (orderbook.rpi.*)
+        # cannot be compared with get_orderbook().
+        return sorted(
+            topic for topic in list(self.ws.callback_directory)
+            if topic.startswith("orderbook.")
+            and topic.split(".")[1].isdigit()
+            and topic in self.ws.data
+        )
+
+    def _count(self, metric):
+        with self._lock:
+            self._metrics[metric] += 1
+
+    def check(self, topic) -> dict:
+        """Validate one book now. Returns the report, or None if the book
+        passed."""
+        self._count("checks")
+        book = self._copy(topic)
+        problems = check_book(book)
+        if problems:
+            self._count("invariant_violations")
+            return self._diverged(topic, {"reason": "invariant", "problems": problems})
+
+        if self._budget is not None and self._budget.try_acquire():
+            self._count("skipped_comparisons")
+            return None
+        _, depth, symbol = topic.split(".")
+        # Deeper REST levels than the stream's would never match.
+        levels = min(self.levels, int(depth))
+        remote = self.session.get_orderbook(
+            category=self.category, symbol=symbol, limit=levels
+        )["result"]
+        mismatch = compare_books(self._copy(topic), remote, levels)
+        self._count("comparisons")
+        with self._lock:
+            self._last_mismatch[topic] = mismatch
+        if mismatch <= self.tolerance:
+            self._suspect.pop(topic, None)
+            return None
+        self._suspect[topic] = self._suspect.get(topic, 0) + 1
+        if self._suspect[topic] < self.confirmations:
+            return None
+        del self._suspect[topic]
+        return self._diverged(topic, {
+            "reason": "divergence",
+            "mismatch": mismatch,
+            "local_u": book.get("u"),
+            "remote_u": remote.get("u"),
+        })
+
+    def _copy(self, topic):
+        # List copies are atomic, so this is safe while the message thread
+        # updates the book. The full maintained sides are copied: ws.data
+        # only holds the levels within max_levels or max_distance_pct, if
+        # set, which would not match a deeper REST snapshot.
+        book = self.ws.data[topic]
+        sides = self.ws._book_sides.get(topic)
+        if sides is None:
+            bids, asks = book["b"], book["a"]
+        else:
+            bids, asks = sides["b"][0], sides["a"][0]
+        return {"b": list(bids), "a": list(asks), "u": book.get("u")}
+
+    def _diverged(self, topic, report):
+        report["topic"] = topic
+        if report["reason"] == "divergence":
+            self._count("divergences")
+        logger.warning(f"Order book {topic} failed validation: {report}")
+        if self.on_divergence is not None:
+            self.on_divergence(report)
+        if self.resync:
+            self._resync(topic)
+        return report
+
+    def _resync(self, topic):
+        # The exchange answers a new subscription with a fresh snapshot,
+        # which replaces the local book.
+        self.ws.resubscribe(topic)
+        self._count("resyncs")
+
+    def get_metrics(self) -> dict:
+        """Returns the counts of checks, REST comparisons made and skipped
+        for the budget, invariant violations, divergences, resyncs and
+        errors, and the last mismatch fraction of each book compared."""
+        with self._lock:
+            return dict(self._metrics, last_mismatch=dict(self._last_mismatch))
@@ -0,0 +1,154 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ._rate_limiter import _TokenBucket
+
+
+@dataclass(frozen=True, slots=True)
+class FanOutResult:
+    """The outcome of one account's call in `SessionPool.fan_out()`:
+    `result` is the response, or None if the call raised `error`."""
+
+    account: str
+    result: dict = None
+    error: Exception = None
+
+
+class SessionPool:
+    """HTTP clients for many accounts (eg a master account and its
+    subaccounts) which share one `requests.Session`, and so one connection
+    pool, instead of opening connections per API key.
+
+    Each account's client is rate limited on its own, to
+    `requests_per_second` on average, since Bybit's limits apply per UID.
+    `fan_out()` calls a method for many accounts in parallel, with at most
+    `max_workers` requests in flight, and yields the results as they
+    complete.
+
+    Example:
+        pool = SessionPool(testnet=True, max_workers=16)
+        pool.add_account("main", api_key=..., api_secret=...)
+        for uid, (key, secret) in subaccount_keys.items():
+            pool.add_account(uid, api_key=key, api_secret=secret)
+
+        pool["main"].get_positions(category="linear", settleCoin="USDT")
+        for item in pool.fan_out("get_wallet_balance", accountType="UNIFIED"):
+            print(item.account, item.error or item.result["result"])
+
+    Args:
+        max_workers (int): Maximum number of concurrent requests across all
+            accounts. Also the size of the connection pool.
+        requests_per_second (float): Default rate limit of each account.
+        client_class: The client to create per account; `HTTP` by default,
+            or a client from `pybit.clients`.
+        **kwargs: Other arguments for every account's client, eg testnet.
+    """
+
+    def __init__(
+        self,
+        max_workers=8,
+        requests_per_second=10,
+        client_class=None,
+        **kwargs,
+    ):
+        if client_class is None:
+            from .unified_trading import HTTP as client_class
+        self.client_class = client_class
+        self.requests_per_second = requests_per_second
+        self.client_kwargs = kwargs
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pybit-session-pool"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getitem__(self, account):
+        return self._clients[account]
+
+    def __contains__(self, account):
+        return account in self._clients
+
+    def __len__(self):
+        return len(self._clients)
+
+    @property
+    def accounts(self) -> list:
+        return list(self._clients)
+
+    def add_account(
+        self, account, api_key, api_secret, requests_per_second=None, **kwargs
+    ):
+        """Create the client of an account, named eg by its UID, and return
+        it. `kwargs` override the pool's client arguments for this account."""
+        rate = requests_per_second or self.requests_per_second
+        client = self.client_class(
+            api_key=api_key,
+            api_secret=api_secret,
+            session=self.session,
+            rate_limiter=_TokenBucket(rate) if rate else None,
+            **{**self.client_kwargs, **kwargs},
+        )
+        with self._lock:
+            self._clients[account] = client
+        return client
+
+    def remove_account(self, account):
+        with self._lock:
+            self._clients.pop(account, None)
+
+    def call(self, account, method, **kwargs):
+        """Call a client method of an account. `method` is either the
+        method's name or a function which takes the client."""
+        client = self._clients[account]
+        if callable(method):
+            return method(client, **kwargs)
+        return getattr(client, method)(**kwargs)
+
+    def fan_out(self, method, accounts=None, arguments=None, **kwargs):
+        """Call `method` (see `call()`) with `kwargs` for each account, or all
+        of them, in parallel. `arguments` optionally maps accounts to extra
+        arguments of their own. Yields a `FanOutResult` per account in
+        completion order; exceptions are returned, not raised. Calls which
+        have not started are cancelled if the iteration is abandoned.
+        """
+        accounts = self.accounts if accounts is None else list(accounts)
+        arguments = arguments or {}
+        futures = {
+            self._executor.submit(
+                self.call, account, method,
+                **{**kwargs, **arguments.get(account, {})},
+            ): account
+            for account in accounts
+        }
+        try:
+            for future in as_completed(futures):
+                error = future.exception()
+                yield FanOutResult(
+                    account=futures[future],
+                    result=None if error is not None else future.result(),
+                    error=error,
+                )
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self):
+        """Stop the worker threads and close the shared connections."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,309 @@
+from array import array
+from itertools import chain
+import json
+from multiprocessing import resource_tracker, shared_memory
+import time
+
+
+# Ticker fields published, as floats; missing fields (eg funding on spot)
+# are NaN.
+TICKER_FIELDS = (
+    "lastPrice",
+    "bid1Price",
+    "bid1Size",
+    "ask1Price",
+    "ask1Size",
+    "markPrice",
+    "indexPrice",
+    "prevPrice24h",
+    "price24hPcnt",
+    "highPrice24h",
+    "lowPrice24h",
+    "volume24h",
+    "turnover24h",
+    "openInterest",
+    "fundingRate",
+    "nextFundingTime",
+)
+
+_MAGIC = 0x70796269745F6D64  # "pybit_md"
+_LAYOUT_VERSION = 1
+
+# The region is addressed in 8-byte words, through an int64 and a float64
+# view of the same memory:
+#   header      _HEADER_WORDS words, then the JSON list of symbols
+#   book slot   version, ts, u, seq, bid count, ask count,
+#               then (price, size) pairs of `depth` bids and `depth` asks
+#   ticker slot version, ts, then one float per TICKER_FIELDS entry
+# Each slot's version is odd while it is being written (a seqlock): readers
+# copy the slot and retry if the version was odd or changed meanwhile.
+_HEADER_WORDS = 8
+_BOOK_HEADER_WORDS = 6
+_TICKER_HEADER_WORDS = 2
+_NAN = float("nan")
+
+
+def _book_slot_words(depth):
+    return _BOOK_HEADER_WORDS + 4 * depth
+
+
+def _ticker_slot_words(fields):
+    return _TICKER_HEADER_WORDS + fields
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block with this
+        # process's resource tracker, which would unlink it from under the
+        # publisher when this process exits.
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class _SharedRegion:
+    def _map(self, shm):
+        self._shm = shm
+        self._words = shm.buf.cast("q")
+        self._floats = shm.buf.cast("d")
+
+    def _layout(self, symbols, depth, fields):
+        self.symbols = symbols
+        self.depth = depth
+        self._indexes = {symbol: index for index, symbol in enumerate(symbols)}
+        names_words = (len(json.dumps(symbols).encode()) + 7) // 8
+        book_words = _book_slot_words(depth)
+        ticker_words = _ticker_slot_words(fields)
+        first_book = _HEADER_WORDS + names_words
+        first_ticker = first_book + len(symbols) * book_words
+        self._book_offsets = [
+            first_book + index * book_words for index in range(len(symbols))
+        ]
+        self._ticker_offsets = [
+            first_ticker + index * ticker_words for index in range(len(symbols))
+        ]
+        return first_ticker + len(symbols) * ticker_words
+
+    def close(self):
+        """Detach from the shared memory. Does not destroy it."""
+        if self._shm is None:
+            return
+        self._words.release()
+        self._floats.release()
+        self._shm.close()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SharedMarketDataPublisher(_SharedRegion):
+    """Writes the top `depth` levels of order books, and tickers, maintained
+    by a `WebSocket` into shared memory, so that strategies in other
+    processes can read them with `SharedMarketDataReader` instead of each
+    opening the same subscriptions and decoding the same messages.
+
+    The symbols are fixed when the publisher is created. Only one publisher
+    may write to a region. The region is destroyed by `unlink()`, or on
+    leaving a `with` block.
+
+    Example:
+        publisher = SharedMarketDataPublisher(["BTCUSDT", "ETHUSDT"], depth=25)
+        publisher.subscribe(ws)  # or pass publisher.handle_message as the
+                                 # callback of orderbook_stream/ticker_stream
+        # in other processes:
+        reader = SharedMarketDataReader(publisher.name)
+        reader.get_orderbook("BTCUSDT")["b"][0]
+
+    Args:
+        symbols (list): Symbols to publish. Messages for others are ignored.
+        depth (int): Book levels published per side.
+        name (str): Name of the shared memory block; random by default.
+    """
+
+    def __init__(self, symbols, depth=25, name=None):
+        symbols = list(symbols)
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        size = self._layout(symbols, depth, len(TICKER_FIELDS))
+        self._map(shared_memory.SharedMemory(name=name, create=True, size=8 * size))
+        self.name = self._shm.name
+
+        names = json.dumps(symbols).encode()
+        self._shm.buf[8 * _HEADER_WORDS:8 * _HEADER_WORDS + len(names)] = names
+        self._words[1:_HEADER_WORDS] = array("q", [
+            _LAYOUT_VERSION, depth, len(symbols), len(TICKER_FIELDS),
+            len(names), _book_slot_words(depth),
+            _ticker_slot_words(len(TICKER_FIELDS)),
+        ])
+        # Written last: readers check it to know the header is complete.
+        self._words[0] = _MAGIC
+
+    def subscribe(self, ws, orderbook_depth=50, tickers=True):
+        """Subscribe `ws` to the order books (of `orderbook_depth`, which must
+        be a depth the exchange offers and at least `depth`) and tickers of
+        the symbols, publishing every message."""
+        ws.orderbook_stream(orderbook_depth, self.symbols, self.handle_message)
+        if tickers:
+            ws.ticker_stream(self.symbols, self.handle_message)
+
+    def handle_message(self, message):
+        """Publish an `orderbook` or `tickers` message as passed to
+        `WebSocket` callbacks, ie with the maintained book or ticker. The
+        book's sides must be sorted best level first, as maintained books
+        are: only their top `depth` levels are read."""
+        topic = message["topic"]
+        index = self._indexes.get(topic.rsplit(".", 1)[1])
+        if index is None:
+            return
+        if topic.startswith("orderbook."):
+            self._write_orderbook(index, message["data"], message["ts"])
+        elif topic.startswith("tickers."):
+            self._write_ticker(index, message["data"], message["ts"])
+
+    def _write_orderbook(self, index, data, ts):
+        depth = self.depth
+        bids = [(float(price), float(size)) for price, size in data["b"][:depth]]
+        asks = [(float(price), float(size)) for price, size in data["a"][:depth]]
+
+        words, offset = self._words, self._book_offsets[index]
+        levels = offset + _BOOK_HEADER_WORDS
+        words[offset] += 1
+        words[offset + 1:levels] = array("q", [
+            int(ts), int(data.get("u", 0)), int(data.get("seq", 0)),
+            len(bids), len(asks),
+        ])
+        self._floats[levels:levels + 2 * len(bids)] = array(
+            "d", chain.from_iterable(bids)
+        )
+        levels += 2 * depth
+        self._floats[levels:levels + 2 * len(asks)] = array(
+            "d", chain.from_iterable(asks)
+        )
+        words[offset] += 1
+
+    def _write_ticker(self, index, data, ts):
+        values = array("d", [
+            float(data[field]) if data.get(field) else _NAN
+            for field in TICKER_FIELDS
+        ])
+        words, offset = self._words, self._ticker_offsets[index]
+        start = offset + _TICKER_HEADER_WORDS
+        words[offset] += 1
+        words[offset + 1] = int(ts)
+        self._floats[start:start + len(values)] = values
+        words[offset] += 1
+
+    def unlink(self):
+        """Detach and destroy the shared memory."""
+        shm = self._shm
+        self.close()
+        if shm is not None:
+            shm.unlink()
+
+    def __exit__(self, *args):
+        self.unlink()
+
+
+class SharedMarketDataReader(_SharedRegion):
+    """Reads the order books and tickers written by a
+    `SharedMarketDataPublisher`, usually in another process.
+
+    Reads copy one slot and never block the publisher. Prices and sizes are
+    floats; versions increase by 2 per update, so `get_version()` can be
+    polled cheaply for changes.
+
+    Args:
+        name (str): The publisher's `name`.
+        max_retries (int): Attempts at a consistent copy before giving up
+            with RuntimeError, eg because the publisher died mid-write.
+    """
+
+    def __init__(self, name, max_retries=100000):
+        self.max_retries = max_retries
+        self._map(_attach(name))
+        if self._words[0] != _MAGIC or self._words[1] != _LAYOUT_VERSION:
+            self.close()
+            raise ValueError(f"{name} is not a pybit market data region")
+        depth, _, fields, names_length = self._words[2:6].tolist()
+        names = bytes(
+            self._shm.buf[8 * _HEADER_WORDS:8 * _HEADER_WORDS + names_length]
+        )
+        self._fields = TICKER_FIELDS[:fields]
+        self._layout(json.loads(names), depth, fields)
+
+    def _read(self, offset, header_words, float_words):
+        words = self._words
+        start = offset + header_words
+        for attempt in range(self.max_retries):
+            version = words[offset]
+            if not version & 1:
+                header = words[offset:start].tolist()
+                values = self._floats[start:start + float_words].tolist()
+                if words[offset] == version:
+                    return header, values
+            if attempt % 100 == 99:
+                time.sleep(0)
+        raise RuntimeError(
+            "Could not read a consistent update: the publisher appears to "
+            "have stopped mid-write."
+        )
+
+    def get_version(self, symbol) -> int:
+        """Version of a symbol's book; 0 until first published."""
+        return self._words[self._book_offsets[self._indexes[symbol]]]
+
+    def get_orderbook(self, symbol) -> dict:
+        """Returns the book of a symbol as {"s", "ts", "u", "seq", "version",
+        "b", "a"}, with the sides lists of (price, size) best first, or None
+        if it has not been published yet."""
+        depth = self.depth
+        header, values = self._read(
+            self._book_offsets[self._indexes[symbol]],
+            _BOOK_HEADER_WORDS, 4 * depth,
+        )
+        version, ts, u, seq, bid_count, ask_count = header
+        if not version:
+            return None
+        asks = 2 * depth
+        return {
+            "s": symbol,
+            "ts": ts,
+            "u": u,
+            "seq": seq,
+            "version": version,
+            "b": list(zip(values[0:2 * bid_count:2], values[1:2 * bid_count:2])),
+            "a": list(zip(
+                values[asks:asks + 2 * ask_count:2],
+                values[asks + 1:asks + 2 * ask_count:2],
+            )),
+        }
+
+    def get_best_bid_ask(self, symbol) -> tuple:
+        """Returns ((bid price, size), (ask price, size)), or None for a side
+        which is empty or not published."""
+        book = self.get_orderbook(symbol)
+        if book is None:
+            return None, None
+        return (book["b"][0] if book["b"] else None,
+                book["a"][0] if book["a"] else None)
+
+    def get_ticker(self, symbol) -> dict:
+        """Returns the ticker fields of a symbol as floats, plus "symbol" and
+        "ts", or None if it has not been published yet."""
+        header, values = self._read(
+            self._ticker_offsets[self._indexes[symbol]],
+            _TICKER_HEADER_WORDS, len(self._fields),
+        )
+        version, ts = header
+        if not version:
+            return None
+        ticker = dict(zip(self._fields, values))
+        ticker["symbol"] = symbol
+        ticker["ts"] = ts
+        return ticker
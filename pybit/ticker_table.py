@@ -0,0 +1,129 @@
+from array import array
+import heapq
+
+
+# Numeric fields of `tickers` messages across categories; fields a
+# category does not send stay NaN.
+DEFAULT_FIELDS = (
+    "lastPrice",
+    "indexPrice",
+    "markPrice",
+    "prevPrice24h",
+    "price24hPcnt",
+    "highPrice24h",
+    "lowPrice24h",
+    "prevPrice1h",
+    "openInterest",
+    "openInterestValue",
+    "turnover24h",
+    "volume24h",
+    "fundingRate",
+    "nextFundingTime",
+    "bid1Price",
+    "bid1Size",
+    "ask1Price",
+    "ask1Size",
+    "usdIndexPrice",
+)
+
+_NAN = float("nan")
+
+
+class TickerTable:
+    """Tickers of many symbols in columnar storage: one `array("d")` per
+    field, indexed by the symbol's row, for cross-sectional reads such as
+    screening a whole category.
+
+    Deltas are applied in place to the fields they contain. Whole columns
+    are read with `column()`, aligned with `symbols`, and `top()` ranks the
+    symbols by a field without building a dictionary per symbol. Fields
+    which have not been received are NaN.
+
+    Example:
+        ws = WebSocket(channel_type="linear", ticker_table=True)
+        ws.ticker_stream(symbols, handle_ticker)
+        ...
+        table = ws.get_ticker_table()
+        table.top("turnover24h", 20), table.column("fundingRate")
+
+    or, standalone: `table = TickerTable(); table.handle_message(message)`.
+
+    Args:
+        fields (tuple): Numeric fields to store.
+    """
+
+    def __init__(self, fields=DEFAULT_FIELDS):
+        self.fields = tuple(fields)
+        self.symbols = []
+        self._rows = {}
+        self._columns = {field: array("d") for field in self.fields}
+        self._ts = array("q")
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._rows
+
+    def _row(self, symbol):
+        row = self._rows.get(symbol)
+        if row is None:
+            row = self._rows[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            for column in self._columns.values():
+                column.append(_NAN)
+            self._ts.append(0)
+        return row
+
+    def handle_message(self, message):
+        """Apply a `tickers` snapshot or delta message."""
+        data = message["data"]
+        row = self._row(data["symbol"])
+        columns = self._columns
+        if message.get("type") == "snapshot":
+            for field, column in columns.items():
+                value = data.get(field)
+                column[row] = float(value) if value else _NAN
+        else:
+            for field, value in data.items():
+                column = columns.get(field)
+                if column is not None and value:
+                    column[row] = float(value)
+        self._ts[row] = message.get("ts", 0)
+
+    def get(self, symbol) -> dict:
+        """Returns the fields of a symbol, plus "symbol" and "ts"."""
+        row = self._rows[symbol]
+        ticker = {field: column[row] for field, column in self._columns.items()}
+        ticker["symbol"] = symbol
+        ticker["ts"] = self._ts[row]
+        return ticker
+
+    def value(self, symbol, field) -> float:
+        return self._columns[field][self._rows[symbol]]
+
+    def column(self, field) -> array:
+        """A copy of a field's column, in the order of `symbols`."""
+        return array("d", self._columns[field])
+
+    def snapshot(self, fields=None) -> dict:
+        """Copies of the columns of `fields` (all by default), keyed by
+        field, plus "symbol": a copy of `symbols`."""
+        columns = {
+            field: array("d", self._columns[field])
+            for field in (fields or self.fields)
+        }
+        columns["symbol"] = list(self.symbols)
+        return columns
+
+    def top(self, field, k=10, largest=True) -> list:
+        """The `k` symbols with the largest (or smallest) values of a field,
+        as (symbol, value) pairs, best first. NaNs are skipped."""
+        column = self._columns[field]
+        rows = [row for row, value in enumerate(column) if value == value]
+        select = heapq.nlargest if largest else heapq.nsmallest
+        symbols = self.symbols
+        return [
+            (symbols[row], column[row])
+            for row in select(k, rows, key=column.__getitem__)
+        ]
@@ -0,0 +1,199 @@
+from array import array
+
+
+class TradeTape:
+    """Fixed-capacity ring buffer of a symbol's recent public trades.
+
+    Trades are stored in flat `array("d")` columns (timestamp, price, size,
+    side) rather than as dicts. Running totals of volume, buy volume and
+    notional are stored alongside, so any time window's VWAP, volume,
+    imbalance and trade rate is the difference of two entries found by
+    binary search: O(log n), whatever the size of the window.
+
+    Windows are measured back from the latest trade unless `now` (epoch
+    milliseconds) is given, in which case trades after `now` are left out.
+
+    Example:
+        ws = WebSocket(channel_type="linear", trade_tape_capacity=50000)
+        ws.trade_stream("BTCUSDT", handle_trade)
+        ...
+        tape = ws.get_trade_tape("BTCUSDT")
+        tape.vwap(window=5000), tape.imbalance(window=1000)
+    """
+
+    def __init__(self, capacity=10000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._price = array("d", bytes(8 * capacity))
+        self._size = array("d", bytes(8 * capacity))
+        self._side = array("b", bytes(capacity))
+        # Running totals up to and including each trade.
+        self._cum_volume = array("d", bytes(8 * capacity))
+        self._cum_buy_volume = array("d", bytes(8 * capacity))
+        self._cum_notional = array("d", bytes(8 * capacity))
+        self._count = 0
+        self._next = 0
+        self._appended = 0
+
+    def __len__(self):
+        return self._count
+
+    def _physical(self, logical):
+        """Map a chronological index (0 = oldest) to a slot."""
+        return (self._next - self._count + logical) % self.capacity
+
+    def append(self, ts, price, size, side):
+        """Add a trade. `side` is the taker side, "Buy" or "Sell"."""
+        capacity = self.capacity
+        slot = self._next
+        if self._count:
+            previous = (slot - 1) % capacity
+            # Keep timestamps monotonic so that windows can be bisected.
+            ts = max(float(ts), self._ts[previous])
+            volume = self._cum_volume[previous]
+            buy_volume = self._cum_buy_volume[previous]
+            notional = self._cum_notional[previous]
+        else:
+            volume = buy_volume = notional = 0.0
+        price = float(price)
+        size = float(size)
+        is_buy = side == "Buy"
+
+        self._ts[slot] = ts
+        self._price[slot] = price
+        self._size[slot] = size
+        self._side[slot] = 1 if is_buy else -1
+        self._cum_volume[slot] = volume + size
+        self._cum_buy_volume[slot] = buy_volume + size if is_buy else buy_volume
+        self._cum_notional[slot] = notional + size * price
+
+        self._next = (slot + 1) % capacity
+        self._count = min(self._count + 1, capacity)
+        self._appended += 1
+        if self._appended % capacity == 0:
+            self._rebase()
+
+    def _rebase(self):
+        """Re-zero the running totals at the oldest retained trade, so that
+        they do not grow without bound and lose float precision. Runs once
+        every `capacity` appends, so costs O(1) amortised."""
+        oldest = self._physical(0)
+        base_volume = self._cum_volume[oldest] - self._size[oldest]
+        base_buy_volume = self._cum_buy_volume[oldest] - (
+            self._size[oldest] if self._side[oldest] > 0 else 0.0
+        )
+        base_notional = (
+            self._cum_notional[oldest]
+            - self._size[oldest] * self._price[oldest]
+        )
+        for slot in range(self._count):
+            self._cum_volume[slot] -= base_volume
+            self._cum_buy_volume[slot] -= base_buy_volume
+            self._cum_notional[slot] -= base_notional
+
+    def handle_message(self, message):
+        """Append the trades of a `publicTrade` stream message."""
+        for trade in message["data"]:
+            self.append(trade["T"], trade["p"], trade["v"], trade["S"])
+
+    def _bisect(self, ts, after):
+        """Chronological index of the first trade at or, if `after`, after
+        `ts`."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            middle_ts = self._ts[self._physical(middle)]
+            if middle_ts < ts or after and middle_ts == ts:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _window(self, window, now):
+        """Chronological indices of the first trade within the window and of
+        the one following its last."""
+        if now is None:
+            end = self._count
+            now = self._ts[self._physical(self._count - 1)]
+        else:
+            end = self._bisect(now, after=True)
+        if window is None:
+            return 0, end
+        return self._bisect(now - window, after=False), end
+
+    def _totals(self, window, now):
+        """Returns (trades, volume, buy volume, notional) in the window."""
+        if not self._count:
+            return 0, 0.0, 0.0, 0.0
+        first, end = self._window(window, now)
+        if first >= end:
+            return 0, 0.0, 0.0, 0.0
+        last_slot = self._physical(end - 1)
+        first_slot = self._physical(first)
+        first_buy = self._size[first_slot] if self._side[first_slot] > 0 else 0.0
+        volume = (
+            self._cum_volume[last_slot] - self._cum_volume[first_slot]
+            + self._size[first_slot]
+        )
+        buy_volume = (
+            self._cum_buy_volume[last_slot] - self._cum_buy_volume[first_slot]
+            + first_buy
+        )
+        notional = (
+            self._cum_notional[last_slot] - self._cum_notional[first_slot]
+            + self._size[first_slot] * self._price[first_slot]
+        )
+        return end - first, volume, buy_volume, notional
+
+    def vwap(self, window=None, now=None):
+        """Volume weighted average price over the last `window` milliseconds
+        (or the whole tape), or None if there were no trades."""
+        _, volume, _, notional = self._totals(window, now)
+        return notional / volume if volume else None
+
+    def volume(self, window=None, now=None):
+        return self._totals(window, now)[1]
+
+    def imbalance(self, window=None, now=None):
+        """(buy volume - sell volume) / total volume, from -1 to 1."""
+        _, volume, buy_volume, _ = self._totals(window, now)
+        return (2 * buy_volume - volume) / volume if volume else 0.0
+
+    def trade_rate(self, window, now=None):
+        """Trades per second over the last `window` milliseconds."""
+        return self._totals(window, now)[0] * 1000 / window
+
+    def window_stats(self, window=None, now=None) -> dict:
+        trades, volume, buy_volume, notional = self._totals(window, now)
+        return {
+            "trades": trades,
+            "volume": volume,
+            "buy_volume": buy_volume,
+            "sell_volume": volume - buy_volume,
+            "vwap": notional / volume if volume else None,
+            "imbalance": (2 * buy_volume - volume) / volume if volume else 0.0,
+        }
+
+    def trades(self, window=None, now=None) -> list:
+        """Returns the trades in the window, oldest first, as
+        (ts, price, size, side) tuples."""
+        if not self._count:
+            return []
+        trades = []
+        for logical in range(*self._window(window, now)):
+            slot = self._physical(logical)
+            trades.append((
+                int(self._ts[slot]),
+                self._price[slot],
+                self._size[slot],
+                "Buy" if self._side[slot] > 0 else "Sell",
+            ))
+        return trades
+
+    @property
+    def last_price(self):
+        if not self._count:
+            return None
+        return self._price[self._physical(self._count - 1)]
@@ -0,0 +1,339 @@
+from concurrent.futures import Future
+from datetime import datetime as dt, timezone
+import functools
+import logging
+import threading
+import time
+
+from .exceptions import FailedRequestError, InvalidRequestError
+
+
+logger = logging.getLogger(__name__)
+
+
+# Operations which can be sent again after a connection is lost without
+# risking a duplicate: amends set absolute values and cancels of an already
+# cancelled order fail harmlessly. Creates are only safe with an orderLinkId,
+# which the exchange rejects as a duplicate (110072) if the first attempt
+# went through.
+SAFE_OPERATIONS = {
+    "order.amend",
+    "order.cancel",
+    "order.amend-batch",
+    "order.cancel-batch",
+}
+
+
+# retCodes with which a request sent again after a failover is rejected if
+# the first attempt went through: the order exists already, or is already
+# cancelled, or already has the amended values. They leave the outcome
+# unknown rather than failed.
+_FAILOVER_AMBIGUOUS_CODES = {
+    "order.create": {110072},
+    "order.cancel": {110001, 110008},
+    "order.amend": {110001, 110008, 10001},
+}
+
+
+def _is_safe_to_resend(operation, request):
+    if operation in SAFE_OPERATIONS:
+        return True
+    if operation == "order.create":
+        return bool(request.get("orderLinkId"))
+    if operation == "order.create-batch":
+        return all(order.get("orderLinkId") for order in request.get("request", []))
+    return False
+
+
+def _now():
+    return dt.now(timezone.utc).strftime("%H:%M:%S")
+
+
+class _PoolRequest:
+    __slots__ = (
+        "operation",
+        "request",
+        "future",
+        "callback",
+        "error_callback",
+        "connection",
+        "sent",
+        "failed_over",
+    )
+
+    def __init__(self, operation, request, callback, error_callback):
+        self.operation = operation
+        self.request = request
+        self.future = Future()
+        self.callback = callback
+        self.error_callback = error_callback
+        self.connection = None
+        self.sent = None
+        self.failed_over = False
+
+
+class _Connection:
+    __slots__ = ("ws", "pending", "latency", "sent", "failovers")
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.pending = set()
+        # Exponentially weighted moving average of the ack latency, seconds.
+        self.latency = None
+        self.sent = 0
+        self.failovers = 0
+
+
+class WebSocketTradingPool:
+    """Several authenticated `WebSocketTrading` connections behind one
+    interface, so that order requests are not serialised on one socket and
+    one read thread.
+
+    Each request goes to the connected socket with the lowest recent
+    acknowledgement latency, weighted by its requests in flight. When a
+    connection drops, its unanswered requests which are safe to repeat
+    (amends, cancels and creates with an orderLinkId) are sent again on
+    another connection; the others fail with `FailedRequestError`, as their
+    outcome is unknown. If a request sent again is rejected because the
+    first attempt went through (eg a duplicate orderLinkId), the order is
+    looked up with the connection's `recovery_session` instead, as
+    `WebSocketTrading` does after a reconnect; without one the request fails
+    with `FailedRequestError`.
+
+    Every method returns a `concurrent.futures.Future` which resolves to the
+    response, or raises `InvalidRequestError` if the exchange rejected the
+    request. `callback` and `error_callback` are optional and are called as
+    by `WebSocketTrading`.
+
+    Example:
+        pool = WebSocketTradingPool(size=3, api_key=..., api_secret=...)
+        future = pool.place_order(category="linear", symbol="BTCUSDT", ...)
+        future.result(timeout=1)
+
+    Args:
+        size (int): Number of connections to open.
+        latency_weight (float): Weight of each new ack latency in the moving
+            average, between 0 and 1.
+        connections (list): Existing `WebSocketTrading` connections to use
+            instead of opening new ones.
+        **kwargs: Arguments for each `WebSocketTrading`.
+    """
+
+    def __init__(self, size=2, latency_weight=0.2, connections=None, **kwargs):
+        if connections is None:
+            from ._v5_websocket import WebSocketTrading
+            connections = [WebSocketTrading(**kwargs) for _ in range(size)]
+        self.latency_weight = latency_weight
+        self._connections = [_Connection(ws) for ws in connections]
+        self._lock = threading.Lock()
+        for connection in self._connections:
+            connection.ws.add_disconnect_callback(
+                functools.partial(self._on_disconnect, connection)
+            )
+
+    def place_order(self, callback=None, error_callback=None, **kwargs) -> Future:
+        return self._submit("order.create", kwargs, callback, error_callback)
+
+    def amend_order(self, callback=None, error_callback=None, **kwargs) -> Future:
+        return self._submit("order.amend", kwargs, callback, error_callback)
+
+    def cancel_order(self, callback=None, error_callback=None, **kwargs) -> Future:
+        return self._submit("order.cancel", kwargs, callback, error_callback)
+
+    def place_batch_order(self, callback=None, error_callback=None, **kwargs) -> Future:
+        return self._submit("order.create-batch", kwargs, callback, error_callback)
+
+    def amend_batch_order(self, callback=None, error_callback=None, **kwargs) -> Future:
+        return self._submit("order.amend-batch", kwargs, callback, error_callback)
+
+    def cancel_batch_order(self, callback=None, error_callback=None, **kwargs) -> Future:
+        return self._submit("order.cancel-batch", kwargs, callback, error_callback)
+
+    # Routing
+
+    def _submit(self, operation, request, callback, error_callback):
+        pool_request = _PoolRequest(operation, request, callback, error_callback)
+        self._dispatch(pool_request)
+        return pool_request.future
+
+    def _ranked(self, exclude):
+        def score(connection):
+            # Connections without a measured latency yet are tried first.
+            latency = connection.latency or 0.0
+            return latency * (len(connection.pending) + 1), len(connection.pending)
+
+        with self._lock:
+            candidates = [
+                connection for connection in self._connections
+                if connection is not exclude and connection.ws.is_connected()
+            ]
+            return sorted(candidates, key=score)
+
+    def _dispatch(self, pool_request, exclude=None):
+        for connection in self._ranked(exclude):
+            with self._lock:
+                pool_request.connection = connection
+                pool_request.sent = time.monotonic()
+                connection.pending.add(pool_request)
+                connection.sent += 1
+            try:
+                connection.ws._send_order_operation(
+                    pool_request.operation,
+                    functools.partial(self._on_response, pool_request, connection),
+                    pool_request.request,
+                    functools.partial(self._on_response, pool_request, connection),
+                )
+                return
+            except Exception as e:
+                # Not sent, so it is always safe to try the next connection.
+                logger.warning(f"Could not send on a pooled connection: {e}")
+                with self._lock:
+                    connection.pending.discard(pool_request)
+        self._fail(pool_request, FailedRequestError(
+            request=f"{pool_request.operation}: {pool_request.request}",
+            message="No connected WebSocketTrading connection",
+            status_code=None,
+            time=_now(),
+            resp_headers=None,
+        ))
+
+    def _on_response(self, pool_request, connection, message):
+        with self._lock:
+            if pool_request.connection is not connection:
+                return  # Already failed over to another connection.
+            connection.pending.discard(pool_request)
+            pool_request.connection = None
+            latency = time.monotonic() - pool_request.sent
+            if connection.latency is None:
+                connection.latency = latency
+            else:
+                connection.latency += self.latency_weight * (
+                    latency - connection.latency
+                )
+
+        if pool_request.failed_over and self._is_ambiguous(pool_request, message):
+            # REST lookups would hold up the connection's read thread.
+            threading.Thread(
+                target=self._reconcile,
+                args=(pool_request, connection, message),
+                daemon=True,
+            ).start()
+            return
+        self._resolve(pool_request, message)
+
+    def _resolve(self, pool_request, message):
+        if message.get("retCode") == 0:
+            pool_request.future.set_result(message)
+            if pool_request.callback is not None:
+                pool_request.callback(message)
+            return
+        self._fail(pool_request, InvalidRequestError(
+            request=f"{pool_request.operation}: {pool_request.request}",
+            message=message.get("retMsg"),
+            status_code=message.get("retCode"),
+            time=_now(),
+            resp_headers=None,
+        ), message)
+
+    @staticmethod
+    def _is_ambiguous(pool_request, message):
+        operation = pool_request.operation
+        if not operation.endswith("-batch"):
+            return message.get("retCode") in _FAILOVER_AMBIGUOUS_CODES.get(
+                operation, ()
+            )
+        codes = _FAILOVER_AMBIGUOUS_CODES.get(operation[:-len("-batch")], ())
+        statuses = (message.get("retExtInfo") or {}).get("list") or []
+        return any(status.get("code") in codes for status in statuses)
+
+    def _reconcile(self, pool_request, connection, message):
+        ws = connection.ws
+        if getattr(ws, "recovery_session", None) is None:
+            self._fail(pool_request, FailedRequestError(
+                request=f"{pool_request.operation}: {pool_request.request}",
+                message="Sent again after a lost connection and rejected "
+                        f"({message.get('retMsg')}); the request's outcome "
+                        "is unknown",
+                status_code=message.get("retCode"),
+                time=_now(),
+                resp_headers=None,
+            ), message)
+            return
+        operation = pool_request.operation
+        request = pool_request.request
+        if not operation.endswith("-batch"):
+            self._resolve(
+                pool_request,
+                ws._reconcile(message.get("reqId"), operation, request),
+            )
+            return
+
+        base_operation = operation[:-len("-batch")]
+        codes = _FAILOVER_AMBIGUOUS_CODES.get(base_operation, ())
+        statuses = list(message["retExtInfo"]["list"])
+        results = list(message["data"]["list"])
+        for index, (order, status) in enumerate(
+            zip(request.get("request", []), statuses)
+        ):
+            if status.get("code") in codes:
+                code, reason, data = ws._reconcile_order(
+                    base_operation, request.get("category"), order
+                )
+                statuses[index] = {"code": code, "msg": reason}
+                results[index] = data
+        self._resolve(pool_request, dict(
+            message,
+            data={"list": results},
+            retExtInfo={"list": statuses},
+            recovered=True,
+        ))
+
+    def _fail(self, pool_request, error, message=None):
+        pool_request.future.set_exception(error)
+        if pool_request.error_callback is not None:
+            pool_request.error_callback(message if message is not None else {
+                "retCode": error.status_code,
+                "retMsg": error.message,
+                "op": pool_request.operation,
+            })
+
+    def _on_disconnect(self, connection):
+        with self._lock:
+            orphaned = list(connection.pending)
+            connection.pending.clear()
+            for pool_request in orphaned:
+                pool_request.connection = None
+        for pool_request in orphaned:
+            if _is_safe_to_resend(pool_request.operation, pool_request.request):
+                connection.failovers += 1
+                pool_request.failed_over = True
+                self._dispatch(pool_request, exclude=connection)
+            else:
+                self._fail(pool_request, FailedRequestError(
+                    request=f"{pool_request.operation}: {pool_request.request}",
+                    message="Connection lost before a response; the "
+                            "request's outcome is unknown",
+                    status_code=None,
+                    time=_now(),
+                    resp_headers=None,
+                ))
+
+    def get_stats(self) -> list:
+        """Returns, per connection, whether it is connected, its ack latency
+        moving average in seconds, requests in flight, requests sent and
+        requests failed over to other connections."""
+        with self._lock:
+            return [
+                {
+                    "connected": connection.ws.is_connected(),
+                    "latency": connection.latency,
+                    "in_flight": len(connection.pending),
+                    "sent": connection.sent,
+                    "failovers": connection.failovers,
+                }
+                for connection in self._connections
+            ]
+
+    def exit(self):
+        for connection in self._connections:
+            connection.ws.exit()
@@ -33,4 +33,8 @@ setup(
         "websocket-client",
         "pycryptodome",
     ],
+    extras_require={
+        "async": ["websockets"],
+        "numpy": ["numpy"],
+    },
 )
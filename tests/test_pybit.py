@@ -1,5 +1,8 @@
+import base64
 import logging
 import io
+import os
+import time
 
 import pytest
 import hmac
@@ -491,7 +494,10 @@ def test_prepare_file_payload_supports_file_like_input():
         {"upload_file": file}
     )
 
-    assert content_type == "multipart/form-data; boundary=boundary-for-file"
+    boundary = content_type.split("boundary=")[1]
+    assert content_type.startswith("multipart/form-data; boundary=")
+    assert body.startswith(f"--{boundary}\r\n".encode())
+    assert body.endswith(f"\r\n--{boundary}--\r\n".encode())
     assert b'name="upload_file"; filename="receipt.png"' in body
     assert b"Content-Type: image/png" in body
     assert b"image-bytes" in body
@@ -503,6 +509,7 @@ def _make_trade_manager():
     manager.callback_directory = {}
     manager.ws_name = "Test Trade WS"
     manager.auth = False
+    manager._init_request_state()
     return manager
 
 
@@ -648,6 +655,11 @@ def test_trade_ws_auth_success_sets_auth_flag():
 
 def test_trade_ws_auth_failure_raises():
     manager = _make_trade_manager()
+    manager.ws = Mock()
+    error_callback = Mock()
+    manager._send_order_operation(
+        "order.create", Mock(), {"symbol": "BTCUSDT"}, error_callback
+    )
 
     with pytest.raises(Exception, match="Authorization for"):
         manager._handle_incoming_message(
@@ -655,6 +667,10 @@ def test_trade_ws_auth_failure_raises():
         )
 
     assert manager.auth is False
+    # The request queued for the auth response is failed, not left queued.
+    assert not manager.ws.send.called
+    assert error_callback.call_args.args[0]["retCode"] == -1
+    assert manager.get_flow_metrics()["queued"] == 0
 
 
 @pytest.mark.parametrize(
@@ -679,6 +695,8 @@ def test_websocket_trading_public_api_registers_error_callback(
     ws_trade.recv_window = 0
     ws_trade.referral_id = ""
     ws_trade.ws = Mock()
+    ws_trade.auth = True
+    ws_trade._init_request_state()
 
     cb, ecb = Mock(), Mock()
     getattr(ws_trade, method_name)(cb, error_callback=ecb, symbol="BTCUSDT")
@@ -754,8 +772,1612 @@ def test_upload_chat_file_sends_multipart_request(monkeypatch):
     assert request.url == (
         "https://api-testnet.bybit.com/v5/p2p/oss/upload_file"
     )
-    assert request.headers["Content-Type"] == (
-        "multipart/form-data; boundary=boundary-for-file"
+    assert request.headers["Content-Type"].startswith(
+        "multipart/form-data; boundary="
+    )
+    # The body is streamed rather than pre-assembled.
+    body = b"".join(request.body)
+    assert request.headers["Content-Length"] == str(len(body))
+    assert b'name="upload_file"; filename="proof.png"' in body
+    assert b"abc" in body
+
+
+def _ok_response(result=None):
+    response = Mock()
+    response.status_code = 200
+    response.headers = {}
+    response.elapsed = 0
+    response.json.return_value = {
+        "retCode": 0,
+        "retMsg": "OK",
+        "result": result if result is not None else {"list": []},
+        "time": 1234567890,
+    }
+    return response
+
+
+def test_response_cache_serves_reference_data_until_invalidated():
+    manager = HTTP(testnet=True, cache_responses=True)
+    manager.client.send = Mock(side_effect=lambda *a, **k: _ok_response())
+
+    first = manager.get_instruments_info(category="linear", limit=1000)
+    first["result"]["list"].append("mutated by caller")
+    # Same query with a different argument order hits the cache.
+    second = manager.get_instruments_info(limit=1000, category="linear")
+
+    assert second["result"]["list"] == []
+    assert manager.client.send.call_count == 1
+    assert manager.get_response_cache_stats()["hits"] == 1
+
+    manager.get_tickers(category="linear")
+    manager.get_tickers(category="linear")
+    assert manager.client.send.call_count == 3
+
+    assert manager.invalidate_response_cache("/v5/market/instruments-info") == 1
+    manager.get_instruments_info(category="linear", limit=1000)
+    assert manager.client.send.call_count == 4
+
+
+def test_response_cache_expires_and_evicts(monkeypatch):
+    manager = HTTP(
+        testnet=True,
+        cache_responses=True,
+        cache_ttls={"/v5/market/instruments-info": 5},
+        cache_max_entries=1,
+    )
+    manager.client.send = Mock(side_effect=lambda *a, **k: _ok_response())
+    now = [1000.0]
+    monkeypatch.setattr(
+        "pybit._response_cache.time.monotonic", lambda: now[0]
+    )
+
+    manager.get_instruments_info(category="linear")
+    manager.get_instruments_info(category="spot")
+    manager.get_instruments_info(category="spot")
+    assert manager.client.send.call_count == 2
+    assert manager.get_response_cache_stats()["evictions"] == 1
+
+    now[0] += 6
+    manager.get_instruments_info(category="spot")
+    assert manager.client.send.call_count == 3
+
+
+def test_response_cache_is_disabled_by_default():
+    manager = HTTP(testnet=True)
+    manager.client.send = Mock(side_effect=lambda *a, **k: _ok_response())
+
+    manager.get_instruments_info(category="linear")
+    manager.get_instruments_info(category="linear")
+
+    assert manager.client.send.call_count == 2
+    assert manager.get_response_cache_stats() is None
+
+
+class _FakeInstrumentsSession:
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def get_instruments_info(self, **kwargs):
+        self.calls.append(kwargs)
+        pages = self.pages[kwargs.get("baseCoin") or kwargs["category"]]
+        index = int(kwargs.get("cursor") or 0)
+        next_cursor = str(index + 1) if index + 1 < len(pages) else ""
+        return {"result": {"list": pages[index], "nextPageCursor": next_cursor}}
+
+
+def _linear_instrument(symbol, tick_size="0.10", qty_step="0.001"):
+    return {
+        "symbol": symbol,
+        "contractType": "LinearPerpetual",
+        "status": "Trading",
+        "baseCoin": symbol[:-4],
+        "quoteCoin": "USDT",
+        "settleCoin": "USDT",
+        "leverageFilter": {
+            "minLeverage": "1", "maxLeverage": "100.00", "leverageStep": "0.01",
+        },
+        "priceFilter": {
+            "minPrice": "0.10", "maxPrice": "199999.80", "tickSize": tick_size,
+        },
+        "lotSizeFilter": {
+            "maxOrderQty": "100.000",
+            "minOrderQty": "0.001",
+            "qtyStep": qty_step,
+            "minNotionalValue": "5",
+        },
+    }
+
+
+def test_instrument_registry_loads_all_pages_and_rounds():
+    from decimal import Decimal
+    from pybit.instruments import InstrumentRegistry
+
+    session = _FakeInstrumentsSession({
+        "linear": [
+            [_linear_instrument("BTCUSDT")],
+            [_linear_instrument("ETHUSDT", tick_size="0.01", qty_step="0.01")],
+        ],
+    })
+    registry = InstrumentRegistry(session, categories=["linear"])
+    registry.load()
+
+    assert len(session.calls) == 2
+    assert session.calls[1]["cursor"] == "1"
+    assert registry.symbols("linear") == ["BTCUSDT", "ETHUSDT"]
+
+    btc = registry["linear", "BTCUSDT"]
+    assert btc.max_leverage == Decimal("100.00")
+    assert registry.round_price("linear", "BTCUSDT", 30000.16) == Decimal("30000.2")
+    assert registry.round_qty("linear", "BTCUSDT", "0.12345") == Decimal("0.123")
+    assert registry.validate_order("linear", "BTCUSDT", "0.001", "30000.1") == []
+    assert registry.validate_order("linear", "ETHUSDT", "0.015", "3000.001") == [
+        "qty 0.015 is not a multiple of 0.01",
+        "price 3000.001 is not a multiple of 0.01",
+    ]
+    assert registry.validate_order("linear", "BTCUSDT", "0.001", "100") == [
+        "order value 0.100 is below the minimum 5",
+    ]
+    assert registry.get("linear", "XRPUSDT") is None
+    with pytest.raises(KeyError):
+        registry["linear", "XRPUSDT"]
+
+
+def test_instrument_registry_refresh_reports_changes():
+    from pybit.instruments import InstrumentRegistry
+
+    session = _FakeInstrumentsSession({
+        "linear": [[_linear_instrument("BTCUSDT"), _linear_instrument("ETHUSDT")]],
+    })
+    registry = InstrumentRegistry(session, categories=["linear"])
+    registry.load()
+    eth = registry.get("linear", "ETHUSDT")
+
+    session.pages["linear"] = [[
+        _linear_instrument("BTCUSDT", tick_size="0.50"),
+        _linear_instrument("ETHUSDT"),
+        _linear_instrument("SOLUSDT"),
+    ]]
+    changes = registry.refresh("linear")
+
+    assert changes == {
+        "added": ["SOLUSDT"], "updated": ["BTCUSDT"], "removed": [],
+    }
+    assert registry.get("linear", "ETHUSDT") is eth
+    assert str(registry.get("linear", "BTCUSDT").tick_size) == "0.50"
+
+
+def test_instrument_registry_loads_options_of_each_base_coin():
+    from pybit.instruments import InstrumentRegistry
+
+    session = _FakeInstrumentsSession({
+        "BTC": [[{"symbol": "BTC-27DEC24-80000-C", "baseCoin": "BTC"}]],
+        "ETH": [[{"symbol": "ETH-27DEC24-4000-P", "baseCoin": "ETH"}]],
+    })
+    registry = InstrumentRegistry(
+        session, categories=["option"], option_base_coins=["BTC", "ETH"]
+    )
+    registry.load()
+
+    assert [call["baseCoin"] for call in session.calls] == ["BTC", "ETH"]
+    assert registry.symbols("option") == ["BTC-27DEC24-80000-C", "ETH-27DEC24-4000-P"]
+
+
+def test_coalesce_requests_shares_one_in_flight_get():
+    import threading
+    import time as _time
+
+    manager = HTTP(testnet=True, coalesce_requests=True)
+    release = threading.Event()
+
+    def slow_send(*args, **kwargs):
+        release.wait(5)
+        return _ok_response({"list": [{"symbol": "BTCUSDT"}]})
+
+    manager.client.send = Mock(side_effect=slow_send)
+    results = []
+
+    def call():
+        results.append(manager.get_tickers(category="linear"))
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    deadline = _time.monotonic() + 5
+    while manager._single_flight.coalesced < 4 and _time.monotonic() < deadline:
+        _time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert manager.client.send.call_count == 1
+    assert len(results) == 5
+    assert all(r["result"]["list"] == [{"symbol": "BTCUSDT"}] for r in results)
+    # Every caller owns its result.
+    assert len({id(r) for r in results}) == 5
+
+
+def test_coalesce_requests_propagates_errors_and_skips_posts():
+    manager = HTTP(
+        testnet=True,
+        api_key=_api_key,
+        api_secret=_api_secret,
+        coalesce_requests=True,
+    )
+    manager.client.send = Mock(side_effect=lambda *a, **k: _ok_response())
+
+    manager.place_order(category="linear", symbol="BTCUSDT")
+    manager.place_order(category="linear", symbol="BTCUSDT")
+    assert manager.client.send.call_count == 2
+
+    manager.client.send = Mock(
+        side_effect=requests.exceptions.ConnectionError("down")
+    )
+    with pytest.raises(requests.exceptions.ConnectionError):
+        manager.get_tickers(category="linear")
+    assert manager._single_flight._calls == {}
+
+
+class _FakeBatchSession:
+    def __init__(self, codes=None):
+        self.codes = codes or {}
+        self.calls = []
+
+    def _respond(self, operation, category, request):
+        self.calls.append((operation, category, request))
+        return {
+            "retCode": 0,
+            "retMsg": "OK",
+            "result": {"list": [
+                {"orderLinkId": item.get("orderLinkId"), "orderId": f"id-{i}"}
+                for i, item in enumerate(request)
+            ]},
+            "retExtInfo": {"list": [
+                {"code": self.codes.get(item.get("orderLinkId"), 0), "msg": "x"}
+                for item in request
+            ]},
+            "time": 1234567890,
+        }
+
+    def place_batch_order(self, category, request):
+        return self._respond("place", category, request)
+
+    def cancel_batch_order(self, category, request):
+        return self._respond("cancel", category, request)
+
+
+def test_order_batcher_submits_full_batches_immediately():
+    from pybit.order_batcher import OrderBatcher
+
+    session = _FakeBatchSession()
+    batcher = OrderBatcher(session, window=60, batch_limits={"linear": 2})
+    try:
+        futures = [
+            batcher.place_order(
+                category="linear", symbol="BTCUSDT", side="Buy",
+                orderType="Limit", qty=0.1, price=30000, orderLinkId=str(i),
+            )
+            for i in range(2)
+        ]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.close()
+
+    assert len(session.calls) == 1
+    operation, category, request = session.calls[0]
+    assert (operation, category) == ("place", "linear")
+    assert request[0] == {
+        "symbol": "BTCUSDT", "side": "Buy", "orderType": "Limit",
+        "qty": "0.1", "price": "30000", "orderLinkId": "0",
+    }
+    assert [r["result"]["orderId"] for r in results] == ["id-0", "id-1"]
+    assert results[0]["retCode"] == 0
+
+
+def test_order_batcher_flushes_on_window_and_reports_item_errors():
+    from pybit.order_batcher import OrderBatcher
+
+    session = _FakeBatchSession(codes={"bad": 170213})
+    batcher = OrderBatcher(session, window=0.01)
+    try:
+        good = batcher.cancel_order(category="spot", symbol="BTCUSDT", orderLinkId="ok")
+        bad = batcher.cancel_order(category="spot", symbol="BTCUSDT", orderLinkId="bad")
+        place = batcher.place_order(category="spot", symbol="BTCUSDT", orderLinkId="p")
+        assert good.result(timeout=5)["retCode"] == 0
+        with pytest.raises(InvalidRequestError) as exc_info:
+            bad.result(timeout=5)
+        assert exc_info.value.status_code == 170213
+        assert place.result(timeout=5)["result"]["orderLinkId"] == "p"
+    finally:
+        batcher.close()
+
+    assert sorted(call[0] for call in session.calls) == ["cancel", "place"]
+    with OrderBatcher(session) as batcher, pytest.raises(ValueError):
+        batcher.place_order(category="unknown")
+
+
+def test_upload_streams_file_from_path_and_signs_incrementally(tmp_path, monkeypatch):
+    path = tmp_path / "statement.pdf"
+    path.write_bytes(b"%PDF" + b"x" * 200000)
+    manager = HTTP(testnet=True, api_key="mykey", api_secret="secret")
+    monkeypatch.setattr(
+        "pybit._http_manager._helpers.generate_timestamp",
+        lambda: 12345,
+    )
+    manager.client.send = Mock(return_value=_ok_response())
+
+    manager.upload_chat_file(upload_file=str(path))
+    request = manager.client.send.call_args[0][0]
+
+    chunks = list(request.body)
+    body = b"".join(chunks)
+    assert len(chunks) > 3
+    assert b"Content-Type: application/pdf\r\n" in body
+    assert body.count(b"x") == 200000
+    assert request.headers["Content-Length"] == str(len(body))
+    assert request.headers["X-BAPI-SIGN"] == hmac.new(
+        b"secret", b"12345mykey5000" + body, hashlib.sha256
+    ).hexdigest()
+
+
+def test_upload_retry_resends_file_like_from_its_start():
+    upload = io.BytesIO(b"--%PDF" + b"x" * 100000)
+    upload.name = "statement.pdf"
+    upload.seek(2)
+    manager = HTTP(
+        testnet=True, api_key="mykey", api_secret="secret",
+        force_retry=True, retry_delay=0,
+    )
+    bodies = []
+
+    def send(request, timeout):
+        # Read the whole body, as sending would, before the connection fails.
+        bodies.append(b"".join(request.body))
+        if len(bodies) == 1:
+            upload.read()  # and leave the file somewhere else
+            raise requests.exceptions.ConnectionError("reset")
+        return _ok_response()
+
+    manager.client.send = Mock(side_effect=send)
+    manager.upload_chat_file(upload_file=upload)
+
+    assert len(bodies) == 2 and len(bodies[0]) == len(bodies[1])
+    assert b"%PDF" + b"x" * 100000 + b"\r\n" in bodies[1]
+    assert b"--%PDF" not in bodies[1]
+
+
+def test_upload_boundaries_are_random():
+    _, first = _V5HTTPManager.prepare_file_payload(
+        {"upload_file": b"abc", "filename": "proof.png"}
+    )
+    _, second = _V5HTTPManager.prepare_file_payload(
+        {"upload_file": b"abc", "filename": "proof.png"}
+    )
+    assert first != second
+
+
+@pytest.fixture
+def mock_exchange():
+    from pybit.mock_exchange import MockExchange
+
+    with MockExchange() as exchange:
+        yield exchange
+
+
+def test_mock_exchange_http_order_flow(mock_exchange):
+    session = HTTP(
+        endpoint=mock_exchange.http_endpoint,
+        api_key=mock_exchange.api_key,
+        api_secret=mock_exchange.api_secret,
+    )
+    mock_exchange.set_orderbook("BTCUSDT", bids=[["30000", "1"]], asks=[["30001", "2"]])
+
+    book = session.get_orderbook(category="linear", symbol="BTCUSDT")["result"]
+    assert book["a"] == [["30001", "2"]]
+
+    placed = session.place_order(
+        category="linear", symbol="BTCUSDT", side="Buy", orderType="Limit",
+        qty=0.1, price=29000, orderLinkId="quote-1",
+    )["result"]
+    open_orders = session.get_open_orders(category="linear")["result"]["list"]
+    assert [o["orderId"] for o in open_orders] == [placed["orderId"]]
+
+    with pytest.raises(InvalidRequestError) as exc_info:
+        session.place_order(
+            category="linear", symbol="BTCUSDT", side="Buy", orderType="Limit",
+            qty=0.1, price=29000, orderLinkId="quote-1",
+        )
+    assert exc_info.value.status_code == 110072
+
+    session.cancel_order(category="linear", symbol="BTCUSDT", orderLinkId="quote-1")
+    assert session.get_open_orders(category="linear")["result"]["list"] == []
+
+    bad_session = HTTP(
+        endpoint=mock_exchange.http_endpoint,
+        api_key=mock_exchange.api_key,
+        api_secret="wrong",
+    )
+    with pytest.raises(InvalidRequestError) as exc_info:
+        bad_session.get_open_orders(category="linear")
+    assert exc_info.value.status_code == 10004
+
+
+def test_mock_exchange_rate_limit_errors_are_retried(mock_exchange, monkeypatch):
+    monkeypatch.setattr("pybit._http_manager.time.sleep", lambda seconds: None)
+    session = HTTP(endpoint=mock_exchange.http_endpoint)
+    mock_exchange.inject_rate_limit_errors(2)
+
+    response = session.get_server_time()
+
+    assert response["retCode"] == 0
+    assert mock_exchange.request_count == 3
+
+
+def test_mock_exchange_streams_orderbook_and_acks_ws_orders(mock_exchange):
+    import queue
+    from pybit.unified_trading import WebSocket, WebSocketTrading
+
+    mock_exchange.set_orderbook("BTCUSDT", bids=[["30000", "1"]], asks=[["30001", "2"]])
+    messages = queue.Queue()
+    ws = WebSocket(
+        testnet=False, channel_type="linear", endpoint=mock_exchange.ws_endpoint
+    )
+    trade_ws = WebSocketTrading(
+        testnet=False,
+        endpoint=mock_exchange.ws_endpoint,
+        api_key=mock_exchange.api_key,
+        api_secret=mock_exchange.api_secret,
+    )
+    try:
+        ws.orderbook_stream(50, "BTCUSDT", messages.put)
+        snapshot = messages.get(timeout=5)
+        assert snapshot["type"] == "snapshot"
+
+        mock_exchange.publish_orderbook_delta("BTCUSDT", bids=[["30000", "0"], ["29999", "3"]])
+        delta = messages.get(timeout=5)
+        assert delta["data"]["b"] == [["29999", "3"]]
+        assert delta["data"]["a"] == [["30001", "2"]]
+
+        trade_ws.place_order(
+            messages.put, category="linear", symbol="BTCUSDT", side="Sell",
+            orderType="Market", qty="0.5",
+        )
+        ack = messages.get(timeout=5)
+        assert ack["retCode"] == 0 and ack["op"] == "order.create"
+        order = mock_exchange.orders[ack["data"]["orderId"]]
+        assert (order["orderStatus"], order["avgPrice"]) == ("Filled", "29999")
+    finally:
+        ws.exit()
+        trade_ws.exit()
+
+
+def test_unified_trading_import_defers_websocket_and_crypto():
+    import subprocess
+    import sys
+
+    script = (
+        "import sys; import pybit.unified_trading as ut; "
+        "print('websocket' in sys.modules, 'Crypto' in sys.modules); "
+        "ut.WebSocket; print('websocket' in sys.modules)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True,
+        text=True, cwd=os.path.dirname(os.path.dirname(__file__)),
+    ).stdout.split()
+    assert output == ["False", "False", "True"]
+
+
+def test_unified_trading_star_import_exports_clients():
+    namespace = {}
+    exec("from pybit.unified_trading import *", namespace)
+    for name in ("HTTP", "WebSocket", "WebSocketTrading",
+                 "WebsocketSpreadTrading", "PUBLIC_WSS"):
+        assert name in namespace
+    import pybit.unified_trading
+    assert pybit.unified_trading.logger.name == "pybit.unified_trading"
+    from pybit.unified_trading import InvalidChannelTypeError, TopicMismatchError
+    from pybit._v5_spread import PUBLIC_WSS, WSS_NAME, _V5WebSocketSpreadTrading
+    assert PUBLIC_WSS.endswith("/v5/public/spread") and WSS_NAME == "Spread Trading"
+
+
+def test_rsa_signature_and_per_domain_client():
+    from Crypto.Hash import SHA256
+    from Crypto.PublicKey import RSA
+    from Crypto.Signature import PKCS1_v1_5
+    from pybit.clients import MarketHTTP
+
+    key = RSA.generate(1024)
+    secret = key.export_key().decode()
+    signature = _http_manager.generate_signature(True, secret, "payload")
+    assert PKCS1_v1_5.new(key.publickey()).verify(
+        SHA256.new(b"payload"), base64.b64decode(signature)
+    )
+
+    session = MarketHTTP(testnet=True)
+    assert session.endpoint == "https://api-testnet.bybit.com"
+    assert hasattr(session, "get_tickers") and not hasattr(session, "place_order")
+
+
+class _FakeAccountSession:
+    def __init__(self, positions=(), orders=(), wallet=(), server_time=None):
+        self.positions = list(positions)
+        self.orders = list(orders)
+        self.wallet = list(wallet)
+        self.server_time = server_time
+
+    def get_positions(self, **kwargs):
+        return {"result": {"list": [dict(p) for p in self.positions]}}
+
+    def get_open_orders(self, **kwargs):
+        return {"result": {"list": [dict(o) for o in self.orders]}}
+
+    def get_wallet_balance(self, **kwargs):
+        return {"result": {"list": self.wallet}, "time": self.server_time}
+
+
+def test_account_state_applies_streams_and_ignores_stale_snapshots(monkeypatch):
+    from pybit.account_state import AccountState
+
+    monkeypatch.setattr(
+        "pybit.account_state._helpers.generate_timestamp", lambda: 150
+    )
+    session = _FakeAccountSession(
+        positions=[{"symbol": "BTCUSDT", "size": "1", "positionIdx": 0,
+                    "updatedTime": "100"}],
+        orders=[{"orderId": "a", "orderLinkId": "link-a", "symbol": "BTCUSDT",
+                 "orderStatus": "New", "updatedTime": "100"}],
+        wallet=[{"accountType": "UNIFIED", "totalEquity": "10",
+                 "coin": [{"coin": "USDT", "walletBalance": "10"}]}],
+    )
+    state = AccountState(session)
+    state.sync()
+    assert state.get_position("linear", "BTCUSDT")["size"] == "1"
+    assert state.get_order(order_link_id="link-a")["orderId"] == "a"
+    assert state.get_balance("USDT")["walletBalance"] == "10"
+
+    # The stream closes the position and fills the order...
+    state.handle_message({"topic": "position", "data": [{
+        "category": "linear", "symbol": "BTCUSDT", "size": "0",
+        "positionIdx": 0, "updatedTime": "200",
+    }]})
+    state.handle_message({"topic": "order", "data": [{
+        "category": "linear", "orderId": "a", "orderLinkId": "link-a",
+        "orderStatus": "Filled", "updatedTime": "200",
+    }]})
+    state.handle_message({"topic": "wallet", "creationTime": 200, "data": [{
+        "accountType": "UNIFIED", "totalEquity": "11",
+        "coin": [{"coin": "USDT", "walletBalance": "11"}],
+    }]})
+    # ...so an older REST snapshot must not bring them back.
+    state.sync()
+    assert state.get_positions() == []
+    assert state.get_open_orders() == []
+    assert state.get_account()["totalEquity"] == "11"
+
+    # Orders missing from a later snapshot were cancelled while offline.
+    state.handle_message({"topic": "order", "data": [{
+        "category": "linear", "orderId": "b", "orderStatus": "New",
+        "updatedTime": "120",
+    }]})
+    session.orders = []
+    state.sync()
+    assert state.get_order("b") is None
+
+
+def test_account_state_bounds_tombstones_and_uses_server_time(monkeypatch):
+    from pybit.account_state import AccountState
+
+    # The local clock runs well ahead of the server's.
+    monkeypatch.setattr(
+        "pybit.account_state._helpers.generate_timestamp", lambda: 10**6
+    )
+    session = _FakeAccountSession(
+        wallet=[{"accountType": "UNIFIED", "totalEquity": "10"}],
+        server_time=100,
     )
-    assert b'name="upload_file"; filename="proof.png"' in request.body
-    assert b"abc" in request.body
+    state = AccountState(session, categories={}, max_removed=2)
+    state.sync()
+    state.handle_message({"topic": "wallet", "creationTime": 120, "data": [{
+        "accountType": "UNIFIED", "totalEquity": "11",
+    }]})
+    assert state.get_account()["totalEquity"] == "11"
+
+    for order_id in ("a", "b", "c"):
+        state.handle_message({"topic": "order", "data": [{
+            "category": "linear", "orderId": order_id,
+            "orderStatus": "Cancelled", "updatedTime": "130",
+        }]})
+    assert list(state._removed) == ["b", "c"]
+
+
+def test_account_state_resyncs_after_reconnect(mock_exchange):
+    import time as time_module
+    from pybit.account_state import AccountState
+    from pybit.unified_trading import WebSocket
+
+    def wait_for(condition):
+        deadline = time_module.monotonic() + 10
+        while not condition():
+            assert time_module.monotonic() < deadline
+            time_module.sleep(0.01)
+
+    mock_exchange.wallet_balance = [{
+        "accountType": "UNIFIED", "coin": [{"coin": "USDT", "walletBalance": "5"}],
+    }]
+    credentials = {
+        "endpoint": mock_exchange.http_endpoint,
+        "api_key": mock_exchange.api_key,
+        "api_secret": mock_exchange.api_secret,
+    }
+    session = HTTP(**credentials)
+    ws = WebSocket(
+        testnet=False, channel_type="private",
+        **dict(credentials, endpoint=mock_exchange.ws_endpoint),
+    )
+    try:
+        state = AccountState(session)
+        state.start(ws)
+        assert state.get_balance("USDT")["walletBalance"] == "5"
+
+        session.place_order(
+            category="linear", symbol="BTCUSDT", side="Buy", orderType="Limit",
+            qty="1", price="100", orderLinkId="resting",
+        )
+        wait_for(lambda: state.get_order(order_link_id="resting") is not None)
+
+        # Cancelled while the connection is down, so no push is seen.
+        order_id = state.get_order(order_link_id="resting")["orderId"]
+        mock_exchange.orders[order_id]["orderStatus"] = "Cancelled"
+        mock_exchange.disconnect_all()
+        wait_for(lambda: state.get_order(order_id) is None)
+    finally:
+        ws.exit()
+
+
+def _execution(exec_id, side, qty, price, fee=None, **fields):
+    execution = {
+        "category": "linear", "symbol": "BTCUSDT", "execId": exec_id,
+        "side": side, "execQty": str(qty), "execPrice": str(price),
+    }
+    if fee is not None:
+        execution.update(execType="Trade", execFee=str(fee))
+    execution.update(fields)
+    return {"topic": "execution", "data": [execution]}
+
+
+def test_execution_aggregator_tracks_pnl_and_dedupes_fast_fills():
+    from pybit.execution_aggregator import ExecutionAggregator
+
+    aggregator = ExecutionAggregator()
+    aggregator.handle_message(_execution("1", "Buy", 2, 100, fee=0.2))
+    # The fast stream sees fill 2 first; the regular stream adds its fee.
+    aggregator.handle_message(_execution("2", "Buy", 2, 110))
+    aggregator.handle_message(_execution("2", "Buy", 2, 110, fee=0.22))
+    aggregator.handle_message(_execution("2", "Buy", 2, 110))
+    stats = aggregator.get_stats("linear", "BTCUSDT")
+    assert (stats.position, stats.avg_entry_price) == (4, 105)
+    assert stats.fees == pytest.approx(0.42)
+
+    # Sell 6: closes 4 at a profit of 4 * (120 - 105), then flips short 2.
+    aggregator.handle_message(_execution("3", "Sell", 6, 120, fee=0.72, isMaker=True))
+    aggregator.handle_message(_execution(
+        "4", "Sell", 0, 0, fee=-0.5, execType="Funding",
+    ))
+    [snapshot] = aggregator.snapshot(category="linear")
+    assert snapshot["position"] == -2
+    assert snapshot["avg_entry_price"] == 120
+    assert snapshot["realized_pnl"] == pytest.approx(60)
+    assert snapshot["net_pnl"] == pytest.approx(60 - 1.14 + 0.5)
+    assert (snapshot["fill_count"], snapshot["maker_count"]) == (3, 1)
+    assert snapshot["vwap"] == pytest.approx((200 + 220 + 720) / 10)
+    assert stats.unrealized_pnl(110) == pytest.approx(20)
+
+
+def test_execution_aggregator_inverse_pnl_is_in_coin():
+    from pybit.execution_aggregator import ExecutionAggregator
+
+    aggregator = ExecutionAggregator()
+    aggregator.set_position("inverse", "BTCUSD", 100, 20000)
+    aggregator.handle_message(_execution(
+        "1", "Buy", 100, 25000, fee=0, category="inverse", symbol="BTCUSD",
+    ))
+    stats = aggregator.get_stats("inverse", "BTCUSD")
+    # Harmonic average of the two entries.
+    assert stats.avg_entry_price == pytest.approx(200 / (100 / 20000 + 100 / 25000))
+
+    aggregator.handle_message(_execution(
+        "2", "Sell", 200, 25000, fee=0, category="inverse", symbol="BTCUSD",
+    ))
+    assert stats.position == 0
+    assert stats.realized_pnl == pytest.approx(100 / 20000 - 100 / 25000)
+
+
+def test_trade_tape_window_analytics_survive_wraparound():
+    import random
+    from pybit.trade_tape import TradeTape
+
+    rng = random.Random(7)
+    tape = TradeTape(capacity=50)
+    trades = []
+    for i in range(237):
+        trade = (1000 + i * 10, rng.uniform(99, 101), rng.uniform(0.1, 2),
+                 rng.choice(["Buy", "Sell"]))
+        trades.append(trade)
+        tape.append(*trade)
+
+    retained = trades[-50:]
+    assert len(tape) == 50
+    assert [t[0] for t in tape.trades()] == [t[0] for t in retained]
+    for window in (0, 95, 200, None):
+        expected = [
+            t for t in retained if window is None or t[0] >= retained[-1][0] - window
+        ]
+        volume = sum(t[2] for t in expected)
+        buys = sum(t[2] for t in expected if t[3] == "Buy")
+        assert tape.volume(window) == pytest.approx(volume)
+        assert tape.vwap(window) == pytest.approx(
+            sum(t[1] * t[2] for t in expected) / volume
+        )
+        assert tape.imbalance(window) == pytest.approx((2 * buys - volume) / volume)
+    assert tape.trade_rate(1000) == pytest.approx(50)
+    assert tape.window_stats(10, now=10**9)["trades"] == 0
+    # Trades after `now` are outside the window.
+    now = retained[-10][0]
+    expected = [t for t in retained if now - 95 <= t[0] <= now]
+    assert tape.window_stats(95, now=now)["trades"] == len(expected) == 10
+    assert tape.volume(95, now=now) == pytest.approx(sum(t[2] for t in expected))
+    assert [t[0] for t in tape.trades(95, now=now)] == [t[0] for t in expected]
+    assert len(tape.trades(now=now)) == 41
+
+
+def test_websocket_feeds_trade_tape_from_dispatch():
+    from pybit._websocket_stream import _V5WebSocketManager
+
+    ws = _V5WebSocketManager("Test", testnet=False, trade_tape_capacity=3)
+    received = []
+    ws._set_callback("publicTrade.BTCUSDT", received.append)
+    ws._handle_incoming_message({
+        "topic": "publicTrade.BTCUSDT", "type": "snapshot", "ts": 3,
+        "data": [
+            {"T": 1, "s": "BTCUSDT", "S": "Buy", "v": "1", "p": "100"},
+            {"T": 2, "s": "BTCUSDT", "S": "Sell", "v": "3", "p": "104"},
+        ],
+    })
+    tape = ws.get_trade_tape("BTCUSDT")
+    assert received and len(tape) == 2
+    assert tape.vwap() == pytest.approx(103)
+    assert tape.imbalance() == pytest.approx(-0.5)
+    assert ws.get_trade_tape("ETHUSDT") is None
+
+
+def _public_trades(*trades, symbol="BTCUSDT"):
+    return {"topic": f"publicTrade.{symbol}", "data": [
+        {"T": ts, "s": symbol, "S": "Buy", "p": str(price), "v": str(size)}
+        for ts, price, size in trades
+    ]}
+
+
+def test_kline_builder_time_bars_close_and_fill_gaps():
+    from pybit.kline_builder import KlineBuilder
+
+    closed = []
+    builder = KlineBuilder(interval=250, symbol="BTCUSDT", on_close=closed.append,
+                           fill_gaps=True)
+    builder.handle_message(_public_trades((1000, 10, 1), (1100, 12, 2), (1200, 9, 1)))
+    builder.handle_message(_public_trades((1000, 99, 9), symbol="ETHUSDT"))
+    assert closed == [] and builder.current["high"] == 12
+    builder.handle_message(_public_trades((1760, 11, 3)))
+
+    assert [bar["start"] for bar in closed] == [1000, 1250, 1500]
+    assert closed[0] == {
+        "start": 1000, "end": 1249, "open": 10, "high": 12, "low": 9,
+        "close": 9, "volume": 4, "turnover": 43, "trades": 3,
+    }
+    assert closed[1]["volume"] == 0 and closed[1]["close"] == 9
+    builder.flush(now=1999)
+    assert len(builder) == 3
+    builder.flush(now=2000)
+    assert list(builder.columns()["close"]) == [9, 9, 9, 11]
+
+
+def test_kline_builder_volume_and_tick_bars():
+    from pybit.kline_builder import KlineBuilder
+
+    builder = KlineBuilder(volume=5)
+    builder.handle_message(_public_trades((1, 100, 3), (2, 101, 8), (3, 102, 1)))
+    bars = builder.get_bars()
+    # The 8 lot trade completes the first bar and fills the second.
+    assert [bar["volume"] for bar in bars] == [5, 5]
+    assert (bars[0]["open"], bars[0]["close"]) == (100, 101)
+    assert builder.current["volume"] == pytest.approx(2)
+
+    builder = KlineBuilder(ticks=2, max_bars=2)
+    builder.handle_message(_public_trades(*[(i, 100 + i, 1) for i in range(10)]))
+    assert len(builder) == 3  # trimmed in batches once it reaches 2 * max_bars
+    assert [bar["close"] for bar in builder.get_bars(2)] == [107, 109]
+
+    with pytest.raises(ValueError):
+        KlineBuilder(interval=1000, ticks=5)
+
+
+def test_kline_builder_seeds_from_get_kline():
+    from pybit.kline_builder import KlineBuilder
+
+    session = Mock()
+    session.get_kline.return_value = {"result": {"list": [
+        # Newest first: start, open, high, low, close, volume, turnover
+        ["360000", "14", "15", "13", "14", "2", "28"],
+        ["300000", "12", "13", "11", "13", "1", "12"],
+        ["240000", "11", "12", "10", "11", "1", "11"],
+        ["0", "10", "11", "9", "10", "1", "10"],
+    ]}}
+    builder = KlineBuilder(interval=300000)
+    builder.seed(session, category="linear", symbol="BTCUSDT", kline_interval="1")
+
+    assert builder.get_bars() == [{
+        "start": 0, "end": 299999, "open": 10, "high": 12, "low": 9,
+        "close": 11, "volume": 2, "turnover": 21, "trades": 0,
+    }]
+    assert builder.current["open"] == 12 and builder.current["high"] == 15
+    builder.add_trade(400000, 16, 1)
+    assert builder.current["high"] == 16 and builder.current["volume"] == 4
+
+
+def test_typed_messages_decode_orderbook_and_trades():
+    from pybit._websocket_stream import _V5WebSocketManager
+    from pybit.models import Message, Orderbook, PublicTrade
+
+    ws = _V5WebSocketManager("Test", testnet=False, typed_messages=True)
+    received = []
+    ws._set_callback("orderbook.50.BTCUSDT", received.append)
+    ws._set_callback("publicTrade.BTCUSDT", received.append)
+    ws._handle_incoming_message({
+        "topic": "orderbook.50.BTCUSDT", "type": "snapshot", "ts": 1,
+        "data": {"s": "BTCUSDT", "b": [["100", "2"]], "a": [["101", "1"]],
+                 "u": 1, "seq": 5},
+    })
+    ws._handle_incoming_message({
+        "topic": "orderbook.50.BTCUSDT", "type": "delta", "ts": 2,
+        "data": {"s": "BTCUSDT", "b": [["99.5", "3"]], "a": [["101", "0"]],
+                 "u": 2, "seq": 6},
+    })
+    ws._handle_incoming_message(_public_trades((3, 100.5, 0.25)))
+
+    book, trades = received[1], received[2]
+    assert isinstance(book, Message) and isinstance(book.data, Orderbook)
+    assert book.type == "snapshot" and book.data.update_id == 2
+    assert book.data.bids == [(100.0, 2.0), (99.5, 3.0)]
+    assert book.data.asks == []
+    assert trades.data == [PublicTrade(
+        ts=3, symbol="BTCUSDT", side="Buy", size=0.25, price=100.5,
+    )]
+    # The stored book itself is left as received.
+    assert ws.data["orderbook.50.BTCUSDT"]["b"][0] == ["100", "2"]
+
+
+def test_models_decode_private_records_and_pass_through_unknown_topics():
+    from pybit.models import Order, Position, decode_message
+
+    order = Order.from_dict({
+        "category": "linear", "symbol": "BTCUSDT", "orderId": "1",
+        "orderLinkId": "", "side": "Buy", "orderType": "Limit",
+        "orderStatus": "New", "price": "100", "qty": "0.5",
+        "avgPrice": "", "createdTime": "1700000000000",
+    })
+    assert order.price == 100.0 and order.avg_price is None
+    assert order.created_time == 1700000000000
+    assert not hasattr(order, "__dict__")
+
+    message = decode_message({"topic": "position", "creationTime": 7, "data": [
+        {"category": "linear", "symbol": "BTCUSDT", "side": "Sell",
+         "size": "2", "entryPrice": "101.5", "positionIdx": 0},
+    ]})
+    assert message.ts == 7
+    assert message.data[0] == Position(
+        category="linear", symbol="BTCUSDT", side="Sell", size=2.0,
+        avg_price=101.5,
+    )
+    wallet = {"topic": "wallet", "data": []}
+    assert decode_message(wallet) is wallet
+
+
+def test_session_pool_fans_out_over_shared_session(mock_exchange):
+    from pybit.session_pool import SessionPool
+
+    with SessionPool(max_workers=4, endpoint=mock_exchange.http_endpoint) as pool:
+        pool.add_account("main", mock_exchange.api_key, mock_exchange.api_secret)
+        pool.add_account("sub", mock_exchange.api_key, "wrong-secret")
+        assert pool["main"].client is pool["sub"].client is pool.session
+
+        results = {
+            item.account: item
+            for item in pool.fan_out("get_wallet_balance", accountType="UNIFIED")
+        }
+        assert results["main"].result["retCode"] == 0
+        assert isinstance(results["sub"].error, InvalidRequestError)
+
+        positions = list(pool.fan_out(
+            lambda client, **query: client.get_positions(**query),
+            accounts=["main"], arguments={"main": {"category": "linear"}},
+        ))
+        assert positions[0].result["result"]["list"] == []
+
+
+def test_rate_limiter_waits_before_the_request_is_signed(monkeypatch):
+    clock = [1000]
+    limiter = Mock()
+    # Waiting for a token moves the clock on by a second.
+    limiter.acquire.side_effect = lambda: clock.__setitem__(0, clock[0] + 1000)
+    monkeypatch.setattr(
+        "pybit._http_manager._helpers.generate_timestamp", lambda: clock[0]
+    )
+    manager = _V5HTTPManager(
+        api_key=_api_key, api_secret=_api_secret, rate_limiter=limiter
+    )
+    manager.client.send = Mock(return_value=_ok_response())
+
+    manager._submit_request(
+        method="GET", path="https://api.bybit.com/v5/order/realtime",
+        query={"category": "linear"}, auth=True,
+    )
+    request = manager.client.send.call_args[0][0]
+    assert request.headers["X-BAPI-TIMESTAMP"] == "2000"
+
+
+def test_token_bucket_spaces_out_calls_after_a_burst():
+    from pybit._rate_limiter import _TokenBucket
+
+    bucket = _TokenBucket(rate=50, capacity=2)
+    started = time.monotonic()
+    waits = [bucket.acquire() for _ in range(5)]
+    assert waits[:2] == [0.0, 0.0] and all(wait > 0 for wait in waits[2:])
+    assert time.monotonic() - started >= 3 / 50 * 0.9
+
+
+def _mock_positions(*positions):
+    return [
+        {"symbol": symbol, "side": side, "size": size, "positionIdx": 0}
+        for symbol, side, size in positions
+    ]
+
+
+@pytest.mark.parametrize("use_batch", [True, False])
+def test_flatten_positions_closes_reduce_only_and_cancels(mock_exchange, use_batch):
+    from pybit.helpers import Helpers
+
+    session = HTTP(
+        endpoint=mock_exchange.http_endpoint,
+        api_key=mock_exchange.api_key,
+        api_secret=mock_exchange.api_secret,
+    )
+    mock_exchange.positions["linear"] = _mock_positions(
+        ("BTCUSDT", "Buy", "0.5"), ("ETHUSDT", "Sell", "2"), ("XRPUSDT", "", "0"),
+    )
+    session.place_order(
+        category="linear", symbol="BTCUSDT", side="Buy", orderType="Limit",
+        qty=0.1, price=100,
+    )
+
+    report = Helpers(session).flatten_positions(
+        "linear", use_batch=use_batch, settleCoin="USDT",
+    )
+
+    closes = {entry["symbol"]: entry for entry in report["closes"]}
+    assert set(closes) == {"BTCUSDT", "ETHUSDT"}
+    assert not any(entry["error"] for entry in report["closes"] + report["cancels"])
+    assert closes["ETHUSDT"]["side"] == "Buy" and closes["ETHUSDT"]["elapsed"] > 0
+    market_orders = [
+        order for order in mock_exchange.orders.values()
+        if order["orderType"] == "Market"
+    ]
+    assert len(market_orders) == 2
+    assert all(order["reduceOnly"] for order in market_orders)
+    assert session.get_open_orders(category="linear")["result"]["list"] == []
+
+
+def test_flatten_positions_queries_each_symbol(mock_exchange):
+    from pybit.helpers import Helpers
+
+    session = HTTP(
+        endpoint=mock_exchange.http_endpoint,
+        api_key=mock_exchange.api_key,
+        api_secret=mock_exchange.api_secret,
+        return_response_headers=True,
+    )
+    mock_exchange.positions["linear"] = _mock_positions(
+        ("BTCUSDT", "Buy", "0.5"), ("ETHUSDT", "Sell", "2"),
+    )
+    helpers = Helpers(session)
+
+    with pytest.raises(ValueError):
+        helpers.flatten_positions("linear")
+
+    report = helpers.flatten_positions("linear", symbols=["ETHUSDT"])
+    assert [entry["symbol"] for entry in report["closes"]] == ["ETHUSDT"]
+    assert not any(entry["error"] for entry in report["closes"] + report["cancels"])
+    assert report["closes"][0]["response"]["orderId"]
+
+
+def test_trade_ws_in_flight_window_queues_and_expires_requests():
+    import json as _json
+
+    manager = _make_trade_manager()
+    manager.recv_window = 0
+    manager.referral_id = ""
+    manager.ws = Mock()
+    manager.auth = True
+    manager._init_request_state(max_in_flight=2, request_timeout=0.05)
+
+    callback, error_callback = Mock(), Mock()
+    for _ in range(3):
+        manager._send_order_operation(
+            "order.create", callback, {"symbol": "BTCUSDT"}, error_callback
+        )
+    sent = [_json.loads(call.args[0])["reqId"] for call in manager.ws.send.call_args_list]
+    assert len(sent) == 2 and manager.get_flow_metrics()["queued"] == 1
+
+    manager._handle_incoming_message({"reqId": sent[0], "retCode": 0})
+    callback.assert_called_once()
+    assert manager.ws.send.call_count == 3
+
+    # Neither remaining request gets a response.
+    deadline = time.monotonic() + 2
+    while manager.get_flow_metrics()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    metrics = manager.get_flow_metrics()
+    assert metrics["sent"] == 3 and metrics["acknowledged"] == 1
+    assert metrics["expired"] == 2 and metrics["ack_latency_avg"] is not None
+    assert error_callback.call_count == 2
+    assert error_callback.call_args.args[0]["retCode"] == -1
+    assert manager.callback_directory == {}
+
+
+def test_trade_ws_send_rate_limit_defers_sends():
+    manager = _make_trade_manager()
+    manager.recv_window = 0
+    manager.referral_id = ""
+    manager.ws = Mock()
+    manager.auth = True
+    manager._init_request_state(send_rate=20)
+
+    for _ in range(22):
+        manager._send_order_operation("order.cancel", Mock(), {"orderId": "1"})
+    assert manager.ws.send.call_count == 20
+
+    deadline = time.monotonic() + 2
+    while manager.ws.send.call_count < 22 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.ws.send.call_count == 22
+    assert manager.get_flow_metrics()["queue_wait_max"] > 0.02
+
+
+def test_trade_ws_send_rate_wakes_before_request_expiry():
+    import json as _json
+
+    manager = _make_trade_manager()
+    manager.recv_window = 0
+    manager.referral_id = ""
+    manager.ws = Mock()
+    manager.auth = True
+    manager._init_request_state(send_rate=5, request_timeout=5)
+
+    for _ in range(8):
+        manager._send_order_operation("order.cancel", Mock(), {"orderId": "1"})
+    assert manager.ws.send.call_count == 5
+    for call in manager.ws.send.call_args_list:
+        manager._handle_incoming_message(
+            {"reqId": _json.loads(call.args[0])["reqId"], "retCode": 0}
+        )
+
+    # The expiry timer, due in 5s, must not hold up the rate limited sends.
+    deadline = time.monotonic() + 2
+    while manager.get_flow_metrics()["queued"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.get_flow_metrics()["queued"] == 0
+
+
+def test_trade_ws_frames_match_json_dumps_and_ids_are_sequential(monkeypatch):
+    import json as _json
+
+    monkeypatch.setattr("pybit._helpers.generate_timestamp", lambda: 1700000000000)
+    manager = _make_trade_manager()
+    manager.recv_window = 5000
+    manager.referral_id = "affiliate"
+    manager.ws = Mock()
+    manager.auth = True
+    manager._init_request_state()
+
+    order = {"symbol": "BTCUSDT", "qty": "0.1", "note": 'quote "1"'}
+    manager._send_order_operation("order.create", Mock(), order)
+    manager._send_order_operation("order.create", Mock(), order)
+
+    frames = [call.args[0] for call in manager.ws.send.call_args_list]
+    first_id = _json.loads(frames[0])["reqId"]
+    assert frames[0] == _json.dumps({
+        "reqId": first_id,
+        "header": {
+            "X-BAPI-TIMESTAMP": 1700000000000,
+            "X-BAPI-RECV-WINDOW": 5000,
+            "Referer": "affiliate",
+        },
+        "op": "order.create",
+        "args": [order],
+    })
+    second_id = _json.loads(frames[1])["reqId"]
+    prefix, counter = first_id.rsplit("-", 1)
+    assert second_id == f"{prefix}-{int(counter) + 1}"
+
+
+def test_trading_pool_routes_requests_and_resolves_futures(mock_exchange):
+    from pybit.trading_pool import WebSocketTradingPool
+
+    pool = WebSocketTradingPool(
+        size=2,
+        testnet=False,
+        endpoint=mock_exchange.ws_endpoint,
+        api_key=mock_exchange.api_key,
+        api_secret=mock_exchange.api_secret,
+    )
+    try:
+        futures = [
+            pool.place_order(
+                category="linear", symbol="BTCUSDT", side="Buy",
+                orderType="Limit", qty="0.1", price="100", orderLinkId=f"q-{i}",
+            )
+            for i in range(6)
+        ]
+        acks = [future.result(timeout=5) for future in futures]
+        assert all(ack["retCode"] == 0 for ack in acks)
+
+        duplicate = pool.place_order(
+            category="linear", symbol="BTCUSDT", side="Buy",
+            orderType="Limit", qty="0.1", price="100", orderLinkId="q-0",
+        )
+        with pytest.raises(InvalidRequestError) as exc_info:
+            duplicate.result(timeout=5)
+        assert exc_info.value.status_code == 110072
+
+        stats = pool.get_stats()
+        assert sum(stat["sent"] for stat in stats) == 7
+        assert all(stat["connected"] and stat["in_flight"] == 0 for stat in stats)
+    finally:
+        pool.exit()
+
+
+class _FakeTradeConnection:
+    def __init__(self):
+        self.connected = True
+        self.sent = []
+        self.disconnect_callbacks = []
+
+    def is_connected(self):
+        return self.connected
+
+    def add_disconnect_callback(self, callback):
+        self.disconnect_callbacks.append(callback)
+
+    def _send_order_operation(self, operation, callback, request, error_callback):
+        self.sent.append((operation, request, callback))
+
+    def drop(self):
+        self.connected = False
+        for callback in self.disconnect_callbacks:
+            callback()
+
+
+def test_trading_pool_fails_over_only_safe_requests():
+    from pybit.exceptions import FailedRequestError
+    from pybit.trading_pool import WebSocketTradingPool
+
+    first, second = _FakeTradeConnection(), _FakeTradeConnection()
+    pool = WebSocketTradingPool(connections=[first, second])
+    second.connected = False
+    cancel = pool.cancel_order(category="linear", symbol="BTCUSDT", orderId="1")
+    unsafe = pool.place_order(category="linear", symbol="BTCUSDT", qty="1")
+    assert len(first.sent) == 2
+
+    second.connected = True
+    first.drop()
+
+    with pytest.raises(FailedRequestError):
+        unsafe.result(timeout=1)
+    [(operation, request, callback)] = second.sent
+    assert operation == "order.cancel" and request["orderId"] == "1"
+    # A late response on the dropped connection is ignored.
+    first.sent[0][2]({"retCode": 0, "late": True})
+    callback({"retCode": 0, "retMsg": "OK"})
+    assert cancel.result(timeout=1) == {"retCode": 0, "retMsg": "OK"}
+    assert pool.get_stats()[0]["failovers"] == 1
+
+
+def test_trading_pool_reconciles_failed_over_duplicates():
+    from pybit.exceptions import FailedRequestError
+    from pybit.trading_pool import WebSocketTradingPool
+
+    first, second = _FakeTradeConnection(), _FakeTradeConnection()
+    second.recovery_session = Mock()
+    recovered = {"retCode": 0, "retMsg": "OK", "recovered": True,
+                 "data": {"orderId": "1", "orderLinkId": "mine"}}
+    second._reconcile = Mock(return_value=recovered)
+    pool = WebSocketTradingPool(connections=[first, second])
+    second.connected = False
+    placed = pool.place_order(
+        category="linear", symbol="BTCUSDT", qty="1", orderLinkId="mine"
+    )
+    second.connected = True
+    first.drop()
+
+    # The first attempt went through, so the retry is a duplicate.
+    second.sent[0][2]({"reqId": "r", "retCode": 110072, "retMsg": "duplicate"})
+    assert placed.result(timeout=1) == recovered
+    second._reconcile.assert_called_once_with(
+        "r", "order.create", second.sent[0][1]
+    )
+
+    # Without a recovery session the outcome is reported as unknown.
+    del second.recovery_session
+    first.connected, second.connected = True, False
+    cancel = pool.cancel_order(category="linear", symbol="BTCUSDT", orderId="2")
+    second.connected = True
+    first.drop()
+    second.sent[-1][2]({"retCode": 110001, "retMsg": "order not exists"})
+    with pytest.raises(FailedRequestError) as error:
+        cancel.result(timeout=1)
+    assert "outcome is unknown" in str(error.value)
+
+
+def test_trade_ws_recovers_unanswered_requests_after_reconnect():
+    manager = _make_trade_manager()
+    manager.recv_window = 0
+    manager.referral_id = ""
+    manager.ws = Mock()
+    manager.auth = True
+    session = Mock()
+    manager._init_request_state(recovery_session=session, auto_order_link_id=True)
+    manager.recovery_retry_delays = (0.01,)
+
+    placed, lost, cancelled = (Mock(), Mock()), (Mock(), Mock()), (Mock(), Mock())
+    manager._send_order_operation(
+        "order.create", placed[0], {"category": "linear", "symbol": "BTCUSDT"},
+        placed[1],
+    )
+    manager._send_order_operation(
+        "order.create", lost[0],
+        {"category": "linear", "symbol": "BTCUSDT", "orderLinkId": "mine"},
+        lost[1],
+    )
+    manager._send_order_operation(
+        "order.cancel", cancelled[0],
+        {"category": "linear", "symbol": "BTCUSDT", "orderId": "2"},
+        cancelled[1],
+    )
+    auto_link_id = manager._sent_requests[next(iter(manager._sent_requests))][1]["orderLinkId"]
+
+    orders = {
+        auto_link_id: {"orderId": "1", "orderLinkId": auto_link_id, "orderStatus": "New"},
+        "2": {"orderId": "2", "orderLinkId": "", "orderStatus": "Cancelled"},
+    }
+
+    def lookup(open_only):
+        def method(category, symbol, orderId=None, orderLinkId=None):
+            order = orders.get(orderId or orderLinkId)
+            if order is not None and (order["orderStatus"] == "New") != open_only:
+                order = None
+            return {"result": {"list": [order] if order else []}}
+        return method
+
+    session.get_open_orders.side_effect = lookup(True)
+    session.get_order_history.side_effect = lookup(False)
+
+    manager._on_connection_lost()
+    assert manager.get_flow_metrics()["in_flight"] == 0
+    manager._recover_requests(manager._unknown_requests)
+
+    assert placed[0].call_args.args[0]["data"]["orderId"] == "1"
+    assert lost[1].call_args.args[0]["retCode"] == -1
+    assert cancelled[0].call_args.args[0]["recovered"] is True
+    assert not (placed[1].called or lost[0].called or cancelled[1].called)
+    assert manager.callback_directory == {}
+
+
+def test_trade_ws_waits_for_auth_and_retries_order_lookups():
+    manager = _make_trade_manager()
+    manager.recv_window = 0
+    manager.referral_id = ""
+    manager.ws = Mock()
+    session = Mock()
+    manager._init_request_state(recovery_session=session)
+    manager.recovery_retry_delays = (0.01, 0.01)
+
+    request = {"category": "linear", "symbol": "BTCUSDT", "orderLinkId": "mine"}
+    callback = Mock()
+    manager._send_order_operation("order.create", callback, request)
+    assert not manager.ws.send.called
+    manager._handle_incoming_message({"op": "auth", "retCode": 0, "retMsg": "OK"})
+    assert manager.ws.send.call_count == 1
+
+    # The order only becomes visible on the second lookup.
+    found = {"orderId": "1", "orderLinkId": "mine", "orderStatus": "New"}
+    session.get_open_orders.side_effect = [
+        {"result": {"list": []}}, {"result": {"list": [found]}},
+    ]
+    session.get_order_history.return_value = {"result": {"list": []}}
+    manager._on_connection_lost()
+    manager._recover_requests(manager._unknown_requests)
+
+    assert callback.call_args.args[0]["data"]["orderId"] == "1"
+    assert session.get_open_orders.call_count == 2
+
+
+def test_async_websocket_streams_and_awaits_coroutine_callbacks(mock_exchange):
+    import asyncio
+    from pybit.unified_trading import AsyncWebSocket
+
+    mock_exchange.set_orderbook("BTCUSDT", bids=[["30000", "1"]], asks=[["30001", "2"]])
+
+    async def run():
+        trades = []
+        traded = asyncio.Event()
+
+        async def on_trade(message):
+            await asyncio.sleep(0)
+            trades.append(message)
+            traded.set()
+
+        async with AsyncWebSocket(
+            testnet=False, channel_type="linear", endpoint=mock_exchange.ws_endpoint
+        ) as ws:
+            books = ws.stream()
+            ws.orderbook_stream(50, "BTCUSDT", books)
+            snapshot = await asyncio.wait_for(books.__anext__(), 5)
+            assert snapshot["type"] == "snapshot"
+
+            ws.trade_stream("BTCUSDT", on_trade)
+            await asyncio.sleep(0.2)  # let the subscription reach the server
+            mock_exchange.publish_trade("BTCUSDT", 30001, 0.5)
+            await asyncio.wait_for(traded.wait(), 5)
+            assert trades[0]["data"][0]["p"] == "30001"
+
+            mock_exchange.publish_orderbook_delta("BTCUSDT", bids=[["29999", "3"]])
+            delta = await asyncio.wait_for(books.__anext__(), 5)
+            assert delta["data"]["b"] == [["30000", "1"], ["29999", "3"]]
+        assert not ws.is_connected()
+
+    asyncio.run(run())
+
+
+def test_async_websocket_streams_raise_when_reconnecting_fails(mock_exchange):
+    import asyncio
+    from pybit.unified_trading import AsyncWebSocket
+
+    mock_exchange.set_orderbook("BTCUSDT", bids=[["30000", "1"]], asks=[["30001", "2"]])
+
+    async def run():
+        async with AsyncWebSocket(
+            testnet=False, channel_type="linear", endpoint=mock_exchange.ws_endpoint,
+            retries=1,
+        ) as ws:
+            books = ws.stream()
+            ws.orderbook_stream(50, "BTCUSDT", books)
+            assert (await asyncio.wait_for(books.__anext__(), 5))["type"] == "snapshot"
+
+            ws.endpoint = "ws://127.0.0.1:1"  # nothing listens there
+            mock_exchange.disconnect_all()
+            with pytest.raises(ConnectionError):
+                await asyncio.wait_for(books.__anext__(), 5)
+            with pytest.raises(ConnectionError):
+                await asyncio.wait_for(books.__anext__(), 5)
+        assert not ws.is_connected()
+
+    asyncio.run(run())
+
+
+def _read_shared_book(name, results):
+    from pybit.shared_market_data import SharedMarketDataReader
+
+    with SharedMarketDataReader(name) as reader:
+        results.put((reader.get_orderbook("BTCUSDT"), reader.get_ticker("BTCUSDT")))
+
+
+def test_shared_market_data_is_readable_from_another_process():
+    import multiprocessing
+    from pybit.shared_market_data import (
+        SharedMarketDataPublisher, SharedMarketDataReader,
+    )
+
+    with SharedMarketDataPublisher(["BTCUSDT", "ETHUSDT"], depth=2) as publisher:
+        publisher.handle_message({
+            "topic": "orderbook.50.BTCUSDT", "type": "snapshot", "ts": 1000,
+            "data": {"s": "BTCUSDT", "u": 7, "seq": 9,
+                     "b": [["30000", "2"], ["29999", "1"], ["29998", "3"]],
+                     "a": [["30001", "4"]]},
+        })
+        publisher.handle_message({
+            "topic": "tickers.BTCUSDT", "type": "snapshot", "ts": 1001,
+            "data": {"symbol": "BTCUSDT", "lastPrice": "30000.5",
+                     "fundingRate": "0.0001"},
+        })
+
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        process = context.Process(
+            target=_read_shared_book, args=(publisher.name, results)
+        )
+        process.start()
+        book, ticker = results.get(timeout=30)
+        process.join(timeout=30)
+
+        assert book["b"] == [(30000.0, 2.0), (29999.0, 1.0)]
+        assert book["a"] == [(30001.0, 4.0)]
+        assert (book["u"], book["seq"], book["version"]) == (7, 9, 2)
+        assert ticker["lastPrice"] == 30000.5 and ticker["fundingRate"] == 0.0001
+        assert ticker["markPrice"] != ticker["markPrice"]  # NaN: not sent
+
+        with SharedMarketDataReader(publisher.name, max_retries=10) as reader:
+            assert reader.get_orderbook("ETHUSDT") is None
+            # A slot whose writer stopped mid-update is never returned.
+            publisher._words[publisher._book_offsets[0]] += 1
+            with pytest.raises(RuntimeError):
+                reader.get_orderbook("BTCUSDT")
+
+
+def test_book_arrays_track_top_levels_in_place():
+    np = pytest.importorskip("numpy")
+    from pybit._websocket_stream import _V5WebSocketManager
+
+    ws = _V5WebSocketManager("Test", testnet=False, book_arrays_depth=2)
+    ws._set_callback("orderbook.50.BTCUSDT", lambda message: None)
+    ws._handle_incoming_message({
+        "topic": "orderbook.50.BTCUSDT", "type": "snapshot", "ts": 1,
+        "data": {"s": "BTCUSDT", "u": 1, "seq": 1,
+                 "b": [["100", "3"], ["99", "1"], ["98", "5"]],
+                 "a": [["101", "1"]]},
+    })
+    book = ws.get_book_arrays("BTCUSDT")
+    bid_price = book.bid_price
+    assert book.microprice() == pytest.approx((100 * 1 + 101 * 3) / 4)
+    assert book.imbalance() == pytest.approx((4 - 1) / 5)
+    assert list(book.cumulative_depth("b")) == [3, 4]
+    assert list(book.cumulative_depth("a", notional=True)) == [101]
+    assert np.isnan(book.ask_price[1])
+
+    ws._handle_incoming_message({
+        "topic": "orderbook.50.BTCUSDT", "type": "delta", "ts": 2,
+        "data": {"s": "BTCUSDT", "u": 2, "seq": 2,
+                 "b": [["100", "0"], ["99.5", "2"]], "a": []},
+    })
+    assert book.bid_price is bid_price
+    assert list(bid_price) == [99.5, 99] and list(book.bid_size) == [2, 1]
+    assert (book.ts, book.u) == (2, 2)
+    assert book.depth_to_price(99, "b") == 3
+    assert ws.get_book_arrays("BTCUSDT", depth=1) is None
+
+
+def test_ticker_table_applies_deltas_in_place_and_ranks_symbols():
+    from pybit._websocket_stream import _V5WebSocketManager
+
+    ws = _V5WebSocketManager("Test", testnet=False, ticker_table=True)
+    for symbol, last, turnover in (
+        ("BTCUSDT", "30000", "900"), ("ETHUSDT", "2000", "500"),
+        ("SOLUSDT", "20", "700"),
+    ):
+        ws._set_callback(f"tickers.{symbol}", lambda message: None)
+        ws._handle_incoming_message({
+            "topic": f"tickers.{symbol}", "type": "snapshot", "ts": 1,
+            "data": {"symbol": symbol, "lastPrice": last,
+                     "turnover24h": turnover, "fundingRate": "0.0001",
+                     "tickDirection": "PlusTick"},
+        })
+    ws._handle_incoming_message({
+        "topic": "tickers.ETHUSDT", "type": "delta", "ts": 2,
+        "data": {"symbol": "ETHUSDT", "turnover24h": "1000", "fundingRate": ""},
+    })
+
+    table = ws.get_ticker_table()
+    assert table.symbols == ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+    assert list(table.column("lastPrice")) == [30000, 2000, 20]
+    assert table.top("turnover24h", 2) == [("ETHUSDT", 1000), ("BTCUSDT", 900)]
+    assert table.top("lastPrice", 1, largest=False) == [("SOLUSDT", 20)]
+    eth = table.get("ETHUSDT")
+    assert (eth["fundingRate"], eth["ts"]) == (0.0001, 2)
+    assert table.value("BTCUSDT", "markPrice") != table.value("BTCUSDT", "markPrice")
+    assert table.top("markPrice") == []
+
+
+def test_orderbook_validator_detects_divergence_and_resubscribes(mock_exchange):
+    import queue
+    from pybit.orderbook_validator import OrderbookValidator, check_book
+    from pybit.unified_trading import WebSocket
+
+    assert check_book({"b": [["100", "1"], ["101", "1"]], "a": [["100", "0"]]}) == [
+        "bids are not in strictly descending order",
+        "asks have zero sizes",
+        "book is crossed: 101.0 >= 100.0",
+    ]
+
+    bids = [["30000", "1"], ["29999", "1"], ["29998", "1"]]
+    mock_exchange.set_orderbook(
+        "BTCUSDT", bids=bids, asks=[["30001", "2"], ["30002", "1"], ["30003", "1"]]
+    )
+    session = HTTP(endpoint=mock_exchange.http_endpoint)
+    ws = WebSocket(
+        testnet=False, channel_type="linear", endpoint=mock_exchange.ws_endpoint
+    )
+    messages = queue.Queue()
+    reports = []
+    try:
+        # Only the top level is in view; the full book is validated.
+        ws.orderbook_stream(50, "BTCUSDT", messages.put, max_levels=1)
+        messages.get(timeout=5)
+        validator = OrderbookValidator(
+            ws, session, requests_per_minute=None, confirmations=1,
+            tolerance=0.1, on_divergence=reports.append,
+        )
+        topic = "orderbook.50.BTCUSDT"
+        assert validator.check(topic) is None
+
+        ws._book_sides[topic]["b"][0][1] = ["29999", "5"]  # a missed update
+        report = validator.check(topic)
+        assert report["reason"] == "divergence"
+        assert report["mismatch"] == pytest.approx(1 / 6)
+        assert messages.get(timeout=5)["data"]["b"] == [["30000", "1"]]
+        assert ws._book_sides[topic]["b"][0] == bids
+
+        metrics = validator.get_metrics()
+        assert (metrics["comparisons"], metrics["divergences"], metrics["resyncs"]) == (2, 1, 1)
+        assert metrics["last_mismatch"] == {topic: pytest.approx(1 / 6)}
+        assert reports == [report] and ws.callback_directory[topic] == messages.put
+    finally:
+        ws.exit()
+
+
+def test_orderbook_deltas_keep_sides_sorted_and_apply_view_policies():
+    from pybit._websocket_stream import _V5WebSocketManager
+
+    ws = _V5WebSocketManager("Test", testnet=False)
+    ws._set_book_policy("orderbook.50.{symbol}", ["BTCUSDT"], 3, None)
+    ws._set_book_policy("orderbook.50.{symbol}", "ETHUSDT", None, 1)
+    with pytest.raises(ValueError):
+        ws._set_book_policy("orderbook.50.{symbol}", "SOLUSDT", 0, None)
+
+    def message(symbol, kind, bids, asks, u):
+        ws._process_delta_orderbook({
+            "topic": f"orderbook.50.{symbol}", "type": kind, "ts": u,
+            "data": {"s": symbol, "b": bids, "a": asks, "u": u, "seq": u},
+        }, f"orderbook.50.{symbol}")
+        return ws.data[f"orderbook.50.{symbol}"]
+
+    book = message("BTCUSDT", "snapshot",
+                   [["100", "1"], ["98", "1"]], [["101", "1"]], 1)
+    book = message("BTCUSDT", "delta",
+                   [["99", "2"], ["100.5", "1"], ["98", "0"], ["97", "0"]],
+                   [["103", "1"], ["102", "1"], ["101", "3"], ["104", "1"]], 2)
+    assert book["b"] == [["100.5", "1"], ["100", "1"], ["99", "2"]]
+    assert book["a"] == [["101", "3"], ["102", "1"], ["103", "1"]]
+    assert (book["u"], book["seq"]) == (2, 2)
+
+    book = message("ETHUSDT", "snapshot",
+                   [["99", "1"], ["100", "1"], ["98", "1"]],
+                   [["101", "1"], ["103", "1"]], 1)
+    # Mid 100.5: levels further than 1.005 away are dropped.
+    assert book["b"] == [["100", "1"]]
+    assert book["a"] == [["101", "1"]]
+
+    # Levels beyond max_levels are kept out of view, not dropped, so that
+    # deletes above them bring them back.
+    book = message("BTCUSDT", "snapshot",
+                   [["100", "1"], ["99", "1"], ["98", "1"], ["97", "1"], ["96", "1"]],
+                   [["101", "1"]], 3)
+    assert [level[0] for level in book["b"]] == ["100", "99", "98"]
+    book = message("BTCUSDT", "delta",
+                   [["100", "0"], ["99", "0"], ["95", "1"]], [], 4)
+    assert [level[0] for level in book["b"]] == ["98", "97", "96"]
+
+    # Likewise for levels outside max_distance_pct when the mid moves.
+    book = message("ETHUSDT", "delta",
+                   [["100", "0"]], [["101", "0"], ["100", "1"]], 2)
+    assert book["b"] == [["99", "1"]] and book["a"] == [["100", "1"]]
+
+    book = message("SOLUSDT", "snapshot", [["10", "1"]], [["11", "1"]], 1)
+    book = message("SOLUSDT", "delta", [["10.5", "1"]], [["11", "0"]], 2)
+    assert book["b"] == [["10.5", "1"], ["10", "1"]] and book["a"] == []